@@ -4,24 +4,39 @@ Gère les 5 modes de traitement avec configuration via admin_settings
 """
 
 import os
+import json
+import hashlib
 import time
+import uuid
+import zipfile
 import logging
-from typing import Dict, Any, Optional, Tuple
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 from io import BytesIO
 
-from flask import Flask, request, jsonify, send_file, send_from_directory
+from flask import Flask, Response, g, request, jsonify, send_file, send_from_directory
 from flask_cors import CORS
 from PIL import Image
-import numpy as np
-import cv2
-import requests
-from supabase import create_client, Client
 
 # Import des processeurs modulaires
 from crop_processor import CropHeadProcessor
 from resize_processor import ResizeProcessor
 from bria_processor import BriaProcessor
+from bria_limiter import BriaUnavailable
+from result_cache import ResultCache
+from ingest import ImageIngestor
+from cpu_offload import gevent_active, run_cpu, run_image_task
+from geometry import apply_plan
+from output_encoder import configured_format, encode_result, encoder_options, negotiate_format
+from shared_config import SharedConfigStore
+from config_snapshot import TRUE_VALUES, ConfigSnapshot
+from profiling import ProfileStore
+from jobs import JOB_DONE, JOB_FAILED, TERMINAL_STATUSES, JobManager, JobRejected
+from memory_guard import MemorySampler, PixelBudget, PixelBudgetExceeded, current_rss, peak_rss
+from upload_stream import DEFAULT_MAX_CONTENT_LENGTH, StreamingRequest, request_body_limit, upload_view
+import metrics
 
 # Configuration logging
 logging.basicConfig(
@@ -31,38 +46,201 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# Paramètres secrets (token Bria...) : jamais écrits dans le snapshot partagé (fichier local),
+# chaque worker les lit lui-même dans Supabase
+SECRET_SETTING_SUFFIXES = ('_token', '_secret', '_password', '_api_key')
+
+
+def _is_secret(key: str) -> bool:
+    return key.endswith(SECRET_SETTING_SUFFIXES)
+
+
+def _secrets_digest(secrets: Dict[str, str]) -> str:
+    return hashlib.sha256(json.dumps(secrets, sort_keys=True).encode('utf-8')).hexdigest()
+
+
 class ConfigManager:
-    """Gestionnaire de configuration depuis Supabase"""
+    """
+    Gestionnaire de configuration depuis Supabase.
+    
+    Le refresh tourne sur un thread de fond et publie un ConfigSnapshot immuable ;
+    chaque requête récupère le snapshot une fois (snapshot()) et le garde jusqu'au bout.
+    
+    Entre workers, le snapshot chargé depuis Supabase est publié dans un SharedConfigStore :
+    un seul worker (le leader) interroge Supabase, les autres relisent la version partagée.
+    Les secrets n'y figurent pas (seulement leur empreinte) : un worker ne les relit dans
+    Supabase qu'au démarrage et quand l'empreinte change.
+    """
     
     def __init__(self):
         self.supabase_url = os.environ.get('VITE_SUPABASE_URL', '')
         self.supabase_key = os.environ.get('VITE_SUPABASE_ANON_KEY', '')
-        self.settings: Dict[str, str] = {}
-        self.last_refresh = None
+        self._snapshot: Optional[ConfigSnapshot] = None
         self.refresh_interval = timedelta(minutes=5)
+        self._refresh_lock = threading.Lock()
+        self._refresher: Optional[threading.Thread] = None
+        self._stop_refresh = threading.Event()
+        self.shared: Optional[SharedConfigStore] = None
+        self._shared_version = 0
+        self._secrets: Optional[Dict[str, str]] = None
         
         # Charger la configuration initiale
         if self.supabase_url and self.supabase_key:
-            self.supabase: Client = create_client(self.supabase_url, self.supabase_key)
-            self.load_settings()
+            self.supabase = self._create_client()
+            try:
+                self.shared = SharedConfigStore()
+            except OSError as e:
+                logger.warning(f"Shared config unavailable, falling back to per-worker refresh: {e}")
+            # Un snapshot récent publié par un autre worker évite une requête Supabase
+            if not self._adopt_shared(max_age=self.refresh_interval):
+                self.load_settings()
+            self.start_refresher()
         else:
             logger.warning("Supabase credentials not found, using defaults")
             self._load_defaults()
     
-    def load_settings(self):
-        """Charge tous les paramètres depuis admin_settings"""
+    def _create_client(self):
+        # Import différé : le client Supabase (httpx...) n'est chargé que si des credentials sont définis
+        from supabase import create_client
+        return create_client(self.supabase_url, self.supabase_key)
+    
+    def snapshot(self) -> ConfigSnapshot:
+        """Snapshot courant (lecture atomique, jamais bloquante)"""
+        if self.shared is not None and self.shared.sequence() != self._shared_version:
+            self._adopt_shared()
+        return self._snapshot
+    
+    def _adopt_shared(self, max_age: Optional[timedelta] = None) -> bool:
+        """Adopte le snapshot partagé s'il est plus récent que le snapshot local"""
+        if self.shared is None:
+            return False
+        shared = self.shared.read()
+        if shared is None:
+            return False
+        version, payload = shared
+        loaded_at = datetime.fromisoformat(payload['loaded_at'])
+        if max_age is not None and datetime.now() - loaded_at > max_age:
+            return False
+        settings = dict(payload['settings'], **self._shared_secrets(payload.get('secrets_digest')))
+        self._shared_version = version
+        self._snapshot = ConfigSnapshot(settings, payload['source'], loaded_at, version)
+        return True
+    
+    def _shared_secrets(self, digest: Optional[str]) -> Dict[str, str]:
+        """Secrets du snapshot partagé : ceux déjà connus, relus dans Supabase s'ils ont changé"""
+        if self._secrets is not None and _secrets_digest(self._secrets) == digest:
+            return self._secrets
         try:
-            response = self.supabase.table('admin_settings').select('*').execute()
-            self.settings = {item['key']: item['value'] for item in response.data}
-            self.last_refresh = datetime.now()
-            logger.info(f"Loaded {len(self.settings)} settings from database")
+            response = self.supabase.table('admin_settings').select('key, value').execute()
+            self._secrets = {item['key']: item['value'] for item in response.data if _is_secret(item['key'])}
         except Exception as e:
-            logger.error(f"Failed to load settings: {e}")
-            self._load_defaults()
+            if self._secrets is None:
+                logger.error(f"Failed to load secret settings: {e}, using defaults")
+                self._secrets = {k: v for k, v in self._default_settings().items() if _is_secret(k)}
+            else:
+                logger.error(f"Failed to load secret settings: {e}, keeping previous values")
+        return self._secrets
+    
+    @property
+    def settings(self):
+        return self.snapshot().settings
+    
+    @property
+    def last_refresh(self) -> Optional[datetime]:
+        return self.snapshot().loaded_at if self._snapshot else None
+    
+    def _publish(self, settings: Dict[str, str], source: str) -> ConfigSnapshot:
+        snapshot = ConfigSnapshot(settings, source)
+        if source == 'database':
+            self._secrets = {key: value for key, value in settings.items() if _is_secret(key)}
+        if self.shared is not None and source == 'database':
+            try:
+                version = self.shared.write({
+                    'settings': {key: value for key, value in settings.items() if not _is_secret(key)},
+                    'secrets_digest': _secrets_digest(self._secrets),
+                    'source': source,
+                    'loaded_at': snapshot.loaded_at.isoformat()
+                })
+                snapshot.version = version
+                self._shared_version = version
+            except OSError as e:
+                logger.error(f"Failed to publish shared config: {e}")
+        self._snapshot = snapshot
+        return snapshot
+    
+    def load_settings(self) -> bool:
+        """Charge tous les paramètres depuis admin_settings ; garde le dernier snapshot valide en cas d'échec"""
+        with self._refresh_lock:
+            try:
+                response = self.supabase.table('admin_settings').select('*').execute()
+                settings = {item['key']: item['value'] for item in response.data}
+                self._publish(settings, 'database')
+                logger.info(f"Loaded {len(settings)} settings from database")
+                return True
+            except Exception as e:
+                if self._snapshot is not None:
+                    logger.error(f"Failed to load settings: {e}, keeping last good snapshot "
+                                 f"from {self._snapshot.loaded_at.isoformat()}")
+                else:
+                    logger.error(f"Failed to load settings: {e}, using defaults")
+                    self._load_defaults()
+                return False
+    
+    def start_refresher(self):
+        """Démarre le refresh périodique en arrière-plan (idempotent)"""
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        self._stop_refresh.clear()
+        self._refresher = threading.Thread(target=self._refresh_loop, name='config-refresher', daemon=True)
+        self._refresher.start()
+    
+    def stop_refresher(self):
+        self._stop_refresh.set()
+    
+    def before_fork(self):
+        """Master gunicorn (preload_app) : le refresh s'arrête, seuls les workers interrogent Supabase"""
+        self.stop_refresher()
+        if self._refresher is not None:
+            self._refresher.join(timeout=5)
+        if self.shared is not None:
+            self.shared.release_leadership()
+    
+    def after_fork(self):
+        """
+        Worker forké depuis le master (preload_app) : client Supabase (connexions httpx),
+        SharedConfigStore (descripteurs et verrous flock partagés avec le master) et thread
+        de refresh sont recréés ; le snapshot hérité sert jusqu'à la relecture du snapshot partagé.
+        """
+        if not (self.supabase_url and self.supabase_key):
+            return
+        self.supabase = self._create_client()
+        if self.shared is not None:
+            path = self.shared.path
+            self.shared.close()
+            try:
+                self.shared = SharedConfigStore(path)
+            except OSError as e:
+                logger.warning(f"Shared config unavailable, falling back to per-worker refresh: {e}")
+                self.shared = None
+        # Worker recréé longtemps après le preload (max_requests) : snapshot hérité périmé
+        if not self._adopt_shared() and datetime.now() - self._snapshot.loaded_at > self.refresh_interval:
+            self.load_settings()
+        self.start_refresher()
+    
+    def _refresh_loop(self):
+        while not self._stop_refresh.wait(self.refresh_interval.total_seconds()):
+            # Seul le leader interroge Supabase ; si le leader meurt, un autre worker prend le relais
+            if self.shared is not None and not self.shared.try_acquire_leadership():
+                continue
+            self.load_settings()
     
     def _load_defaults(self):
-        """Charge les valeurs par défaut"""
-        self.settings = {
+        """Publie les valeurs par défaut"""
+        self._publish(self._default_settings(), 'defaults')
+    
+    def _default_settings(self) -> Dict[str, str]:
+        """Valeurs par défaut"""
+        return {
             # Modes
             'mode_ai_enabled': 'true',
             'mode_resize_enabled': 'true',
@@ -78,6 +256,18 @@ class ConfigManager:
             'output_format_crop_head': 'jpg',
             'output_format_all': 'png',
             'output_quality': '95',
+            'output_negotiate_webp': 'true',
+            
+            # Profils d'encodage (suffixe _<mode> pour un réglage par mode, voir output_encoder.py)
+            'output_png_optimize': 'true',
+            'output_png_compress_level': '6',
+            'output_png_palette': 'false',
+            'output_png_palette_colors': '256',
+            'output_webp_lossless': 'false',
+            'output_webp_method': '4',
+            'output_webp_effort': '80',
+            'output_jpeg_progressive': 'false',
+            'output_jpeg_optimize': 'true',
             
             # Bria
             'bria_api_token': os.environ.get('BRIA_API_TOKEN', ''),
@@ -86,6 +276,9 @@ class ConfigManager:
             'bria_max_retries': '3',
             'bria_optimize_before': 'true',
             'bria_max_size': '1500',
+            'bria_pool_maxsize': '100',
+            'bria_preconnect_enabled': 'true',
+            'bria_preconnect_timeout': '5',
             
             # Resize
             'resize_tool': 'pillow',
@@ -98,9 +291,13 @@ class ConfigManager:
             'resize_max_dimension': '4096',
             
             # Crop head (sous le nez)
+            'face_detector_backend': 'haar',
+            'face_dnn_confidence': '0.5',
             'face_scale_factor': '1.1',
             'face_min_neighbors': '4',
-            'nose_position_ratio': '0.72',
+            'face_detection_max_size': '640',
+            'face_min_size_ratio': '0.05',
+            'nose_position_ratio': '0.75',
             'crop_fallback_strategy': 'top_portion',
             
             # Pipeline
@@ -112,37 +309,85 @@ class ConfigManager:
             
             # Performance
             'max_file_size_mb': '10',
+            'max_image_pixels': '40000000',
+            'upload_spool_threshold_kb': '512',
+            'memory_pixel_budget_mp': '120',
+            'memory_budget_wait_seconds': '5',
+            'memory_budget_min_side': '2048',
+            'memory_profile_sample_rate': '0.01',
+            'memory_profile_tracemalloc': 'false',
             'auto_optimize_large_images': 'true',
             'optimization_threshold': '2048',
+            'batch_max_items': '50',
+            'batch_concurrency': '4',
+            'batch_max_request_mb': '100',
+            'geometry_planner_enabled': 'true',
+            'profile_max_files': '50',
+            'jobs_enabled': 'true',
+            'jobs_max_workers': '4',
+            'jobs_max_pending': '32',
+            'jobs_result_ttl': '600',
+            'jobs_sse_max_seconds': '',  # vide : selon la classe de worker (voir _sse_max_seconds)
             
             # Monitoring
             'logging_level': 'INFO',
             'log_processing_times': 'true',
-            'error_details_in_response': 'false'
+            'error_details_in_response': 'false',
+            
+            # Cache des résultats
+            'result_cache_enabled': 'true',
+            'result_cache_memory_items': '64',
+            'result_cache_memory_mb': '64',
+            'result_cache_disk_mb': '1024',
+            
+            # Cache des réponses Bria
+            'bria_cache_enabled': 'true',
+            'bria_cache_ttl_seconds': '3600',
+            'bria_cache_max_mb': '128',
+            'bria_cache_max_items': '256',
+            
+            # Mode matte Bria
+            'bria_matte_mode': 'false',
+            'bria_matte_size': '768',
+            'bria_matte_radius': '8',
+            'bria_matte_eps': '0.0001',
+            
+            # Encodage de l'upload Bria
+            'bria_upload_format': 'jpeg',
+            'bria_upload_quality': '95',
+            'bria_upload_max_kb': '0',
+            'bria_upload_min_quality': '60',
+            
+            # Limiteur adaptatif et disjoncteur Bria
+            'bria_limiter_enabled': 'true',
+            'bria_limit_initial': '20',
+            'bria_limit_min': '1',
+            'bria_limit_max': '100',
+            'bria_limit_backoff': '0.7',
+            'bria_queue_timeout': '5',
+            'bria_breaker_failures': '5',
+            'bria_breaker_cooldown': '30',
+            'bria_retry_max_wait': '2',
+            
+            # Hedging Bria
+            'bria_hedge_enabled': 'false',
+            'bria_hedge_percentile': '95',
+            'bria_hedge_budget': '0.05',
+            'bria_hedge_min_delay': '0.5',
+            'bria_hedge_min_samples': '20'
         }
-        self.last_refresh = datetime.now()
     
     def get(self, key: str, default: Any = None) -> Any:
-        """Récupère une valeur avec refresh auto si nécessaire"""
-        if self.last_refresh and datetime.now() - self.last_refresh > self.refresh_interval:
-            self.load_settings()
-        return self.settings.get(key, default)
+        return self.snapshot().get(key, default)
     
     def get_bool(self, key: str, default: bool = False) -> bool:
-        value = self.get(key, str(default))
-        return str(value).lower() in ('true', '1', 'yes', 'on')
+        return self.snapshot().get_bool(key, default)
     
     def get_int(self, key: str, default: int = 0) -> int:
-        try:
-            return int(self.get(key, default))
-        except:
-            return default
+        return self.snapshot().get_int(key, default)
     
     def get_float(self, key: str, default: float = 0.0) -> float:
-        try:
-            return float(self.get(key, default))
-        except:
-            return default
+        return self.snapshot().get_float(key, default)
 
 
 # Les processeurs ont été déplacés dans des fichiers séparés :
@@ -151,74 +396,103 @@ class ConfigManager:
 # - CropHeadProcessor -> crop_processor.py
 
 
+class StageTimes(dict):
+    """processing_times qui signale chaque étape terminée (progression des jobs asynchrones)"""
+    
+    def __init__(self, on_stage: Callable[[str, float], None]):
+        super().__init__()
+        self._on_stage = on_stage
+    
+    def __setitem__(self, stage: str, duration: float):
+        super().__setitem__(stage, duration)
+        self._on_stage(stage, duration)
+
+
 class UnifiedProcessor:
     """Orchestrateur principal des 5 modes"""
     
     def __init__(self):
+        self.pid = os.getpid()
         self.config = ConfigManager()
         self.bria = BriaProcessor(self.config)
         self.resize = ResizeProcessor(self.config)
         self.crop_head = CropHeadProcessor(self.config)
+        self.cache = ResultCache(self.config)
+        self.ingest = ImageIngestor(self.config)
+        self.pixel_budget = PixelBudget(self.config)
+        self.memory = MemorySampler(self.config)
     
-    def process_image(self, mode: str, image: Image.Image, params: Dict) -> Tuple[Image.Image, Dict]:
-        """Process selon le mode avec gestion d'erreur intelligente"""
+    def before_fork(self):
+        """Appelé dans le master avant le fork des workers (preload_app, voir warmup.py)"""
+        self.config.before_fork()
+    
+    def after_fork(self):
+        """Ressources héritées du master (fichiers, sockets, threads) recréées dans le worker"""
+        self.pid = os.getpid()
+        self.config.after_fork()
+        self.bria.after_fork()
+        logger.info(f"Unified processor reinitialized in worker {self.pid}")
+    
+    def process_image(self, mode: str, image: Image.Image, params: Dict,
+                      config: Optional[ConfigSnapshot] = None,
+                      progress: Optional[Callable[[str, float], None]] = None,
+                      output_format: Optional[str] = None) -> Tuple[Image.Image, Dict]:
+        """
+        Process selon le mode avec gestion d'erreur intelligente.
+        progress(étape, durée) optionnel ; output_format négocié (défaut : output_format_<mode>).
+        """
+        # Un seul snapshot de configuration pour toute la requête
+        config = config or self.config.snapshot()
         
         # Vérifier si le mode est activé
-        if not self.config.get_bool(f'mode_{mode}_enabled', True):
+        if not config.get_bool(f'mode_{mode}_enabled', True):
             raise ValueError(f"Mode '{mode}' is disabled by administrator")
         
-        # Vérifier la taille du fichier
-        max_size_mb = self.config.get_int('max_file_size_mb', 10)
-        img_bytes = BytesIO()
-        image.save(img_bytes, format='PNG')
-        size_mb = len(img_bytes.getvalue()) / (1024 * 1024)
+        # La taille du fichier et le budget de pixels sont vérifiés à l'ingestion (ImageIngestor)
         
-        if size_mb > max_size_mb:
-            raise ValueError(f"Image too large: {size_mb:.1f}MB (max: {max_size_mb}MB)")
-        
-        # Optimiser si image trop grande
-        if self.config.get_bool('auto_optimize_large_images', True):
-            threshold = self.config.get_int('optimization_threshold', 2048)
+        # Optimiser si image trop grande (inutile si le planificateur fait un seul rééchantillonnage)
+        if config.get_bool('auto_optimize_large_images', True) and not self._uses_planner(mode, config):
+            threshold = config.get_int('optimization_threshold', 2048)
             w, h = image.size
             if max(w, h) > threshold:
                 ratio = threshold / max(w, h)
                 new_w = int(w * ratio)
                 new_h = int(h * ratio)
-                image = image.resize((new_w, new_h), Image.LANCZOS)
+                image = run_cpu(image.resize, (new_w, new_h), Image.LANCZOS)
                 logger.info(f"Auto-optimized image from {w}x{h} to {new_w}x{new_h}")
         
         # Initialiser le tracking
         operations_logged = []
-        processing_times = {}
+        processing_times = {} if progress is None else StageTimes(progress)
         start_time = time.time()
         
         try:
             if mode == 'ai':
-                result = self._process_ai(image, operations_logged, processing_times)
+                result = self._process_ai(image, config, operations_logged, processing_times)
                 
             elif mode == 'resize':
-                result = self._process_resize(image, params, operations_logged, processing_times)
+                result = self._process_resize(image, config, params, operations_logged, processing_times)
                 
             elif mode == 'both':
-                result = self._process_both(image, params, operations_logged, processing_times)
+                result = self._process_both(image, config, params, operations_logged, processing_times)
                 
             elif mode == 'crop-head':
-                result = self._process_crop_head(image, params, operations_logged, processing_times)
+                result = self._process_crop_head(image, config, params, operations_logged, processing_times)
                 
             elif mode == 'all':
-                result = self._process_all(image, params, operations_logged, processing_times)
+                result = self._process_all(image, config, params, operations_logged, processing_times)
                 
             else:
                 raise ValueError(f"Unknown mode: {mode}")
             
-            # Convertir selon le format configuré
-            output_format = self.config.get(f'output_format_{mode}', 'png')
-            result = self._convert_format(result, output_format)
+            # Convertir selon le format négocié ou configuré
+            output_format = output_format or configured_format(config, mode)
+            result = run_cpu(self._convert_format, result, output_format)
             
             total_time = time.time() - start_time
             
             # Logger si activé
-            if self.config.get_bool('log_processing_times', True):
+            if config.get_bool('log_processing_times', True):
                 logger.info(f"Mode: {mode}, Operations: {[op['type'] for op in operations_logged]}, "
                            f"Time: {total_time:.2f}s")
             
@@ -233,70 +507,99 @@ class UnifiedProcessor:
             logger.error(f"Processing failed for mode {mode}: {e}")
             raise
     
-    def _process_ai(self, image, ops_log, times):
+    def _process_ai(self, image, config, ops_log, times):
         """Mode AI - Suppression de fond uniquement"""
         start = time.time()
-        result = self.bria.process(image)
+        result = self.bria.process(image, config)
         times['bg_removal'] = time.time() - start
         ops_log.append({'type': 'bg_removal', 'count': 1})
         return result
     
-    def _process_resize(self, image, params, ops_log, times):
+    def _process_resize(self, image, config, params, ops_log, times):
         """Mode Resize - Redimensionnement uniquement"""
         start = time.time()
-        width = params.get('width', self.config.get_int('resize_default_width', 1000))
-        height = params.get('height', self.config.get_int('resize_default_height', 1500))
+        width = params.get('width', config.get_int('resize_default_width', 1000))
+        height = params.get('height', config.get_int('resize_default_height', 1500))
         
-        result = self.resize.process(image, width, height)
+        planned = self.resize.plan(image.size, width, height, config) if self._uses_planner('resize', config) else None
+        if planned:
+            result = run_image_task('apply_plan', apply_plan, image, *planned)
+        else:
+            result = run_image_task('resize', self.resize.process, image, width, height, config)
         times['resize'] = time.time() - start
         ops_log.append({'type': 'resize', 'count': 1})
         return result
     
-    def _process_both(self, image, params, ops_log, times):
+    def _uses_planner(self, mode: str, config) -> bool:
+        """Modes où crop / resize / plafond Bria sont composés en un seul rééchantillonnage"""
+        if not config.get_bool('geometry_planner_enabled', True):
+            return False
+        if config.get('resize_mode', 'fill').lower() not in ('fill', 'fit', 'stretch'):
+            return False
+        if mode == 'both':
+            return config.get('pipeline_both_order', 'resize_then_ai') == 'resize_then_ai'
+        return mode in ('resize', 'all')
+    
+    def _bria_cap(self, config) -> Optional[int]:
+        """Plafond Bria intégré au plan (BriaProcessor n'a alors plus rien à réduire)"""
+        # Mode matte : Bria reçoit son propre proxy, la sortie reste à la taille cible
+        if config.get_bool('bria_matte_mode', False):
+            return None
+        if config.get_bool('bria_optimize_before', True):
+            return config.get_int('bria_max_size', 1500)
+        return None
+    
+    def _process_both(self, image, config, params, ops_log, times):
         """Mode Both - Resize + AI selon ordre configuré"""
-        order = self.config.get('pipeline_both_order', 'resize_then_ai')
-        width = params.get('width', self.config.get_int('resize_default_width', 1000))
-        height = params.get('height', self.config.get_int('resize_default_height', 1500))
+        order = config.get('pipeline_both_order', 'resize_then_ai')
+        width = params.get('width', config.get_int('resize_default_width', 1000))
+        height = params.get('height', config.get_int('resize_default_height', 1500))
         
         if order == 'resize_then_ai':
-            # 1. Resize
+            # 1. Resize (plafond Bria inclus dans le même rééchantillonnage)
             start = time.time()
-            image = self.resize.process(image, width, height)
+            planned = None
+            if self._uses_planner('both', config):
+                planned = self.resize.plan(image.size, width, height, config, max_size=self._bria_cap(config))
+            if planned:
+                image = run_image_task('apply_plan', apply_plan, image, *planned)
+            else:
+                image = run_image_task('resize', self.resize.process, image, width, height, config)
             times['resize'] = time.time() - start
             ops_log.append({'type': 'resize', 'count': 1})
             
             # 2. AI
             start = time.time()
-            result = self.bria.process(image)
+            result = self.bria.process(image, config)
             times['bg_removal'] = time.time() - start
             ops_log.append({'type': 'bg_removal', 'count': 1})
             
         else:  # ai_then_resize
             # 1. AI
             start = time.time()
-            image = self.bria.process(image)
+            image = self.bria.process(image, config)
             times['bg_removal'] = time.time() - start
             ops_log.append({'type': 'bg_removal', 'count': 1})
             
             # 2. Resize
             start = time.time()
-            result = self.resize.process(image, width, height)
+            result = run_image_task('resize', self.resize.process, image, width, height, config)
             times['resize'] = time.time() - start
             ops_log.append({'type': 'resize', 'count': 1})
         
         return result
     
-    def _process_crop_head(self, image, params, ops_log, times):
+    def _process_crop_head(self, image, config, params, ops_log, times):
         """Mode Crop-Head - Détection visage avec resize optionnel"""
         # 1. Crop head
         start = time.time()
         try:
-            image = self.crop_head.process(image)
+            image = run_image_task('crop_head', self.crop_head.process, image, config)
             times['head_crop'] = time.time() - start
             ops_log.append({'type': 'head_crop', 'count': 1})
         except Exception as e:
             logger.warning(f"Smart crop failed: {e}")
-            if not self.config.get_bool('pipeline_continue_on_crop_fail', True):
+            if not config.get_bool('pipeline_continue_on_crop_fail', True):
                 raise
             # Continuer avec l'image originale
             times['head_crop'] = time.time() - start
@@ -305,30 +608,36 @@ class UnifiedProcessor:
         if params.get('width') and params.get('height'):
             start = time.time()
             try:
-                image = self.resize.process(image, params['width'], params['height'])
+                image = run_image_task('resize', self.resize.process, image,
+                                       params['width'], params['height'], config)
                 times['resize_in_crop'] = time.time() - start
             except Exception as e:
-                if not self.config.get_bool('pipeline_continue_on_resize_fail', True):
+                if not config.get_bool('pipeline_continue_on_resize_fail', True):
                     raise
                 logger.warning(f"Resize failed in crop-head: {e}")
         
         return image
     
-    def _process_all(self, image, params, ops_log, times):
+    def _process_all(self, image, config, params, ops_log, times):
         """Mode All - Pipeline complet: Crop → Resize → AI"""
-        width = params.get('width', self.config.get_int('resize_default_width', 1000))
-        height = params.get('height', self.config.get_int('resize_default_height', 1500))
+        width = params.get('width', config.get_int('resize_default_width', 1000))
+        height = params.get('height', config.get_int('resize_default_height', 1500))
+        
+        if self._uses_planner('all', config):
+            image = self._crop_resize_planned(image, config, width, height, ops_log, times)
+            if image is not None:
+                return self._bria_in_all(image, config, ops_log, times)
         
         # 1. Crop head (continue si échec)
         start = time.time()
         try:
-            image = self.crop_head.process(image)
+            image = run_image_task('crop_head', self.crop_head.process, image, config)
             times['head_crop'] = time.time() - start
             ops_log.append({'type': 'head_crop', 'count': 1})
             logger.info("Smart crop successful in 'all' mode")
         except Exception as e:
             logger.warning(f"Smart crop failed in 'all' mode: {e}")
-            if not self.config.get_bool('pipeline_continue_on_crop_fail', True):
+            if not config.get_bool('pipeline_continue_on_crop_fail', True):
                 raise
             times['head_crop'] = time.time() - start
             # Continuer avec l'image originale
@@ -336,21 +645,59 @@ class UnifiedProcessor:
         # 2. Resize (continue avec dimensions originales si échec)
         start = time.time()
         try:
-            image = self.resize.process(image, width, height)
+            image = run_image_task('resize', self.resize.process, image, width, height, config)
             times['resize'] = time.time() - start
             ops_log.append({'type': 'resize', 'count': 1})
             logger.info("Resize successful in 'all' mode")
         except Exception as e:
             logger.warning(f"Resize failed in 'all' mode: {e}")
-            if not self.config.get_bool('pipeline_continue_on_resize_fail', True):
+            if not config.get_bool('pipeline_continue_on_resize_fail', True):
                 raise
             times['resize'] = time.time() - start
             # Continuer avec dimensions originales
         
         # 3. AI (erreur immédiate si échec)
+        return self._bria_in_all(image, config, ops_log, times)
+    
+    def _crop_resize_planned(self, image, config, width, height, ops_log, times):
+        """
+        Crop sous la bouche + resize + plafond Bria en un seul rééchantillonnage depuis la source.
+        Retourne None si le mode de resize n'est pas planifiable (pipeline classique).
+        """
+        if self.resize.plan(image.size, width, height, config) is None:
+            return None
+        
+        # 1. Détection seule : la zone de crop devient la région source du plan
         start = time.time()
+        region = None
         try:
-            result = self.bria.process(image)
+            region = run_image_task('crop_region', self.crop_head.crop_region, image, config)
+            ops_log.append({'type': 'head_crop', 'count': 1})
+            if region is None:
+                logger.warning("Face detection failed, keeping full image in 'all' mode")
+            else:
+                logger.info("Smart crop successful in 'all' mode")
+        except Exception as e:
+            logger.warning(f"Smart crop failed in 'all' mode: {e}")
+            if not config.get_bool('pipeline_continue_on_crop_fail', True):
+                raise
+        times['head_crop'] = time.time() - start
+        
+        # 2. Un seul resample : région → dimensions cibles → plafond Bria
+        start = time.time()
+        planned = self.resize.plan(image.size, width, height, config, region=region,
+                                   max_size=self._bria_cap(config))
+        image = run_image_task('apply_plan', apply_plan, image, *planned)
+        times['resize'] = time.time() - start
+        ops_log.append({'type': 'resize', 'count': 1})
+        logger.info(f"Resize successful in 'all' mode ({planned[0]})")
+        return image
+    
+    def _bria_in_all(self, image, config, ops_log, times):
+        """Étape AI du mode All (erreur immédiate si échec)"""
+        start = time.time()
+        try:
+            result = self.bria.process(image, config)
             times['bg_removal'] = time.time() - start
             ops_log.append({'type': 'bg_removal', 'count': 1})
             logger.info("AI background removal successful in 'all' mode")
@@ -385,11 +732,20 @@ class UnifiedProcessor:
 # ==================== APPLICATION FLASK ====================
 
 app = Flask(__name__)
+# Corps lus en streaming : limite par endpoint (voir _upload_limits), gros fichiers spoolés sur disque
+app.request_class = StreamingRequest
+app.config['MAX_CONTENT_LENGTH'] = DEFAULT_MAX_CONTENT_LENGTH
 CORS(app, origins=['http://localhost:5173', 'http://localhost:5174'])  # Frontend React
 
 # Initialiser le processeur global
 processor = None
 
+# Profils des requêtes profilées (répertoire partagé entre workers)
+profiles = ProfileStore()
+
+# Jobs asynchrones (initialisés avec le processeur, voir get_jobs)
+jobs = None
+
 def init_processor():
     """Initialise le processeur (appelé au démarrage)"""
     global processor
@@ -403,9 +759,234 @@ def get_processor():
     global processor
     if processor is None:
         init_processor()
+    elif processor.pid != os.getpid():
+        # Processeur construit dans le master (preload_app) : premier appel dans le worker
+        processor.after_fork()
     return processor
 
 
+# Endpoints de traitement suivis par les métriques (nom Flask -> label)
+METRIC_ENDPOINTS = {
+    'process_endpoint': 'process',
+    'process_batch_endpoint': 'batch',
+}
+
+
+@app.before_request
+def _metrics_start():
+    endpoint = METRIC_ENDPOINTS.get(request.endpoint)
+    if endpoint is not None:
+        g.metrics_endpoint = endpoint
+        g.metrics_start = time.time()
+        metrics.INFLIGHT.inc()
+
+
+@app.after_request
+def _metrics_observe(response):
+    endpoint = g.pop('metrics_endpoint', None)
+    if endpoint is not None:
+        metrics.INFLIGHT.dec()
+        # Pour un batch en streaming, la durée s'arrête au début de l'envoi des résultats
+        metrics.observe_request(
+            endpoint, request.args.get('mode'), response.status_code,
+            time.time() - g.pop('metrics_start'), request.content_length,
+            response.headers.get('Content-Length', type=int)
+        )
+    return response
+
+
+@app.teardown_request
+def _metrics_teardown(error=None):
+    # after_request n'est pas appelé si une exception remonte jusqu'à Flask
+    if g.pop('metrics_endpoint', None) is not None:
+        metrics.INFLIGHT.dec()
+
+
+# Endpoints qui reçoivent des uploads (nom Flask -> lot d'images)
+UPLOAD_ENDPOINTS = {
+    'process_endpoint': False,
+    'submit_job': False,
+    'process_batch_endpoint': True,
+}
+
+
+@app.before_request
+def _upload_limits():
+    batch = UPLOAD_ENDPOINTS.get(request.endpoint)
+    if batch is None:
+        return
+    config = get_processor().config
+    request.body_limit = request_body_limit(config, batch)
+    request.spool_threshold = config.get_int('upload_spool_threshold_kb', 512) * 1024
+    # Corps lu ici, avant la vue : un dépassement part en 413 au lieu d'être avalé par son except
+    request.files
+
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'bmp'}
+
+
+def is_allowed_filename(filename: str) -> bool:
+    """Vérifie l'extension du fichier uploadé"""
+    filename = filename.lower()
+    return any(filename.endswith(ext) for ext in ALLOWED_EXTENSIONS)
+
+
+def run_pipeline(proc: UnifiedProcessor, mode: str, data: bytes, params: Dict,
+                 progress: Optional[Callable[[str, float], None]] = None,
+                 output_format: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Pipeline complet d'une image : cache, décodage, traitement, encodage.
+    
+    Lève ValueError pour les erreurs de validation (400), PixelBudgetExceeded si le worker n'a plus
+    de place pour décoder l'image (503), Exception pour les erreurs de traitement.
+    progress(étape, durée) est appelé à la fin de chaque étape (jobs asynchrones).
+    output_format : format négocié avec le client (défaut : output_format_<mode>).
+    
+    Returns:
+        Dict avec 'data' (octets) ou 'path' (fichier en cache), 'mimetype', 'extension',
+        'operations', 'total_time' et 'cache' (HIT, MISS ou BYPASS)
+    """
+    # Un seul snapshot de configuration pour toute la requête (clé de cache comprise)
+    config = proc.config.snapshot()
+    pipeline_start = time.time()
+    output_format = output_format or configured_format(config, mode)
+    
+    cache_key = None
+    if config.get_bool('result_cache_enabled', True):
+        cache_key = proc.cache.make_key(data, mode, params, config, output_format)
+        cached = proc.cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Result cache hit - Mode: {mode}")
+            lookup_time = time.time() - pipeline_start
+            if progress is not None:
+                progress('cache', lookup_time)
+            return {
+                'data': cached.data,
+                'path': cached.path,
+                'mimetype': cached.meta['mimetype'],
+                'extension': cached.meta['extension'],
+                'operations': cached.meta['operations'],
+                'total_time': 0.0,
+                'timings': {'cache': lookup_time, 'total': lookup_time},
+                'cache': 'HIT'
+            }
+    
+    # Valider sur l'en-tête, réserver les pixels décodés dans le budget du worker, puis décoder
+    image, plans = proc.ingest.open(data, mode, params, config)
+    start = time.time()
+    with proc.pixel_budget.reserve(plans, config) as plan, proc.memory.sample(mode, config) as probe:
+        budget_wait = time.time() - start
+        # Requête échantillonnée : relevé mémoire à la fin de chaque étape
+        stage_progress = probe.wrap(progress) if probe is not None else progress
+        
+        start = time.time()
+        image = run_cpu(proc.ingest.decode, image, plan)
+        decode_time = time.time() - start
+        if stage_progress is not None:
+            stage_progress('decode', decode_time)
+        
+        logger.info(f"Processing with params: {params}")
+        
+        # Traiter l'image
+        result, metadata = proc.process_image(mode, image, params, config, stage_progress, output_format)
+        
+        # Encoder le résultat
+        output_format = metadata['output_format']
+        quality = config.get_int('output_quality', 95)
+        start = time.time()
+        payload, mimetype, extension = run_image_task('encode', encode_result, result, output_format, quality,
+                                                      encoder_options(config, mode))
+        operations = [op['type'] for op in metadata['operations']]
+        encode_time = time.time() - start
+        if stage_progress is not None:
+            stage_progress('encode', encode_time)
+        # Pixels libérés avant de rendre la réservation
+        del image, result
+    metrics.observe_stages(mode, dict(metadata['processing_times'], decode=decode_time, encode=encode_time))
+    
+    timings = dict(decode=decode_time, **metadata['processing_times'], encode=encode_time,
+                   total=time.time() - pipeline_start)
+    if budget_wait >= 0.001:
+        # Attente d'une place dans le budget de pixels du worker
+        timings = dict(budget=budget_wait, **timings)
+
+    if plan.reduced:
+        # Résultat dégradé (décodé sous la résolution de travail) : servi mais pas mis en cache,
+        # sinon il serait resservi à l'identique une fois le budget libéré
+        cache_key = None
+
+    if cache_key is not None:
+        proc.cache.put(cache_key, payload, {
+            'mimetype': mimetype,
+            'extension': extension,
+            'operations': operations
+        })
+    
+    return {
+        'data': payload,
+        'path': None,
+        'mimetype': mimetype,
+        'extension': extension,
+        'operations': operations,
+        'total_time': metadata['total_time'],
+        'timings': timings,
+        'cache': 'MISS' if cache_key is not None else 'BYPASS'
+    }
+
+
+def _processing_error_body(proc: UnifiedProcessor, error: Exception, mode: str) -> Dict[str, Any]:
+    """Corps JSON d'une erreur de traitement (détails selon la config)"""
+    if proc.config.get_bool('error_details_in_response', False):
+        return {
+            'error': str(error),
+            'type': type(error).__name__,
+            'mode': mode
+        }
+    return {'error': 'Processing failed'}
+
+
+def _request_params() -> Dict[str, int]:
+    """Récupère width/height depuis la query string"""
+    params = {
+        'width': request.args.get('width', type=int),
+        'height': request.args.get('height', type=int)
+    }
+    
+    # Filtrer les None
+    return {k: v for k, v in params.items() if v is not None}
+
+
+def _accepts_webp() -> bool:
+    """image/webp annoncé explicitement dans Accept (*/* ne suffit pas : fetch() l'envoie par défaut)"""
+    return any(value == 'image/webp' and quality > 0 for value, quality in request.accept_mimetypes)
+
+
+def _output_format(proc: UnifiedProcessor, mode: str) -> str:
+    """Format négocié : ?format=, puis WebP avec alpha si accepté, puis output_format_<mode> (ValueError si inconnu)"""
+    accepts_webp = proc.config.get_bool('output_negotiate_webp', True) and _accepts_webp()
+    return negotiate_format(configured_format(proc.config, mode), request.args.get('format'), accepts_webp)
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """Valeur de l'en-tête Server-Timing (durées en millisecondes)"""
+    return ', '.join(f"{name};dur={duration * 1000:.1f}" for name, duration in timings.items())
+
+
+def _admin_authorized() -> bool:
+    """X-Admin-Token valide ; refusé si ADMIN_TOKEN n'est pas configuré"""
+    expected_token = os.environ.get('ADMIN_TOKEN')
+    return bool(expected_token) and request.headers.get('X-Admin-Token') == expected_token
+
+
+def _add_processing_headers(response, mode: str, total_time: float, operations: list):
+    """Ajoute les métadonnées de traitement dans les headers"""
+    response.headers['X-Processing-Mode'] = mode
+    response.headers['X-Processing-Time'] = str(round(total_time, 2))
+    response.headers['X-Operations-Count'] = str(len(operations))
+    # Ajouter les opérations pour le comptage frontend
+    response.headers['X-Operations'] = ','.join(operations)
+
+
 @app.route('/process', methods=['POST'])
 @app.route('/api/process', methods=['POST'])
 def process_endpoint():
@@ -427,89 +1008,70 @@ def process_endpoint():
             return jsonify({'error': 'Invalid file'}), 400
         
         # Vérifier l'extension
-        allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'bmp'}
-        filename = file.filename.lower()
-        if not any(filename.endswith(ext) for ext in allowed_extensions):
-            return jsonify({'error': f'File type not allowed. Allowed: {", ".join(allowed_extensions)}'}), 400
+        if not is_allowed_filename(file.filename):
+            return jsonify({'error': f'File type not allowed. Allowed: {", ".join(ALLOWED_EXTENSIONS)}'}), 400
         
-        # Charger l'image
-        try:
-            image = Image.open(file.stream)
-            # Convertir en RGB/RGBA si nécessaire
-            if image.mode not in ['RGB', 'RGBA']:
-                image = image.convert('RGBA')
-        except Exception as e:
-            logger.error(f"Failed to open image: {e}")
-            return jsonify({'error': 'Invalid image file'}), 400
-        
-        # Récupérer les paramètres
-        params = {
-            'width': request.args.get('width', type=int),
-            'height': request.args.get('height', type=int)
-        }
-        
-        # Filtrer les None
-        params = {k: v for k, v in params.items() if v is not None}
+        params = _request_params()
         
-        logger.info(f"Processing with params: {params}")
+        # Profiling à la demande (admin uniquement) : X-Profile: 1
+        profile_id = None
+        profile_requested = request.headers.get('X-Profile', '').lower() in TRUE_VALUES
+        if profile_requested and not _admin_authorized():
+            return jsonify({'error': 'Unauthorized'}), 401
         
-        # Traiter l'image
+        # Traiter l'image (lue en place : octets en mémoire ou mmap du fichier spoolé)
         try:
-            result, metadata = proc.process_image(mode, image, params)
+            output_format = _output_format(proc, mode)
+            with upload_view(file) as data:
+                if profile_requested:
+                    result, profile_id = profiles.run(
+                        run_pipeline, proc, mode, data, params, label=f"mode={mode} params={params}",
+                        max_files=proc.config.get_int('profile_max_files', 50), output_format=output_format
+                    )
+                else:
+                    result = run_pipeline(proc, mode, data, params, output_format=output_format)
         except ValueError as e:
             # Erreur de validation (mode désactivé, image trop grande, etc.)
             logger.warning(f"Validation error: {e}")
             return jsonify({'error': str(e)}), 400
+        except BriaUnavailable as e:
+            # Bria saturé ou disjoncteur ouvert : le client peut réessayer plus tard
+            response = jsonify({'error': 'Background removal temporarily unavailable'})
+            response.headers['Retry-After'] = str(max(1, int(e.retry_after + 0.5)))
+            return response, 503
+        except PixelBudgetExceeded as e:
+            # Trop d'images en cours de décodage dans ce worker
+            logger.warning(f"Request rejected: {e}")
+            response = jsonify({'error': 'Server busy, retry later'})
+            response.headers['Retry-After'] = str(max(1, int(e.retry_after + 0.5)))
+            return response, 503
         except Exception as e:
             # Erreur de traitement
             logger.error(f"Processing error: {e}")
-            if proc.config.get_bool('error_details_in_response', False):
-                return jsonify({
-                    'error': str(e),
-                    'type': type(e).__name__,
-                    'mode': mode
-                }), 500
-            return jsonify({'error': 'Processing failed'}), 500
-        
-        # Préparer la réponse
-        output_format = metadata['output_format']
-        quality = proc.config.get_int('output_quality', 95)
-        
-        output = BytesIO()
-        
-        if output_format in ['jpg', 'jpeg']:
-            result.save(output, 'JPEG', quality=quality, optimize=True)
-            mimetype = 'image/jpeg'
-            extension = 'jpg'
-        elif output_format == 'webp':
-            result.save(output, 'WebP', quality=quality, lossless=False)
-            mimetype = 'image/webp'
-            extension = 'webp'
-        else:  # png
-            result.save(output, 'PNG', optimize=True)
-            mimetype = 'image/png'
-            extension = 'png'
-        
-        output.seek(0)
-        
-        # Créer la réponse
-        response = send_file(
-            output,
-            mimetype=mimetype,
-            as_attachment=False,
-            download_name=f'processed.{extension}'
-        )
-        
-        # Ajouter les métadonnées dans les headers
-        response.headers['X-Processing-Mode'] = mode
-        response.headers['X-Processing-Time'] = str(round(metadata['total_time'], 2))
-        response.headers['X-Operations-Count'] = str(len(metadata['operations']))
+            return jsonify(_processing_error_body(proc, e, mode)), 500
         
-        # Ajouter les opérations pour le comptage frontend
-        operations_str = ','.join([op['type'] for op in metadata['operations']])
-        response.headers['X-Operations'] = operations_str
+        # Créer la réponse (un résultat en cache sur disque est servi tel quel, sans ré-encodage)
+        download_name = f"processed.{result['extension']}"
+        if result['path'] is not None:
+            response = send_file(result['path'], mimetype=result['mimetype'], as_attachment=False,
+                                 download_name=download_name, conditional=False)
+        else:
+            response = send_file(
+                BytesIO(result['data']),
+                mimetype=result['mimetype'],
+                as_attachment=False,
+                download_name=download_name
+            )
+        _add_processing_headers(response, mode, result['total_time'], result['operations'])
+        response.headers['X-Cache'] = result['cache']
+        response.headers['Server-Timing'] = server_timing(result['timings'])
+        # Le format dépend de Accept : les caches HTTP ne doivent pas servir un WebP à un autre client
+        response.vary.add('Accept')
+        if profile_id is not None:
+            response.headers['X-Profile-Id'] = profile_id
+        operations_str = ','.join(result['operations'])
         
-        logger.info(f"Request completed - Mode: {mode}, Time: {metadata['total_time']:.2f}s, "
+        logger.info(f"Request completed - Mode: {mode}, Time: {result['total_time']:.2f}s, "
                    f"Operations: {operations_str}")
         
         return response
@@ -519,6 +1081,340 @@ def process_endpoint():
         return jsonify({'error': 'Internal server error'}), 500
 
 
+def _collect_batch_items(max_items: int) -> List[Tuple[str, bytes]]:
+    """Récupère les images du batch : champs 'images' multiples ou archive zip 'archive'"""
+    # Copiées en octets : la réponse est streamée après la fermeture des fichiers de la requête
+    items = []
+    for file in request.files.getlist('images'):
+        if file and file.filename:
+            items.append((file.filename, file.read()))
+    
+    archive = request.files.get('archive')
+    if archive and archive.filename:
+        max_entry_bytes = get_processor().config.get_int('max_file_size_mb', 10) * 1024 * 1024
+        try:
+            # L'archive est lue depuis son fichier spoolé, seules les entrées sont chargées
+            with zipfile.ZipFile(archive.stream) as zf:
+                for info in zf.infolist():
+                    if info.is_dir() or os.path.basename(info.filename).startswith('.'):
+                        continue
+                    if info.file_size > max_entry_bytes:
+                        # Entrée trop grande : signalée comme erreur d'item sans être décompressée
+                        items.append((info.filename, b''))
+                        continue
+                    items.append((info.filename, zf.read(info)))
+                    if len(items) > max_items:
+                        break
+        except zipfile.BadZipFile:
+            raise ValueError('Invalid zip archive')
+    
+    if len(items) > max_items:
+        raise ValueError(f"Too many images in batch: max {max_items}")
+    return items
+
+
+def _pipeline_outcome(proc: UnifiedProcessor, mode: str, params: Dict, label: str, filename: str,
+                      data: bytes, progress: Optional[Callable[[str, float], None]] = None,
+                      output_format: Optional[str] = None) -> Dict[str, Any]:
+    """Traite une image hors requête (batch, job) ; les erreurs sont retournées au lieu d'être levées"""
+    try:
+        if not is_allowed_filename(filename):
+            raise ValueError(f'File type not allowed. Allowed: {", ".join(ALLOWED_EXTENSIONS)}')
+        if not data:
+            raise ValueError('Empty or oversized file')
+        result = run_pipeline(proc, mode, data, params, progress, output_format)
+        if result['data'] is None:
+            with open(result['path'], 'rb') as f:
+                result['data'] = f.read()
+        result['status'] = 200
+    except ValueError as e:
+        logger.warning(f"{label} validation error: {e}")
+        result = {'status': 400, 'error': {'error': str(e)}}
+    except BriaUnavailable as e:
+        logger.warning(f"{label} rejected: {e}")
+        result = {'status': 503, 'error': {'error': 'Background removal temporarily unavailable'}}
+    except PixelBudgetExceeded as e:
+        logger.warning(f"{label} rejected: {e}")
+        result = {'status': 503, 'error': {'error': 'Server busy, retry later'}}
+    except Exception as e:
+        logger.error(f"{label} processing error: {e}")
+        result = {'status': 500, 'error': _processing_error_body(proc, e, mode)}
+    return result
+
+
+def _batch_item(proc: UnifiedProcessor, mode: str, params: Dict, index: int,
+                filename: str, data: bytes, output_format: Optional[str] = None) -> Dict[str, Any]:
+    """Traite un item du batch ; les erreurs sont retournées au lieu d'être levées"""
+    result = _pipeline_outcome(proc, mode, params, f"Batch item {index}", filename, data,
+                               output_format=output_format)
+    result['index'] = index
+    result['filename'] = filename
+    return result
+
+
+def _batch_part(boundary: str, item: Dict[str, Any], mode: str) -> bytes:
+    """Sérialise un item du batch en partie multipart/mixed"""
+    stem = os.path.splitext(os.path.basename(item['filename']))[0] or f"image_{item['index']}"
+    headers = [
+        f"X-Item-Index: {item['index']}",
+        f"X-Item-Status: {item['status']}",
+        f"X-Processing-Mode: {mode}",
+    ]
+    if item['status'] == 200:
+        body = item['data']
+        headers += [
+            f"Content-Type: {item['mimetype']}",
+            f"Content-Disposition: inline; filename=\"{stem}.{item['extension']}\"",
+            f"X-Processing-Time: {round(item['total_time'], 2)}",
+            f"X-Operations: {','.join(item['operations'])}",
+            f"X-Cache: {item['cache']}",
+            f"Server-Timing: {server_timing(item['timings'])}",
+        ]
+    else:
+        error = dict(item['error'], index=item['index'], filename=item['filename'])
+        body = json.dumps(error).encode('utf-8')
+        headers.append('Content-Type: application/json')
+    headers.append(f"Content-Length: {len(body)}")
+    head = f"--{boundary}\r\n" + '\r\n'.join(headers) + '\r\n\r\n'
+    return head.encode('utf-8') + body + b'\r\n'
+
+
+@app.route('/api/process/batch', methods=['POST'])
+def process_batch_endpoint():
+    """
+    Traitement d'un lot d'images en une seule requête.
+    
+    Les images arrivent en champs 'images' multiples ou dans une archive zip 'archive'.
+    Le décodage / crop / resize d'un item tourne pendant que les précédents attendent Bria ;
+    les résultats sont streamés en multipart/mixed dans l'ordre de complétion.
+    """
+    try:
+        proc = get_processor()
+        mode = request.args.get('mode', proc.config.get('default_mode', 'ai'))
+        params = _request_params()
+        max_items = proc.config.get_int('batch_max_items', 50)
+        
+        try:
+            output_format = _output_format(proc, mode)
+            items = _collect_batch_items(max_items)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not items:
+            return jsonify({'error': 'No image provided'}), 400
+        
+        concurrency = max(1, min(proc.config.get_int('batch_concurrency', 4), len(items)))
+        logger.info(f"Processing batch - Mode: {mode}, Items: {len(items)}, Concurrency: {concurrency}")
+        boundary = uuid.uuid4().hex
+        
+        def generate():
+            start = time.time()
+            failed = 0
+            executor = ThreadPoolExecutor(max_workers=concurrency)
+            try:
+                futures = [
+                    executor.submit(_batch_item, proc, mode, params, index, filename, data, output_format)
+                    for index, (filename, data) in enumerate(items)
+                ]
+                for future in as_completed(futures):
+                    item = future.result()
+                    if item['status'] != 200:
+                        failed += 1
+                    yield _batch_part(boundary, item, mode)
+                yield f"--{boundary}--\r\n".encode('utf-8')
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+            logger.info(f"Batch completed - Mode: {mode}, Items: {len(items)}, Failed: {failed}, "
+                        f"Time: {time.time() - start:.2f}s")
+        
+        response = Response(generate(), mimetype=f'multipart/mixed; boundary={boundary}')
+        response.headers['X-Batch-Count'] = str(len(items))
+        response.headers['X-Processing-Mode'] = mode
+        response.vary.add('Accept')
+        return response
+        
+    except Exception as e:
+        logger.error(f"Unexpected error in batch endpoint: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+def get_jobs() -> JobManager:
+    """Gestionnaire de jobs (lazy, comme le processeur)"""
+    global jobs
+    if jobs is None:
+        proc = get_processor()
+        
+        def runner(mode, data, params, filename, output_format, progress):
+            return _pipeline_outcome(proc, mode, params, 'Job', filename, data, progress, output_format)
+        
+        jobs = JobManager(proc.config, runner)
+    return jobs
+
+
+# Durée d'un flux SSE par défaut sous gevent (sous le timeout gunicorn)
+SSE_GEVENT_MAX_SECONDS = 100
+
+
+def _sse_max_seconds(config) -> float:
+    """
+    Durée max d'un flux SSE ; 0 si le flux n'est pas servi.
+    
+    Par défaut, servi uniquement sous gevent : un worker sync reste bloqué pendant toute la
+    durée du flux, le client suit alors le job par polling de /api/jobs/<id>.
+    """
+    default = SSE_GEVENT_MAX_SECONDS if gevent_active() else 0
+    return config.get_float('jobs_sse_max_seconds', default)
+
+
+def _job_body(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Vue publique d'un job, avec les URLs de suivi"""
+    body = {key: job[key] for key in (
+        'id', 'status', 'mode', 'params', 'created_at', 'started_at', 'finished_at', 'stages', 'result', 'error'
+    )}
+    body['status_url'] = f"/api/jobs/{job['id']}"
+    if _sse_max_seconds(get_jobs().config) > 0:
+        body['events_url'] = f"/api/jobs/{job['id']}/events"
+    if job['status'] == JOB_DONE:
+        body['result_url'] = f"/api/jobs/{job['id']}/result"
+    return body
+
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """
+    Traitement asynchrone : retourne immédiatement un identifiant de job (202).
+    
+    Mêmes paramètres que /api/process ; l'état se suit par polling de /api/jobs/<id>
+    ou par le flux SSE /api/jobs/<id>/events, le résultat est servi par /api/jobs/<id>/result.
+    """
+    try:
+        proc = get_processor()
+        if not proc.config.get_bool('jobs_enabled', True):
+            return jsonify({'error': 'Asynchronous jobs are disabled'}), 404
+        mode = request.args.get('mode', proc.config.get('default_mode', 'ai'))
+        
+        if 'image' not in request.files:
+            return jsonify({'error': 'No image provided'}), 400
+        
+        file = request.files['image']
+        if not file or file.filename == '':
+            return jsonify({'error': 'Invalid file'}), 400
+        
+        if not is_allowed_filename(file.filename):
+            return jsonify({'error': f'File type not allowed. Allowed: {", ".join(ALLOWED_EXTENSIONS)}'}), 400
+        
+        try:
+            output_format = _output_format(proc, mode)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        try:
+            # Copie en octets : le job s'exécute après la fermeture des fichiers de la requête
+            job = get_jobs().submit(mode, file.read(), _request_params(), file.filename, output_format)
+        except JobRejected as e:
+            logger.warning(f"Job rejected: {e}")
+            response = jsonify({'error': 'Too many pending jobs, retry later'})
+            response.headers['Retry-After'] = str(max(1, int(e.retry_after + 0.5)))
+            return response, 503
+        
+        response = jsonify(_job_body(job))
+        response.headers['Location'] = f"/api/jobs/{job['id']}"
+        return response, 202
+        
+    except Exception as e:
+        logger.error(f"Unexpected error in job submission: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """État d'un job (quel que soit le worker qui l'exécute)"""
+    job = get_jobs().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    return jsonify(_job_body(job))
+
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Image résultat d'un job terminé ; l'erreur du traitement (avec son code) si le job a échoué"""
+    manager = get_jobs()
+    job = manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    if job['status'] == JOB_FAILED:
+        return jsonify(job['error']), job['http_status']
+    
+    path = manager.result_path(job)
+    if path is None:
+        response = jsonify({'error': 'Job not finished', 'status': job['status']})
+        response.headers['Retry-After'] = '1'
+        return response, 409
+    
+    result = job['result']
+    response = send_file(path, mimetype=result['mimetype'], as_attachment=False,
+                         download_name=f"processed.{result['extension']}", conditional=False)
+    _add_processing_headers(response, job['mode'], result['total_time'], result['operations'])
+    response.headers['X-Cache'] = result['cache']
+    response.headers['Server-Timing'] = server_timing(
+        {stage['name']: stage['duration_ms'] / 1000 for stage in job['stages']}
+    )
+    return response
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """
+    Flux SSE de progression : un événement 'progress' par changement d'état, puis 'done' ou 'failed'.
+    
+    Le flux est coupé après jobs_sse_max_seconds (sous le timeout gunicorn) ; EventSource se
+    reconnecte automatiquement et reçoit l'état courant. Sur un worker sync (par défaut), 409 :
+    le client suit le job par polling de status_url.
+    """
+    manager = get_jobs()
+    if manager.get(job_id) is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    max_seconds = _sse_max_seconds(manager.config)
+    if max_seconds <= 0:
+        return jsonify({
+            'error': 'Progress stream unavailable on this server, poll status_url instead',
+            'status_url': f"/api/jobs/{job_id}",
+        }), 409
+    
+    def generate():
+        yield "retry: 1000\n\n"
+        last_sent = time.time()
+        for job in manager.watch(job_id, max_seconds):
+            if job is not None:
+                event = job['status'] if job['status'] in TERMINAL_STATUSES else 'progress'
+                yield _sse_event(event, _job_body(job))
+                last_sent = time.time()
+            elif time.time() - last_sent >= 15:
+                # Keep-alive pour les proxies qui coupent les connexions inactives
+                yield ": keep-alive\n\n"
+                last_sent = time.time()
+    
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Métriques Prometheus agrégées sur tous les workers"""
+    bria_limiter = None
+    try:
+        bria_limiter = get_processor().bria.limiter.stats()
+    except Exception as e:
+        logger.warning(f"Could not read Bria limiter state: {e}")
+    body, content_type = metrics.render(bria_limiter)
+    return Response(body, mimetype=content_type.split(';')[0], headers={'Content-Type': content_type})
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check avec statut des modes et configuration"""
@@ -555,10 +1451,21 @@ def health_check():
                 'resize_tool': proc.config.get('resize_tool'),
                 'nose_crop_ratio': proc.config.get('nose_position_ratio'),
                 'bria_configured': bool(proc.config.get('bria_api_token')),
+                'config_source': proc.config.snapshot().source,
+                'config_version': proc.config.snapshot().version,
                 'config_age_seconds': (
                     (datetime.now() - proc.config.last_refresh).total_seconds()
                     if proc.config.last_refresh else -1
                 )
+            },
+            'cache': proc.cache.stats(),
+            'bria_cache': proc.bria.response_cache.stats(),
+            'bria_limiter': proc.bria.limiter.stats(),
+            'jobs': get_jobs().stats(),
+            'memory': {
+                'rss_mb': round(current_rss() / (1024 * 1024), 1),
+                'peak_rss_mb': round(peak_rss() / (1024 * 1024), 1),
+                'pixel_budget': proc.pixel_budget.stats()
             }
         })
     except Exception as e:
@@ -577,18 +1484,31 @@ def reload_config():
         if expected_token and admin_token != expected_token:
             return jsonify({'error': 'Unauthorized'}), 401
         
-        # Recharger la configuration
+        # Recharger la configuration (publiée aux autres workers via le snapshot partagé)
         proc = get_processor()
-        proc.config.load_settings()
+        if not proc.config.load_settings():
+            # Échec : le dernier snapshot valide reste en service, rien n'est publié
+            snapshot = proc.config.snapshot()
+            return jsonify({
+                'error': 'Failed to reload configuration from database',
+                'config_source': snapshot.source,
+                'config_version': snapshot.version,
+                'loaded_at': snapshot.loaded_at.isoformat()
+            }), 503
         
-        # Réinitialiser les détecteurs si nécessaire
-        proc.crop_head._init_detector()
+        # Réinitialiser les détecteurs si nécessaire (les autres workers le font au prochain crop ;
+        # pas de chargement d'OpenCV si aucun crop n'a encore eu lieu)
+        if proc.crop_head.detector is not None:
+            proc.crop_head._init_detector()
         
         logger.info("Configuration reloaded by admin")
         
+        snapshot = proc.config.snapshot()
         return jsonify({
             'status': 'Configuration reloaded successfully',
-            'settings_count': len(proc.config.settings),
+            'settings_count': len(snapshot.settings),
+            'config_version': snapshot.version,
+            'shared_across_workers': proc.config.shared is not None,
             'timestamp': datetime.now().isoformat()
         })
         
@@ -597,6 +1517,25 @@ def reload_config():
         return jsonify({'error': f'Failed to reload: {e}'}), 500
 
 
+@app.route('/admin/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """Profil d'une requête : résumé texte, ou fichier pstats avec ?format=pstats"""
+    if not _admin_authorized():
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    if request.args.get('format') == 'pstats':
+        path = profiles.stats_path(profile_id)
+        if path is None:
+            return jsonify({'error': 'Profile not found'}), 404
+        return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                         download_name=f"{profile_id}.prof")
+    
+    path = profiles.summary_path(profile_id)
+    if path is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_file(path, mimetype='text/plain')
+
+
 @app.route('/test', methods=['GET'])
 def test_endpoint():
     """Endpoint de test simple"""
@@ -608,15 +1547,23 @@ def test_endpoint():
 
 @app.errorhandler(413)
 def request_entity_too_large(error):
-    """Gestion des fichiers trop gros"""
+    """Gestion des fichiers trop gros (rejetés pendant la lecture du corps, voir _upload_limits)"""
+    batch = UPLOAD_ENDPOINTS.get(request.endpoint)
     try:
         proc = get_processor()
-        max_size = proc.config.get_int('max_file_size_mb', 10)
+        if batch:
+            max_size = proc.config.get_int('batch_max_request_mb', 100)
+        else:
+            max_size = proc.config.get_int('max_file_size_mb', 10)
     except:
-        max_size = 10
-    return jsonify({
-        'error': f'File too large. Maximum size: {max_size}MB'
-    }), 413
+        max_size = 100 if batch else 10
+    if batch:
+        message = f'Batch too large. Maximum size: {max_size}MB'
+    elif batch is None:
+        message = 'Request too large'
+    else:
+        message = f'File too large. Maximum size: {max_size}MB'
+    return jsonify({'error': message}), 413
 
 
 # Add explicit favicon route BEFORE the catch-all route
@@ -0,0 +1,144 @@
+"""
+Benchmark de l'encodage de l'upload Bria (taille du payload / latence d'aller-retour)
+
+Chaque configuration d'encodage est décrite par format:qualité[:budget_kb], par exemple
+jpeg:95 (comportement historique), jpeg:95:300 (budget 300KB), progressive_jpeg:85, webp:80.
+Sans --endpoint, un stand-in local (fake_bria.py) est démarré avec la latence et la bande
+passante montante indiquées, pour que la taille du payload pèse comme en production.
+
+Usage (depuis backend/) :
+    python benchmarks/bench_bria_upload.py --images ./catalog_sample \
+        --configs jpeg:95,jpeg:95:300,progressive_jpeg:85,webp:80 --bandwidth-mbps 20 --json upload.json
+"""
+
+import argparse
+import os
+import time
+from typing import Dict, List
+
+from bench_utils import environment_info, latency_summary, write_json
+
+import requests
+from PIL import Image
+
+from fake_bria import start_fake_bria
+from geometry import cap_size
+from upload_encoder import encode_upload
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+
+def parse_config(spec: str) -> Dict:
+    """'format:qualité[:budget_kb]' -> arguments de encode_upload"""
+    parts = spec.split(':')
+    config = {'upload_format': parts[0], 'quality': 95, 'max_bytes': 0}
+    if len(parts) > 1 and parts[1]:
+        config['quality'] = int(parts[1])
+    if len(parts) > 2 and parts[2]:
+        config['max_bytes'] = int(parts[2]) * 1024
+    return config
+
+
+def load_images(images_dir: str, max_size: int) -> List[Image.Image]:
+    """Images décodées et ramenées à bria_max_size, comme avant l'appel en production"""
+    images = []
+    for name in sorted(os.listdir(images_dir)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        image = Image.open(os.path.join(images_dir, name))
+        image.load()
+        size = cap_size(image.size, max_size)
+        if size != image.size:
+            image = image.resize(size, Image.LANCZOS)
+        images.append(image)
+    return images
+
+
+def bench_config(spec: str, images: List[Image.Image], session: requests.Session,
+                 endpoint: str, token: str, repeat: int) -> Dict:
+    config = parse_config(spec)
+    encode_times, round_trips, sizes, qualities = [], [], [], []
+    errors = 0
+
+    for _ in range(repeat):
+        for image in images:
+            start = time.perf_counter()
+            upload = encode_upload(image, **config)
+            encode_times.append(time.perf_counter() - start)
+            sizes.append(len(upload.data))
+            qualities.append(upload.quality)
+
+            start = time.perf_counter()
+            response = session.post(
+                endpoint,
+                headers={'api_token': token},
+                files={'file': (upload.filename, upload.data, upload.mimetype)},
+                timeout=120
+            )
+            round_trips.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    total = sum(encode_times) + sum(round_trips)
+    return {
+        'config': spec,
+        'requests': len(round_trips),
+        'errors': errors,
+        'payload_kb_mean': round(sum(sizes) / len(sizes) / 1024, 1),
+        'payload_kb_max': round(max(sizes) / 1024, 1),
+        'quality_mean': round(sum(qualities) / len(qualities), 1),
+        'encode': latency_summary(encode_times),
+        'round_trip': latency_summary(round_trips),
+        'throughput_ips': round(len(round_trips) / total, 2) if total else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', required=True, help="Répertoire d'images du catalogue")
+    parser.add_argument('--configs', default='jpeg:95,jpeg:95:300,progressive_jpeg:85,webp:80',
+                        help='Configurations format:qualité[:budget_kb] séparées par des virgules')
+    parser.add_argument('--max-size', type=int, default=1500, help='bria_max_size appliqué avant encodage')
+    parser.add_argument('--endpoint', help='Endpoint Bria réel (défaut : stand-in local)')
+    parser.add_argument('--token', default='benchmark', help='api_token envoyé')
+    parser.add_argument('--latency', type=float, default=0.5, help='Latence du stand-in (s)')
+    parser.add_argument('--bandwidth-mbps', type=float, default=20.0, help='Bande passante montante du stand-in')
+    parser.add_argument('--repeat', type=int, default=1, help='Passes sur le jeu d\'images')
+    parser.add_argument('--json', default='-', help='Fichier de sortie JSON (- pour stdout)')
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.max_size)
+    if not images:
+        parser.error('No images found')
+
+    server = None
+    endpoint = args.endpoint
+    if not endpoint:
+        server = start_fake_bria(latency=args.latency, bandwidth_mbps=args.bandwidth_mbps)
+        endpoint = server.endpoint
+
+    session = requests.Session()
+    try:
+        results = [bench_config(spec.strip(), images, session, endpoint, args.token, args.repeat)
+                   for spec in args.configs.split(',') if spec.strip()]
+    finally:
+        session.close()
+        if server is not None:
+            server.shutdown()
+
+    for result in results:
+        print(f"{result['config']:>22}: {result['payload_kb_mean']}KB "
+              f"encode p50={result['encode']['p50_ms']}ms "
+              f"round-trip p50={result['round_trip']['p50_ms']}ms p95={result['round_trip']['p95_ms']}ms")
+
+    write_json(args.json, {
+        'benchmark': 'bria_upload',
+        'environment': environment_info(),
+        'endpoint': endpoint if args.endpoint else 'fake_bria',
+        'stand_in': None if args.endpoint else {'latency': args.latency, 'bandwidth_mbps': args.bandwidth_mbps},
+        'results': results,
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark du pool de processus CPU (CPU_OFFLOAD_PROCESSES) contre les workers sync actuels
+
+Lance gunicorn avec chaque configuration, envoie le même trafic (load_test.LoadDriver) et
+compare débit, latences et utilisation CPU (temps CPU de gunicorn, de ses workers et des
+process du pool, rapporté à la durée et au nombre de cœurs).
+
+Une configuration s'écrit classe:workers:process, par exemple :
+    sync:4:0     4 workers sync, étapes CPU dans le worker (configuration actuelle)
+    gevent:2:8   2 workers gevent, chacun avec un pool de 8 process
+
+Le trafic par défaut (resize, crop-head) ne sollicite pas Bria ; pour inclure ai / both / all,
+pointer bria_endpoint sur benchmarks/fake_bria.py.
+
+Usage (depuis backend/) :
+    python benchmarks/bench_cpu_offload.py --images ./catalog_sample \
+        --configs sync:4:0,gevent:2:8 --concurrency 16 --duration 60 --json offload.json
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from bench_utils import BACKEND_DIR, environment_info, write_json
+from load_test import LoadDriver, load_payloads, parse_mix, summarize
+
+import requests
+
+
+def parse_configs(spec: str) -> List[Tuple[str, int, int]]:
+    """'sync:4:0,gevent:2:8' -> [(classe, workers, process)]"""
+    configs = []
+    for item in spec.split(','):
+        worker_class, workers, processes = item.strip().split(':')
+        configs.append((worker_class, int(workers), int(processes)))
+    return configs
+
+
+def _children_cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def start_server(worker_class: str, workers: int, processes: int, port: int, app: str,
+                 chdir: str) -> subprocess.Popen:
+    env = dict(os.environ, PORT=str(port), GUNICORN_WORKER_CLASS=worker_class,
+               GUNICORN_WORKERS=str(workers), CPU_OFFLOAD_PROCESSES=str(processes))
+    command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(BACKEND_DIR, 'gunicorn.conf.py'),
+               '--chdir', chdir, '--access-logfile', '/dev/null', '--log-level', 'warning', app]
+    server = subprocess.Popen(command, cwd=chdir, env=env)
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {server.returncode}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=2).status_code == 200:
+                return server
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    server.kill()
+    raise RuntimeError('gunicorn did not become healthy within 60s')
+
+
+def run_config(config: Tuple[str, int, int], args, payloads, mix) -> Dict:
+    worker_class, workers, processes = config
+    name = f"{worker_class}:{workers}:{processes}"
+    print(f"--- {name}", file=sys.stderr)
+
+    cpu_before = _children_cpu_seconds()
+    server = start_server(worker_class, workers, processes, args.port, args.app, args.chdir)
+    try:
+        url = f"http://127.0.0.1:{args.port}"
+        # Échauffement : imports, chargement du détecteur de visage, démarrage des pools
+        if args.warmup > 0:
+            LoadDriver(url, payloads, mix, args.width, args.height, args.timeout, args.seed).run(
+                args.concurrency, 0, args.warmup)
+        driver = LoadDriver(url, payloads, mix, args.width, args.height, args.timeout, args.seed)
+        elapsed = driver.run(args.concurrency, args.duration, args.requests)
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+    # Inclut l'échauffement et le démarrage : ordre de grandeur, pas une mesure exacte
+    cpu_seconds = _children_cpu_seconds() - cpu_before
+
+    summary = summarize(driver.results, elapsed)
+    overall = summary['overall']
+    print(f"{name}: {overall['throughput_rps']} req/s, errors={overall['error_rate']}, "
+          f"p50={overall['latency']['p50_ms']}ms p95={overall['latency']['p95_ms']}ms, "
+          f"cpu={cpu_seconds:.1f}s", file=sys.stderr)
+    return {
+        'config': name,
+        'worker_class': worker_class,
+        'workers': workers,
+        'cpu_offload_processes': processes,
+        'elapsed_seconds': round(elapsed, 3),
+        'cpu_seconds': round(cpu_seconds, 2),
+        'cpu_utilization': round(cpu_seconds / elapsed / (os.cpu_count() or 1), 3) if elapsed else 0.0,
+        'results': summary,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--configs', default=f"sync:4:0,gevent:2:{os.cpu_count() or 4}",
+                        help='Configurations classe:workers:process à comparer')
+    parser.add_argument('--images', help="Répertoire d'images (image synthétique sinon)")
+    parser.add_argument('--mix', default='resize=2,crop-head=1', help='Poids par mode')
+    parser.add_argument('--concurrency', type=int, default=16, help='Requêtes simultanées')
+    parser.add_argument('--duration', type=float, default=30.0, help='Durée par configuration (s)')
+    parser.add_argument('--requests', type=int, default=0, help='Requêtes par configuration (0 = illimité)')
+    parser.add_argument('--warmup', type=int, default=8, help="Requêtes d'échauffement par configuration")
+    parser.add_argument('--width', type=int, default=1000)
+    parser.add_argument('--height', type=int, default=1500)
+    parser.add_argument('--variants', type=int, default=10, help='Copies modifiées par image (anti-cache)')
+    parser.add_argument('--timeout', type=float, default=120.0, help='Timeout client par requête (s)')
+    parser.add_argument('--port', type=int, default=8950)
+    parser.add_argument('--app', default='app_unified:app', help='Application WSGI lancée par gunicorn')
+    parser.add_argument('--chdir', default=BACKEND_DIR, help="Répertoire de l'application")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', default='-', help='Fichier de sortie JSON (- pour stdout)')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    payloads = load_payloads(args.images, args.variants, args.seed)
+    results = [run_config(config, args, payloads, mix) for config in parse_configs(args.configs)]
+
+    write_json(args.json, {
+        'benchmark': 'cpu_offload',
+        'environment': environment_info(),
+        'parameters': {
+            'mix': dict(mix), 'concurrency': args.concurrency, 'duration': args.duration,
+            'requests': args.requests, 'width': args.width, 'height': args.height,
+            'variants': args.variants, 'images': len(payloads),
+        },
+        'results': results,
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Benchmark des profils d'encodage des résultats (output_encoder) : temps d'encodage / taille
+
+Chaque profil combine un format et des options d'encoder_options (voir PROFILES). Les images
+encodées sont des détourages RGBA (résultat des modes ai / both / all) et, pour le JPEG,
+leur version aplatie sur fond blanc comme dans le pipeline. Pour chaque profil : temps
+médian, taille de sortie et PSNR après aplatissement sur fond blanc (None si sans perte).
+
+Usage (depuis backend/) :
+    python benchmarks/bench_encoders.py --images ./cutouts --json encoders.json
+    python benchmarks/bench_encoders.py --size 1000x1500 --only png
+"""
+
+import argparse
+import io
+import math
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+from bench_utils import environment_info, write_json
+
+import numpy as np
+from PIL import Image
+
+from fake_bria import cutout
+from output_encoder import DEFAULT_ENCODER_OPTIONS, encode_result
+from upload_encoder import flatten_on_white
+
+IMAGE_EXTENSIONS = ('.png', '.webp')
+
+# (nom, format, options) : png-optimize, webp-lossy-m4 et jpeg-baseline-optimize = historique
+PROFILES = [
+    ('png-optimize', 'png', {}),
+    ('png-level1', 'png', {'png_optimize': False, 'png_compress_level': 1}),
+    ('png-level3', 'png', {'png_optimize': False, 'png_compress_level': 3}),
+    ('png-level6', 'png', {'png_optimize': False, 'png_compress_level': 6}),
+    ('png-level9', 'png', {'png_optimize': False, 'png_compress_level': 9}),
+    ('png-palette-level6', 'png', {'png_optimize': False, 'png_palette': True}),
+    ('png-palette-optimize', 'png', {'png_palette': True}),
+    ('webp-lossy-m0', 'webp', {'webp_method': 0}),
+    ('webp-lossy-m4', 'webp', {}),
+    ('webp-lossy-m6', 'webp', {'webp_method': 6}),
+    ('webp-lossless-m0-e0', 'webp', {'webp_lossless': True, 'webp_method': 0, 'webp_effort': 0}),
+    ('webp-lossless-m4-e80', 'webp', {'webp_lossless': True}),
+    ('jpeg-baseline', 'jpg', {'jpeg_optimize': False}),
+    ('jpeg-baseline-optimize', 'jpg', {}),
+    ('jpeg-progressive', 'jpg', {'jpeg_progressive': True}),
+]
+
+
+def synthetic_cutout(width: int, height: int) -> Image.Image:
+    """Détourage synthétique : dégradés + bruit (texture photo) sous un alpha elliptique doux"""
+    rng = np.random.default_rng(1)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)], axis=-1)
+    noise = rng.normal(0, 12, (height, width, 3))
+    pixels = np.clip(base + noise, 0, 255).astype(np.uint8)
+    return cutout(Image.fromarray(pixels, 'RGB'))
+
+
+def load_images(images_dir: Optional[str], size) -> List[Image.Image]:
+    images = []
+    if images_dir:
+        for name in sorted(os.listdir(images_dir)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                images.append(Image.open(os.path.join(images_dir, name)).convert('RGBA'))
+    return images or [synthetic_cutout(*size)]
+
+
+def psnr(reference: Image.Image, data: bytes) -> Optional[float]:
+    """
+    PSNR (dB) de l'image décodée, comparée aplatie sur fond blanc (ce que voit l'utilisateur :
+    les encodeurs peuvent modifier les couleurs des pixels transparents) ; None si identique
+    """
+    decoded = flatten_on_white(Image.open(io.BytesIO(data)))
+    diff = (np.asarray(flatten_on_white(reference), dtype=np.float64)
+            - np.asarray(decoded, dtype=np.float64))
+    mse = float(np.mean(diff * diff))
+    return None if mse == 0 else round(10 * math.log10(255 * 255 / mse), 2)
+
+
+def bench_profile(name: str, output_format: str, overrides: Dict, images: List[Image.Image],
+                  quality: int, repeat: int) -> Dict:
+    options = dict(DEFAULT_ENCODER_OPTIONS, **overrides)
+    sources = [flatten_on_white(image) if output_format == 'jpg' else image for image in images]
+
+    timings, sizes, scores = [], [], []
+    for source in sources:
+        encode_result(source, output_format, quality, options)  # échauffement
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            data, _, _ = encode_result(source, output_format, quality, options)
+            runs.append(time.perf_counter() - start)
+        timings.append(sorted(runs)[len(runs) // 2])
+        sizes.append(len(data))
+        scores.append(psnr(source, data))
+
+    lossy = [score for score in scores if score is not None]
+    return {
+        'profile': name,
+        'format': output_format,
+        'options': overrides,
+        'encode_ms': round(1000 * sum(timings) / len(timings), 2),
+        'size_kb': round(sum(sizes) / len(sizes) / 1024, 1),
+        'psnr_db': round(sum(lossy) / len(lossy), 2) if lossy else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='Répertoire de détourages PNG / WebP (synthétique sinon)')
+    parser.add_argument('--size', default='1000x1500', help='Taille du détourage synthétique')
+    parser.add_argument('--quality', type=int, default=95, help='output_quality (JPEG / WebP lossy)')
+    parser.add_argument('--repeat', type=int, default=3, help='Mesures par image (médiane)')
+    parser.add_argument('--only', help='Ne garder que les profils dont le nom contient ce texte')
+    parser.add_argument('--json', default='-', help='Fichier de sortie JSON (- pour stdout)')
+    args = parser.parse_args()
+
+    size = tuple(int(v) for v in args.size.lower().split('x'))
+    images = load_images(args.images, size)
+
+    results = []
+    for name, output_format, overrides in PROFILES:
+        if args.only and args.only not in name:
+            continue
+        result = bench_profile(name, output_format, overrides, images, args.quality, args.repeat)
+        results.append(result)
+        print(f"{name:<24} {result['encode_ms']:>9.1f}ms {result['size_kb']:>9.1f}KB "
+              f"psnr={result['psnr_db']}", file=sys.stderr)
+
+    write_json(args.json, {
+        'benchmark': 'encoders',
+        'environment': environment_info(),
+        'images': len(images),
+        'quality': args.quality,
+        'results': results,
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmark des backends de détection de visage (précision / latence)
+
+Exécute chaque backend sur un jeu d'images local étiqueté et mesure latence par image,
+débit, taux de détection et erreur sur la ligne de coupe.
+
+Le fichier de labels est un JSON {"nom_image.jpg": [[x, y, w, h], ...]} ; une liste vide
+signifie « pas de visage ». Sans fichier de labels, chaque image est supposée contenir un visage.
+
+Usage (depuis backend/) :
+    python benchmarks/bench_face_detectors.py --images ./catalog_sample --labels labels.json \
+        --backends haar,lbp,dnn --json face_bench.json
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from bench_utils import StaticConfig, environment_info, latency_summary, parse_settings, write_json
+
+from PIL import Image
+
+from crop_processor import CropHeadProcessor
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+
+def iou(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> float:
+    """Intersection over union de deux boxes (x, y, w, h)"""
+    ax2, ay2 = a[0] + a[2], a[1] + a[3]
+    bx2, by2 = b[0] + b[2], b[1] + b[3]
+    inter_w = max(0, min(ax2, bx2) - max(a[0], b[0]))
+    inter_h = max(0, min(ay2, by2) - max(a[1], b[1]))
+    inter = inter_w * inter_h
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union else 0.0
+
+
+def load_dataset(images_dir: str, labels_path: Optional[str]) -> List[Tuple[str, Optional[List]]]:
+    """Liste (chemin, boxes attendues) ; boxes à None si aucune annotation de position"""
+    labels = {}
+    if labels_path:
+        with open(labels_path, 'r', encoding='utf-8') as f:
+            labels = json.load(f)
+
+    dataset = []
+    for name in sorted(os.listdir(images_dir)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        if labels_path and name not in labels:
+            continue
+        dataset.append((os.path.join(images_dir, name), labels.get(name) if labels_path else None))
+    return dataset
+
+
+def bench_backend(backend: str, dataset, settings: Dict[str, str], iou_threshold: float) -> Dict:
+    config = StaticConfig(dict(settings, face_detector_backend=backend))
+    processor = CropHeadProcessor(config)
+    # Détecteur chargé à la première détection : chargé ici, hors des latences mesurées
+    processor.warm_up(config)
+    if processor.detector is None or processor.detector.name != backend:
+        return {'backend': backend, 'error': 'backend unavailable (see logs)'}
+
+    latencies = []
+    expected_faces = detected_faces = 0
+    no_face_images = false_positives = 0
+    line_errors = []
+
+    for path, boxes in dataset:
+        image = Image.open(path)
+        image.load()
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+
+        start = time.perf_counter()
+        faces = processor.detect_faces(image)
+        latencies.append(time.perf_counter() - start)
+
+        if boxes is not None and len(boxes) == 0:
+            no_face_images += 1
+            false_positives += 1 if faces else 0
+            continue
+
+        expected_faces += 1
+        if boxes is None:
+            detected_faces += 1 if faces else 0
+            continue
+
+        matched = any(iou(tuple(face), tuple(box)) >= iou_threshold for face in faces for box in boxes)
+        detected_faces += 1 if matched else 0
+        if faces:
+            # Erreur de la ligne de coupe (premier visage) en fraction de la hauteur de l'image
+            ratio = config.get_float('nose_position_ratio', 0.75)
+            predicted = faces[0][1] + faces[0][3] * ratio
+            expected = boxes[0][1] + boxes[0][3] * ratio
+            line_errors.append(abs(predicted - expected) / image.size[1])
+
+    total_time = sum(latencies)
+    return {
+        'backend': backend,
+        'images': len(dataset),
+        'latency': latency_summary(latencies),
+        'throughput_ips': round(len(dataset) / total_time, 2) if total_time else 0.0,
+        'detection_rate': round(detected_faces / expected_faces, 4) if expected_faces else None,
+        'false_positive_rate': round(false_positives / no_face_images, 4) if no_face_images else None,
+        'mean_crop_line_error': round(sum(line_errors) / len(line_errors), 4) if line_errors else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', required=True, help="Répertoire d'images du catalogue")
+    parser.add_argument('--labels', help='Fichier JSON des boxes attendues par image')
+    parser.add_argument('--backends', default='haar,lbp,dnn', help='Backends à comparer')
+    parser.add_argument('--iou', type=float, default=0.3, help='IoU minimum pour compter une détection')
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help='Paramètre admin_settings à appliquer (répétable)')
+    parser.add_argument('--json', default='-', help='Fichier de sortie JSON (- pour stdout)')
+    args = parser.parse_args()
+
+    dataset = load_dataset(args.images, args.labels)
+    if not dataset:
+        parser.error('No labeled images found')
+
+    settings = parse_settings(args.set)
+    results = [bench_backend(backend.strip(), dataset, settings, args.iou)
+               for backend in args.backends.split(',') if backend.strip()]
+
+    for result in results:
+        if 'error' in result:
+            print(f"{result['backend']:>5}: {result['error']}")
+            continue
+        print(f"{result['backend']:>5}: p50={result['latency']['p50_ms']}ms "
+              f"p95={result['latency']['p95_ms']}ms {result['throughput_ips']} img/s "
+              f"detection={result['detection_rate']}")
+
+    write_json(args.json, {
+        'benchmark': 'face_detectors',
+        'environment': environment_info(),
+        'settings': settings,
+        'results': results,
+    })
+
+
+if __name__ == '__main__':
+    main()
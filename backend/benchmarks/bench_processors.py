@@ -0,0 +1,205 @@
+"""
+Microbenchmarks des chemins chauds de ResizeProcessor et CropHeadProcessor
+
+Exécute chaque branche de resize_with_pil (modes, positions de crop, rééchantillonnages)
+et crop_below_mouth sur des images synthétiques de 500px à 6000px, en RGB et RGBA.
+Pour chaque cas : temps médian, pic mémoire Python (tracemalloc, inclut numpy) et pic de
+RSS (Pillow alloue hors tracemalloc).
+
+Avec --baseline, les résultats sont comparés à un run précédent ; toute régression au-delà
+de --threshold (temps ou mémoire) est signalée et le script sort avec le code 1.
+
+Usage (depuis backend/) :
+    python benchmarks/bench_processors.py --json baseline.json
+    python benchmarks/bench_processors.py --baseline baseline.json --threshold 0.15 --json current.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bench_utils import (StaticConfig, environment_info, parse_settings, peak_rss_bytes,
+                         reset_peak_rss, write_json)
+
+from PIL import Image, ImageDraw
+
+from crop_processor import CropHeadProcessor
+from resize_processor import DEFAULT_RESIZE_PARAMS, ResizeProcessor
+
+DEFAULT_SIZES = (500, 1500, 3000, 6000)
+DEFAULT_COLORS = ('RGB', 'RGBA')
+TARGET_SIZE = (1000, 1500)
+
+# (identifiant, paramètres de resize_with_pil) : une entrée par branche
+RESIZE_CASES = [
+    ('fit-keep-center-lanczos', {'RESIZE_MODE': 'fit', 'KEEP_RATIO': 'true', 'CROP_POSITION': 'center'}),
+    ('fit-keep-top-lanczos', {'RESIZE_MODE': 'fit', 'KEEP_RATIO': 'true', 'CROP_POSITION': 'top'}),
+    ('fit-nokeep-lanczos', {'RESIZE_MODE': 'fit', 'KEEP_RATIO': 'false'}),
+    ('fill-center-lanczos', {'RESIZE_MODE': 'fill', 'CROP_POSITION': 'center'}),
+    ('fill-top-lanczos', {'RESIZE_MODE': 'fill', 'CROP_POSITION': 'top'}),
+    ('fill-bottom-lanczos', {'RESIZE_MODE': 'fill', 'CROP_POSITION': 'bottom'}),
+    ('fill-left-lanczos', {'RESIZE_MODE': 'fill', 'CROP_POSITION': 'left'}),
+    ('fill-center-bicubic', {'RESIZE_MODE': 'fill', 'RESAMPLING': 'bicubic'}),
+    ('fill-center-bilinear', {'RESIZE_MODE': 'fill', 'RESAMPLING': 'bilinear'}),
+    ('fill-center-nearest', {'RESIZE_MODE': 'fill', 'RESAMPLING': 'nearest'}),
+    ('stretch-lanczos', {'RESIZE_MODE': 'stretch'}),
+]
+
+
+def synthetic_image(long_side: int, mode: str, face: Optional[Image.Image] = None) -> Image.Image:
+    """Image portrait 2:3 déterministe (dégradé + formes), visage collé en haut si fourni"""
+    width, height = long_side * 2 // 3, long_side
+    gradient = Image.linear_gradient('L').resize((width, height))
+    image = Image.merge('RGB', (gradient, gradient.transpose(Image.FLIP_TOP_BOTTOM), gradient.rotate(90)))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((width * 0.2, height * 0.25, width * 0.8, height * 0.95), fill=(90, 110, 160))
+    if face is not None:
+        face_width = width // 2
+        face_height = face_width * face.size[1] // face.size[0]
+        image.paste(face.convert('RGB').resize((face_width, face_height)), (width // 4, height // 20))
+    if mode == 'RGBA':
+        image.putalpha(Image.linear_gradient('L').resize((width, height)).point(lambda v: 128 + v // 2))
+    return image
+
+
+def measure(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Temps médian / minimum (ms) puis pic mémoire sur un run séparé"""
+    fn()  # échauffement
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+
+    # tracemalloc ralentit l'exécution : mémoire mesurée à part
+    rss_reset = reset_peak_rss()
+    rss_before = peak_rss_bytes()
+    tracemalloc.start()
+    fn()
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_peak = peak_rss_bytes()
+
+    return {
+        'time_ms': round(1000 * timings[len(timings) // 2], 3),
+        'min_ms': round(1000 * timings[0], 3),
+        'traced_peak_mb': round(traced_peak / 1024 / 1024, 2),
+        'rss_peak_delta_mb': round((rss_peak - rss_before) / 1024 / 1024, 2)
+        if rss_reset and rss_peak is not None and rss_before is not None else None,
+    }
+
+
+def run_suite(sizes: List[int], colors: List[str], repeat: int, settings: Dict[str, str],
+              face: Optional[Image.Image], only: Optional[str]) -> List[Dict]:
+    config = StaticConfig(settings)
+    resize = ResizeProcessor(config)
+    crop = CropHeadProcessor(config)
+    results = []
+
+    for long_side in sizes:
+        for color in colors:
+            image = synthetic_image(long_side, color, face)
+            cases: List[Tuple[str, Callable[[], object]]] = []
+            for name, overrides in RESIZE_CASES:
+                params = dict(DEFAULT_RESIZE_PARAMS, **overrides)
+                cases.append((f"resize/{name}", lambda p=params: resize.resize_with_pil(image, *TARGET_SIZE, p)))
+            cases.append(('crop/below_mouth', lambda: crop.crop_below_mouth(image, config=config)))
+
+            for name, fn in cases:
+                case_id = f"{name}/{long_side}/{color}"
+                if only and only not in case_id:
+                    continue
+                result = measure(fn, repeat)
+                result['case'] = case_id
+                if name.startswith('crop/'):
+                    result['face_found'] = crop.find_mouth_line(image, config) is not None
+                results.append(result)
+                print(f"{case_id:<45} {result['time_ms']:>10.2f}ms {result['traced_peak_mb']:>8.2f}MB traced "
+                      f"{result['rss_peak_delta_mb']}MB rss", file=sys.stderr)
+    return results
+
+
+def compare(results: List[Dict], baseline: Dict, threshold: float, min_ms: float) -> List[Dict]:
+    """Cas dont le temps ou la mémoire dépasse la baseline de plus de `threshold`"""
+    previous = {item['case']: item for item in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        before = previous.get(result['case'])
+        if before is None:
+            continue
+        checks = [('time_ms', min_ms), ('traced_peak_mb', 1.0), ('rss_peak_delta_mb', 1.0)]
+        for metric, floor in checks:
+            old, new = before.get(metric), result.get(metric)
+            if old is None or new is None or max(old, new) < floor:
+                continue  # valeurs trop petites pour être significatives
+            if new > old * (1 + threshold):
+                regressions.append({
+                    'case': result['case'], 'metric': metric, 'baseline': old, 'current': new,
+                    'change': round(new / old - 1, 3) if old else None,
+                })
+    return regressions
+
+
+def _ensure_mmap_threshold():
+    """
+    Seuil mmap de glibc fixe : les gros buffers sont rendus au système dès leur libération,
+    sinon le tas garde la mémoire des cas précédents et le pic de RSS d'un cas n'est pas mesurable.
+    """
+    if sys.platform.startswith('linux') and 'MALLOC_MMAP_THRESHOLD_' not in os.environ:
+        env = dict(os.environ, MALLOC_MMAP_THRESHOLD_='131072')
+        os.execve(sys.executable, [sys.executable] + sys.argv, env)
+
+
+def main():
+    _ensure_mmap_threshold()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES), help='Plus grands côtés (px)')
+    parser.add_argument('--colors', default=','.join(DEFAULT_COLORS), help='Modes couleur')
+    parser.add_argument('--repeat', type=int, default=3, help='Mesures par cas (médiane)')
+    parser.add_argument('--only', help='Ne garder que les cas dont l\'identifiant contient ce texte')
+    parser.add_argument('--face-image', help='Visage collé dans les images (active le chemin de crop complet)')
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help='Paramètre admin_settings à appliquer (répétable)')
+    parser.add_argument('--baseline', help='Résultats JSON de référence')
+    parser.add_argument('--threshold', type=float, default=0.15, help='Régression tolérée (0.15 = +15%%)')
+    parser.add_argument('--min-ms', type=float, default=5.0, help='Temps en dessous duquel on ne compare pas')
+    parser.add_argument('--json', default='-', help='Fichier de sortie JSON (- pour stdout)')
+    args = parser.parse_args()
+
+    face = Image.open(args.face_image) if args.face_image else None
+    settings = parse_settings(args.set)
+    results = run_suite([int(s) for s in args.sizes.split(',')], args.colors.split(','),
+                        args.repeat, settings, face, args.only)
+
+    payload = {
+        'benchmark': 'processors',
+        'environment': environment_info(),
+        'settings': settings,
+        'target_size': list(TARGET_SIZE),
+        'results': results,
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_ms)
+        payload['baseline'] = args.baseline
+        payload['threshold'] = args.threshold
+        payload['regressions'] = regressions
+        for item in regressions:
+            print(f"REGRESSION {item['case']} {item['metric']}: {item['baseline']} -> {item['current']} "
+                  f"(+{100 * item['change']:.1f}%)", file=sys.stderr)
+
+    write_json(args.json, payload)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+Benchmark du démarrage des workers : préchargement dans le master et échauffement (warmup.py)
+
+Pour chaque configuration et chaque mode, gunicorn est lancé deux fois par run :
+- une requête part dès que le port écoute : délai jusqu'à l'écoute et jusqu'à la première
+  réponse (client arrivé pendant le démarrage) ;
+- après --settle secondes (worker démarré) : latence de la première requête du mode, puis
+  d'une seconde (régime établi, référence) et RSS du worker (/health).
+
+Configurations :
+    lazy      GUNICORN_PRELOAD=0 GUNICORN_WARMUP=0 (tout est chargé par la première requête)
+    warmup    GUNICORN_PRELOAD=0, échauffement de chaque worker
+    preload   préchargement dans le master + échauffement (défaut de gunicorn.conf.py)
+
+Un seul worker par défaut : la première requête tombe sur le worker mesuré. Pour ai / both /
+all, pointer bria_endpoint sur benchmarks/fake_bria.py. Chaque requête envoie une variante
+inédite de l'image (le cache de résultats sur disque survit aux redémarrages).
+
+Usage (depuis backend/) :
+    python benchmarks/bench_startup.py --modes resize,crop-head --runs 5 --json startup.json
+    python benchmarks/bench_startup.py --configs lazy,preload --worker-class gevent --modes ai,all
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+from bench_utils import BACKEND_DIR, environment_info, latency_summary, write_json
+from load_test import MODES, load_payloads
+
+import requests
+
+# nom -> (GUNICORN_PRELOAD, GUNICORN_WARMUP)
+CONFIGS = {
+    'lazy': ('0', '0'),
+    'warmup': ('0', '1'),
+    'preload': ('1', '1'),
+}
+
+
+def launch(config: str, args) -> subprocess.Popen:
+    preload, warmup = CONFIGS[config]
+    env = dict(os.environ, PORT=str(args.port), GUNICORN_WORKER_CLASS=args.worker_class,
+               GUNICORN_WORKERS=str(args.workers), GUNICORN_PRELOAD=preload, GUNICORN_WARMUP=warmup)
+    command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(BACKEND_DIR, 'gunicorn.conf.py'),
+               '--chdir', args.chdir, '--access-logfile', '/dev/null', '--log-level', 'warning', args.app]
+    return subprocess.Popen(command, cwd=args.chdir, env=env)
+
+
+def wait_listening(server: subprocess.Popen, port: int, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {server.returncode}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.01)
+    server.kill()
+    raise RuntimeError(f'gunicorn did not listen within {timeout:.0f}s')
+
+
+def post(url: str, mode: str, payload: Tuple[str, bytes], args) -> float:
+    """Latence (s) d'une requête /api/process ; RuntimeError si elle échoue"""
+    filename, data = payload
+    params = {'mode': mode, 'width': args.width, 'height': args.height}
+    start = time.perf_counter()
+    response = requests.post(f"{url}/api/process", params=params, files={'image': (filename, data)},
+                             timeout=args.timeout)
+    elapsed = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f"{mode}: HTTP {response.status_code} {response.text[:200]}")
+    return elapsed
+
+
+@contextmanager
+def running(config: str, args) -> Iterator[float]:
+    """gunicorn démarré avec la configuration ; produit l'instant du lancement (perf_counter)"""
+    launched = time.perf_counter()
+    server = launch(config, args)
+    try:
+        wait_listening(server, args.port)
+        yield launched
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+
+def run_once(config: str, mode: str, payloads: Iterator[Tuple[str, bytes]], args) -> Dict:
+    url = f"http://127.0.0.1:{args.port}"
+    # Client arrivé pendant le démarrage : requête dès que le port écoute (le master écoute
+    # avant le démarrage du worker, la requête l'attend)
+    with running(config, args) as launched:
+        listening = time.perf_counter() - launched
+        post(url, mode, next(payloads), args)
+        first_response = time.perf_counter() - launched
+
+    # Worker démarré (et échauffé) : première requête du mode, puis régime établi
+    with running(config, args):
+        time.sleep(args.settle)
+        first = post(url, mode, next(payloads), args)
+        second = post(url, mode, next(payloads), args)
+        health = requests.get(f"{url}/health", timeout=10).json()
+    return {
+        'listening': listening,
+        'first_response': first_response,
+        'first_request': first,
+        'second_request': second,
+        'rss_mb': health.get('memory', {}).get('rss_mb'),
+    }
+
+
+def bench(config: str, mode: str, payloads: Iterator[Tuple[str, bytes]], args) -> Dict:
+    runs = [run_once(config, mode, payloads, args) for _ in range(args.runs)]
+
+    def summary(key: str) -> Dict:
+        return latency_summary([run[key] for run in runs])
+
+    result = {
+        'config': config,
+        'mode': mode,
+        'runs': args.runs,
+        'listening': summary('listening'),
+        'first_response': summary('first_response'),
+        'first_request': summary('first_request'),
+        'second_request': summary('second_request'),
+        'rss_mb': max(run['rss_mb'] or 0 for run in runs),
+    }
+    print(f"{config:<8} {mode:<10} first response {result['first_response']['p50_ms']:>8.1f}ms, "
+          f"first request {result['first_request']['p50_ms']:>8.1f}ms, "
+          f"second {result['second_request']['p50_ms']:>7.1f}ms", file=sys.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--configs', default='lazy,warmup,preload', help=f"Parmi {', '.join(CONFIGS)}")
+    parser.add_argument('--modes', default='resize,crop-head', help='Modes mesurés (démarrages séparés)')
+    parser.add_argument('--runs', type=int, default=3, help='Runs par configuration et par mode')
+    parser.add_argument('--worker-class', default='sync', choices=('sync', 'gevent'))
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--settle', type=float, default=5.0,
+                        help="Attente (s) avant la première requête d'un worker démarré")
+    parser.add_argument('--images', help="Répertoire d'images (image synthétique sinon)")
+    parser.add_argument('--width', type=int, default=1000)
+    parser.add_argument('--height', type=int, default=1500)
+    parser.add_argument('--timeout', type=float, default=120.0, help='Timeout client par requête (s)')
+    parser.add_argument('--port', type=int, default=8950)
+    parser.add_argument('--app', default='app_unified:app', help='Application WSGI lancée par gunicorn')
+    parser.add_argument('--chdir', default=BACKEND_DIR, help="Répertoire de l'application")
+    parser.add_argument('--seed', type=int, help='Graine des variantes (défaut : différente à chaque lancement)')
+    parser.add_argument('--json', default='-', help='Fichier de sortie JSON (- pour stdout)')
+    args = parser.parse_args()
+
+    configs = [name.strip() for name in args.configs.split(',') if name.strip()]
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    for name in configs:
+        if name not in CONFIGS:
+            parser.error(f"Unknown config: {name}")
+    for mode in modes:
+        if mode not in MODES:
+            parser.error(f"Unknown mode: {mode}")
+
+    # Trois requêtes par run, chacune avec une variante jamais envoyée (même d'un lancement à l'autre)
+    count = 3 * args.runs * len(configs) * len(modes)
+    seed = args.seed if args.seed is not None else time.time_ns()
+    payloads = iter(load_payloads(args.images, count, seed))
+    results: List[Dict] = [bench(config, mode, payloads, args) for config in configs for mode in modes]
+
+    write_json(args.json, {
+        'benchmark': 'startup',
+        'environment': environment_info(),
+        'parameters': {
+            'worker_class': args.worker_class, 'workers': args.workers, 'runs': args.runs,
+            'settle': args.settle, 'seed': seed, 'width': args.width, 'height': args.height,
+        },
+        'results': results,
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Utilitaires communs aux benchmarks MiRemover
+Configuration statique (même interface que ConfigManager), percentiles et sortie JSON
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+# Les benchmarks importent les modules du backend (exécutés depuis backend/ ou ailleurs)
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+class StaticConfig:
+    """Configuration figée pour les benchmarks (interface de ConfigManager sans Supabase)"""
+
+    def __init__(self, settings: Optional[Dict[str, str]] = None):
+        self.settings: Dict[str, str] = dict(settings or {})
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.settings.get(key, default)
+
+    def get_bool(self, key: str, default: bool = False) -> bool:
+        value = self.get(key, str(default))
+        return str(value).lower() in ('true', '1', 'yes', 'on')
+
+    def get_int(self, key: str, default: int = 0) -> int:
+        try:
+            return int(self.get(key, default))
+        except (TypeError, ValueError):
+            return default
+
+    def get_float(self, key: str, default: float = 0.0) -> float:
+        try:
+            return float(self.get(key, default))
+        except (TypeError, ValueError):
+            return default
+
+
+def parse_settings(pairs: List[str]) -> Dict[str, str]:
+    """Convertit des arguments 'cle=valeur' en dict de settings"""
+    settings = {}
+    for pair in pairs or []:
+        key, _, value = pair.partition('=')
+        settings[key.strip()] = value.strip()
+    return settings
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentile par interpolation linéaire (0 si aucune valeur)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    """Résumé de latences en millisecondes"""
+    return {
+        'count': len(latencies),
+        'mean_ms': round(1000 * sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        'p50_ms': round(1000 * percentile(latencies, 50), 3),
+        'p95_ms': round(1000 * percentile(latencies, 95), 3),
+        'p99_ms': round(1000 * percentile(latencies, 99), 3),
+        'max_ms': round(1000 * max(latencies), 3) if latencies else 0.0,
+    }
+
+
+def _proc_status_kb(field: str) -> Optional[int]:
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def current_rss_bytes() -> Optional[int]:
+    """RSS courant du process (Linux uniquement, None ailleurs)"""
+    value = _proc_status_kb('VmRSS')
+    return value * 1024 if value is not None else None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Pic de RSS depuis le dernier reset_peak_rss() (Linux uniquement)"""
+    value = _proc_status_kb('VmHWM')
+    return value * 1024 if value is not None else None
+
+
+def reset_peak_rss() -> bool:
+    """Remet le pic de RSS au RSS courant (/proc/self/clear_refs, Linux >= 4.0)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def environment_info() -> Dict[str, Any]:
+    """Informations machine pour comparer des résultats entre eux"""
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def write_json(path: Optional[str], payload: Dict[str, Any]):
+    """Écrit le résultat en JSON (stdout si path vaut '-' ou None)"""
+    text = json.dumps(payload, indent=2, sort_keys=True)
+    if not path or path == '-':
+        print(text)
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text + '\n')
+    print(f"Results written to {path}")
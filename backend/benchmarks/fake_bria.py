@@ -0,0 +1,211 @@
+"""
+Stand-in local de l'API Bria pour les benchmarks et tests de charge
+
+Accepte le même formulaire multipart que /v1/background/remove (champ 'file') et renvoie
+un détourage PNG RGBA plausible (sujet central elliptique, bords adoucis). La latence suit
+une distribution configurable (fixed, uniform, exponential, lognormal), une part des
+requêtes échoue avec les codes indiqués, et la bande passante montante est simulée pour
+que la taille du payload pèse sur le temps d'aller-retour comme en production.
+
+Usage (depuis backend/) :
+    python benchmarks/fake_bria.py --port 8911 --latency 0.8 --latency-dist lognormal \
+        --latency-sigma 0.5 --error-rate 0.02 --error-codes 500,503,429 --bandwidth-mbps 20
+puis bria_endpoint=http://127.0.0.1:8911/ dans admin_settings
+"""
+
+import argparse
+import email.parser
+import io
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Sequence
+
+from PIL import Image, ImageDraw, ImageFilter
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'exponential', 'lognormal')
+
+
+class LatencyModel:
+    """Latence simulée de l'API ; `latency` est la médiane (moyenne pour exponential)"""
+
+    def __init__(self, latency: float = 0.0, distribution: str = 'fixed', sigma: float = 0.5,
+                 max_latency: float = 60.0, seed: Optional[int] = None):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        self.latency = latency
+        self.distribution = distribution
+        self.sigma = sigma
+        self.max_latency = max_latency
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        if self.latency <= 0:
+            return 0.0
+        with self._lock:
+            if self.distribution == 'uniform':
+                value = self._random.uniform(0.5 * self.latency, 1.5 * self.latency)
+            elif self.distribution == 'exponential':
+                value = self._random.expovariate(1.0 / self.latency)
+            elif self.distribution == 'lognormal':
+                value = self.latency * self._random.lognormvariate(0.0, self.sigma)
+            else:
+                value = self.latency
+        return min(value, self.max_latency)
+
+
+def cutout(image: Image.Image) -> Image.Image:
+    """Détourage plausible : ellipse centrale avec bords adoucis comme alpha"""
+    width, height = image.size
+    mask = Image.new('L', (width, height), 0)
+    ImageDraw.Draw(mask).ellipse(
+        (width * 0.15, height * 0.08, width * 0.85, height * 0.98), fill=255
+    )
+    mask = mask.filter(ImageFilter.GaussianBlur(max(1, min(width, height) // 200)))
+    result = image.convert('RGBA')
+    result.putalpha(mask)
+    return result
+
+
+class FakeBriaServer(ThreadingHTTPServer):
+    """Serveur HTTP multi-thread avec les paramètres de simulation"""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, latency: float = 0.0, bandwidth_mbps: float = 0.0,
+                 latency_model: Optional[LatencyModel] = None, error_rate: float = 0.0,
+                 error_codes: Sequence[int] = (500,), retry_after: int = 1, seed: Optional[int] = None):
+        super().__init__(address, FakeBriaHandler)
+        self.latency_model = latency_model or LatencyModel(latency)
+        self.bandwidth_mbps = bandwidth_mbps
+        self.error_rate = error_rate
+        self.error_codes = tuple(error_codes) or (500,)
+        self.retry_after = retry_after
+        self.requests_served = 0
+        self.errors_returned = 0
+        self.bytes_received = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw_error(self) -> Optional[int]:
+        """Code d'erreur à renvoyer pour cette requête (None = succès)"""
+        with self._lock:
+            if self.error_rate <= 0 or self._random.random() >= self.error_rate:
+                return None
+            self.errors_returned += 1
+            return self._random.choice(self.error_codes)
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1/background/remove"
+
+
+class FakeBriaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_upload(self, body: bytes) -> Optional[bytes]:
+        header = b'Content-Type: ' + self.headers.get('Content-Type', '').encode('latin-1') + b'\r\n\r\n'
+        message = email.parser.BytesParser().parsebytes(header + body)
+        if not message.is_multipart():
+            return None
+        for part in message.get_payload():
+            if part.get_param('name', header='content-disposition') == 'file':
+                return part.get_payload(decode=True)
+        return None
+
+    def _reply(self, status: int, body: bytes, content_type: str, retry_after: Optional[int] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        if retry_after is not None:
+            self.send_header('Retry-After', str(retry_after))
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server: FakeBriaServer = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with server._lock:
+            server.requests_served += 1
+            server.bytes_received += len(body)
+
+        # Temps de transfert montant simulé + temps de traitement de l'API
+        started = time.time()
+        delay = server.latency_model.sample()
+        if server.bandwidth_mbps > 0:
+            delay += len(body) * 8 / (server.bandwidth_mbps * 1_000_000)
+
+        error = server.draw_error()
+        if error is not None:
+            time.sleep(delay)
+            retry_after = server.retry_after if error in (429, 503) else None
+            self._reply(error, b'{"message": "simulated error"}', 'application/json', retry_after)
+            return
+
+        upload = self._read_upload(body)
+        if upload is None:
+            self._reply(400, b'{"message": "missing file"}', 'application/json')
+            return
+
+        output = io.BytesIO()
+        cutout(Image.open(io.BytesIO(upload))).save(output, format='PNG', compress_level=1)
+        # Le temps d'encodage compte dans la latence simulée
+        time.sleep(max(0.0, delay - (time.time() - started)))
+        self._reply(200, output.getvalue(), 'image/png')
+
+
+def start_fake_bria(port: int = 0, latency: float = 0.0, bandwidth_mbps: float = 0.0,
+                    host: str = '127.0.0.1', **options) -> FakeBriaServer:
+    """Démarre le stand-in dans un thread (port 0 = port libre) et retourne le serveur"""
+    server = FakeBriaServer((host, port), latency=latency, bandwidth_mbps=bandwidth_mbps, **options)
+    thread = threading.Thread(target=server.serve_forever, name='fake-bria', daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8911)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="Temps de traitement simulé (s) : médiane, moyenne pour exponential")
+    parser.add_argument('--latency-dist', default='fixed', choices=LATENCY_DISTRIBUTIONS)
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='Dispersion de la loi lognormale')
+    parser.add_argument('--latency-max', type=float, default=60.0, help='Latence simulée maximale (s)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Part des requêtes en erreur (0-1)")
+    parser.add_argument('--error-codes', default='500', help='Codes HTTP des erreurs simulées')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After (s) des 429 / 503')
+    parser.add_argument('--bandwidth-mbps', type=float, default=0.0,
+                        help='Bande passante montante simulée en Mbit/s (0 = illimitée)')
+    parser.add_argument('--seed', type=int, help='Graine pour des runs reproductibles')
+    args = parser.parse_args()
+
+    server = FakeBriaServer(
+        (args.host, args.port),
+        bandwidth_mbps=args.bandwidth_mbps,
+        latency_model=LatencyModel(args.latency, args.latency_dist, args.latency_sigma,
+                                   args.latency_max, seed=args.seed),
+        error_rate=args.error_rate,
+        error_codes=[int(code) for code in args.error_codes.split(',') if code.strip()],
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    print(f"Fake Bria listening on {server.endpoint} "
+          f"({args.latency_dist} {args.latency}s, error rate {args.error_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""
+Test de charge hors-ligne de /api/process (trafic mixte ai / resize / both / crop-head / all)
+
+Envoie des requêtes concurrentes à une instance MiRemover et mesure débit, latences
+p50/p95/p99 et taux d'erreur, globalement et par mode. Aucun crédit Bria n'est consommé
+si l'instance pointe sur le stand-in local :
+
+    python benchmarks/fake_bria.py --port 8911 --latency 0.8 --latency-dist lognormal --error-rate 0.01
+    # admin_settings : bria_endpoint=http://127.0.0.1:8911/
+    gunicorn -c gunicorn.conf.py app_unified:app
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --images ./catalog_sample \
+        --mix ai=3,resize=2,both=2,crop-head=1,all=2 --concurrency 16 --duration 60 --json load.json
+
+Les caches (résultats, réponses Bria) servent des images identiques : utiliser --variants
+pour envoyer des copies légèrement modifiées, ou désactiver les caches côté admin.
+"""
+
+import argparse
+import io
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from bench_utils import environment_info, latency_summary, write_json
+
+import requests
+from PIL import Image
+
+MODES = ('ai', 'resize', 'both', 'crop-head', 'all')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    """'ai=3,resize=1' -> [(mode, poids)]"""
+    mix = []
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        mode, _, weight = item.partition('=')
+        mode = mode.strip()
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode in mix: {mode}")
+        mix.append((mode, float(weight or 1)))
+    return mix
+
+
+def _variant(image: Image.Image, rng: random.Random) -> bytes:
+    """Copie JPEG avec un petit bloc de pixels modifié (contourne les caches)"""
+    copy = image.convert('RGB')
+    x, y = rng.randrange(copy.size[0] - 8), rng.randrange(copy.size[1] - 8)
+    copy.paste(tuple(rng.randrange(256) for _ in range(3)), (x, y, x + 8, y + 8))
+    buffer = io.BytesIO()
+    copy.save(buffer, format='JPEG', quality=92)
+    return buffer.getvalue()
+
+
+def load_payloads(images_dir: str, variants: int, seed: int) -> List[Tuple[str, bytes]]:
+    """(nom de fichier, octets) envoyés ; image synthétique si aucun répertoire"""
+    rng = random.Random(seed)
+    sources = []
+    if images_dir:
+        for name in sorted(os.listdir(images_dir)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                with open(os.path.join(images_dir, name), 'rb') as f:
+                    sources.append((name, f.read()))
+    if not sources:
+        synthetic = Image.new('RGB', (2000, 3000), (200, 180, 160))
+        buffer = io.BytesIO()
+        synthetic.save(buffer, format='JPEG', quality=90)
+        sources.append(('synthetic.jpg', buffer.getvalue()))
+
+    if variants <= 0:
+        return sources
+    payloads = []
+    for name, data in sources:
+        image = Image.open(io.BytesIO(data))
+        stem = os.path.splitext(name)[0]
+        payloads.extend((f"{stem}-{i}.jpg", _variant(image, rng)) for i in range(variants))
+    return payloads
+
+
+class LoadDriver:
+    """Exécute les requêtes et agrège les résultats par mode"""
+
+    def __init__(self, url: str, payloads, mix, width: int, height: int, timeout: float, seed: int):
+        self.url = url.rstrip('/') + '/api/process'
+        self.payloads = payloads
+        self.modes = [mode for mode, _ in mix]
+        self.weights = [weight for _, weight in mix]
+        self.width = width
+        self.height = height
+        self.timeout = timeout
+        self._rng = random.Random(seed)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.results: Dict[str, Dict] = {
+            mode: {'latencies': [], 'statuses': {}, 'bytes_out': 0, 'cache_hits': 0} for mode in self.modes
+        }
+
+    def _session(self) -> requests.Session:
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _pick(self) -> Tuple[str, Tuple[str, bytes]]:
+        with self._lock:
+            mode = self._rng.choices(self.modes, weights=self.weights)[0]
+            return mode, self._rng.choice(self.payloads)
+
+    def one(self):
+        mode, (filename, data) = self._pick()
+        params = {'mode': mode, 'width': self.width, 'height': self.height}
+        start = time.perf_counter()
+        try:
+            response = self._session().post(self.url, params=params, files={'image': (filename, data)},
+                                            timeout=self.timeout)
+            status, size = str(response.status_code), len(response.content)
+            cache_hit = response.headers.get('X-Cache') == 'HIT'
+        except requests.RequestException as e:
+            status, size, cache_hit = type(e).__name__, 0, False
+        latency = time.perf_counter() - start
+
+        with self._lock:
+            result = self.results[mode]
+            result['latencies'].append(latency)
+            result['statuses'][status] = result['statuses'].get(status, 0) + 1
+            result['bytes_out'] += size
+            result['cache_hits'] += 1 if cache_hit else 0
+
+    def run(self, concurrency: int, duration: float, total_requests: int) -> float:
+        """Boucle de charge ; retourne la durée effective"""
+        deadline = time.perf_counter() + duration if duration else None
+        counter = {'sent': 0}
+
+        def worker():
+            while True:
+                with self._lock:
+                    if total_requests and counter['sent'] >= total_requests:
+                        return
+                    counter['sent'] += 1
+                if deadline and time.perf_counter() >= deadline:
+                    return
+                self.one()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for _ in range(concurrency):
+                executor.submit(worker)
+        return time.perf_counter() - start
+
+
+def summarize(results: Dict[str, Dict], elapsed: float) -> Dict:
+    def block(latencies, statuses, bytes_out, cache_hits):
+        count = len(latencies)
+        errors = sum(n for status, n in statuses.items() if status != '200')
+        return {
+            'requests': count,
+            'throughput_rps': round(count / elapsed, 2) if elapsed else 0.0,
+            'error_rate': round(errors / count, 4) if count else 0.0,
+            'statuses': statuses,
+            'cache_hit_rate': round(cache_hits / count, 4) if count else 0.0,
+            'bytes_out': bytes_out,
+            'latency': latency_summary(latencies),
+        }
+
+    per_mode = {mode: block(r['latencies'], r['statuses'], r['bytes_out'], r['cache_hits'])
+                for mode, r in results.items() if r['latencies']}
+    all_statuses: Dict[str, int] = {}
+    for r in results.values():
+        for status, n in r['statuses'].items():
+            all_statuses[status] = all_statuses.get(status, 0) + n
+    overall = block(
+        [latency for r in results.values() for latency in r['latencies']],
+        all_statuses,
+        sum(r['bytes_out'] for r in results.values()),
+        sum(r['cache_hits'] for r in results.values()),
+    )
+    return {'overall': overall, 'modes': per_mode}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='Instance MiRemover')
+    parser.add_argument('--images', help="Répertoire d'images (image synthétique sinon)")
+    parser.add_argument('--mix', default='ai=1,resize=1,both=1,crop-head=1,all=1', help='Poids par mode')
+    parser.add_argument('--concurrency', type=int, default=8, help='Requêtes simultanées')
+    parser.add_argument('--duration', type=float, default=30.0, help='Durée du test (s, 0 = illimitée)')
+    parser.add_argument('--requests', type=int, default=0, help='Nombre total de requêtes (0 = illimité)')
+    parser.add_argument('--width', type=int, default=1000)
+    parser.add_argument('--height', type=int, default=1500)
+    parser.add_argument('--variants', type=int, default=0, help='Copies modifiées par image (anti-cache)')
+    parser.add_argument('--timeout', type=float, default=120.0, help='Timeout client par requête (s)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', default='-', help='Fichier de sortie JSON (- pour stdout)')
+    args = parser.parse_args()
+
+    if not args.duration and not args.requests:
+        parser.error('--duration or --requests is required')
+
+    mix = parse_mix(args.mix)
+    payloads = load_payloads(args.images, args.variants, args.seed)
+    driver = LoadDriver(args.url, payloads, mix, args.width, args.height, args.timeout, args.seed)
+    elapsed = driver.run(args.concurrency, args.duration, args.requests)
+    summary = summarize(driver.results, elapsed)
+
+    overall = summary['overall']
+    print(f"overall: {overall['throughput_rps']} req/s, errors={overall['error_rate']}, "
+          f"p50={overall['latency']['p50_ms']}ms p95={overall['latency']['p95_ms']}ms "
+          f"p99={overall['latency']['p99_ms']}ms")
+    for mode, result in summary['modes'].items():
+        print(f"{mode:>9}: {result['requests']} req, errors={result['error_rate']}, "
+              f"p50={result['latency']['p50_ms']}ms p99={result['latency']['p99_ms']}ms")
+
+    write_json(args.json, {
+        'benchmark': 'load_test',
+        'environment': environment_info(),
+        'parameters': {
+            'url': args.url, 'mix': dict(mix), 'concurrency': args.concurrency,
+            'duration': args.duration, 'requests': args.requests, 'width': args.width,
+            'height': args.height, 'variants': args.variants, 'images': len(payloads),
+        },
+        'elapsed_seconds': round(elapsed, 3),
+        'results': summary,
+    })
+
+
+if __name__ == '__main__':
+    main()
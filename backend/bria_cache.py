@@ -0,0 +1,74 @@
+"""
+BriaResponseCache - Mémoïsation des appels HTTP Bria
+Clé = digest du JPEG envoyé + endpoint, avec TTL, budget en octets et éviction LRU
+"""
+
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from result_cache import MemoryLRU
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class BriaResponseCache:
+    """Cache des réponses Bria (octets bruts) placé juste devant l'appel HTTP"""
+
+    def __init__(self, config_manager):
+        self.config = config_manager
+        self.memory = MemoryLRU()
+        self.counters = {
+            'hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+        }
+        self._counters_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.get_bool('bria_cache_enabled', True)
+
+    @staticmethod
+    def make_key(payload: bytes, endpoint: str, form_data: Optional[Dict[str, str]] = None) -> str:
+        """Digest du payload encodé + endpoint (+ champs du formulaire)"""
+        digest = hashlib.sha256(payload)
+        digest.update(endpoint.encode('utf-8'))
+        for name, value in sorted((form_data or {}).items()):
+            digest.update(f'{name}={value}'.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        ttl = self.config.get_int('bria_cache_ttl_seconds', 3600)
+        entry = self.memory.get(key, ttl=ttl)
+        if entry is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        content, _ = entry
+        return content
+
+    def put(self, key: str, content: bytes):
+        max_bytes = self.config.get_int('bria_cache_max_mb', 128) * 1024 * 1024
+        max_items = self.config.get_int('bria_cache_max_items', 256)
+        evicted = self.memory.put(key, content, None, max_items, max_bytes)
+        self._count('stores')
+        if evicted:
+            self._count('evictions', evicted)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._counters_lock:
+            self.counters[name] += amount
+        metrics.cache_event('bria', name, amount)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._counters_lock:
+            stats = dict(self.counters)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['entries'] = len(self.memory)
+        stats['bytes'] = self.memory.size_bytes
+        return stats
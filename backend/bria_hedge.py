@@ -0,0 +1,143 @@
+"""
+Hedging des appels Bria - Réduit la latence de queue (p99)
+Quand un appel dure plus longtemps que le percentile glissant configuré, un doublon est envoyé
+et la première réponse est retenue. Un budget (ex : 5% d'appels en plus) borne le surcoût.
+La requête perdante ne peut pas être interrompue en vol : sa réponse est fermée et ignorée.
+"""
+
+import logging
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyWindow:
+    """Dernières latences Bria réussies (secondes), alimentées par BriaProcessor._post"""
+
+    def __init__(self, size: int = 500):
+        self._values = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float):
+        with self._lock:
+            self._values.append(latency)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            if not self._values:
+                return None
+            ordered = sorted(self._values)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100.0))
+        return ordered[index]
+
+
+class HedgeBudget:
+    """Jetons : chaque appel primaire crédite `ratio`, chaque doublon en consomme un"""
+
+    def __init__(self, burst: float = 5.0):
+        self.burst = burst
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+
+    def credit(self, ratio: float):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+
+class BriaHedger:
+    """Exécute un appel avec doublon éventuel ; statistiques exportées dans le statut Bria"""
+
+    def __init__(self, max_workers: int = 64):
+        self.latencies = LatencyWindow()
+        self.budget = HedgeBudget()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bria-hedge')
+        self._stats = {'calls': 0, 'hedged': 0, 'hedge_wins': 0, 'skipped_budget': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def hedge_delay(self, config) -> Optional[float]:
+        """Délai avant doublon (None tant que la fenêtre n'a pas assez d'échantillons)"""
+        if len(self.latencies) < config.get_int('bria_hedge_min_samples', 20):
+            return None
+        threshold = self.latencies.percentile(config.get_float('bria_hedge_percentile', 95))
+        return max(config.get_float('bria_hedge_min_delay', 0.5), threshold)
+
+    def call(self, fn: Callable[[bool], object], config, accept: Callable[[object], bool] = None,
+             discard: Callable[[object], None] = None):
+        """
+        Appelle fn(False) puis, si trop lent et budget disponible, fn(True) en parallèle.
+
+        Args:
+            fn: Appel Bria ; l'argument indique s'il s'agit du doublon
+            config: Snapshot de configuration de la requête
+            accept: Résultat utilisable (ex : pas de 5xx) ; sinon l'autre appel est attendu
+            discard: Libère le résultat perdant (fermeture de la réponse HTTP)
+
+        Returns:
+            Résultat du premier appel réussi (l'exception du primaire si les deux échouent)
+        """
+        self._count('calls')
+        self.budget.credit(config.get_float('bria_hedge_budget', 0.05))
+
+        primary = self._executor.submit(fn, False)
+        delay = self.hedge_delay(config)
+        if delay is None:
+            return primary.result()
+
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        if not self.budget.try_spend():
+            self._count('skipped_budget')
+            return primary.result()
+
+        logger.info(f"Bria call slower than {delay:.2f}s, sending hedged request")
+        self._count('hedged')
+        hedged = self._executor.submit(fn, True)
+        pending = {primary, hedged}
+        winner = None
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            usable = [f for f in done if f.exception() is None and (accept is None or accept(f.result()))]
+            if usable:
+                winner = usable[0]
+
+        if winner is None:
+            # Aucun résultat utilisable : réponse d'erreur de préférence à une exception
+            answered = [f for f in (primary, hedged) if f.exception() is None]
+            winner = answered[0] if answered else primary
+        if winner is hedged and winner.exception() is None:
+            self._count('hedge_wins')
+
+        # La requête perdante termine en arrière-plan ; sa réponse est libérée sans être lue
+        for future in (primary, hedged):
+            if future is not winner and discard is not None:
+                future.add_done_callback(
+                    lambda f: discard(f.result()) if f.exception() is None else None
+                )
+        return winner.result()
+
+    def stats(self, config) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['enabled'] = config.get_bool('bria_hedge_enabled', False)
+        stats['samples'] = len(self.latencies)
+        delay = self.hedge_delay(config)
+        stats['hedge_delay'] = round(delay, 3) if delay is not None else None
+        return stats
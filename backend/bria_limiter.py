@@ -0,0 +1,276 @@
+"""
+BriaLimiter - Limite de concurrence adaptative (AIMD) et disjoncteur pour les appels Bria
+L'état est partagé entre workers gunicorn via un petit fichier JSON protégé par flock :
+la limite augmente d'environ 1 par fenêtre de succès, est multipliée par bria_limit_backoff
+sur 429 / 503 / timeout, et Retry-After suspend les envois de tous les workers.
+Le disjoncteur s'ouvre après bria_breaker_failures échecs consécutifs ; après le cooldown,
+un seul appel de test (half-open) décide de sa fermeture.
+"""
+
+import errno
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMITER_PATH = os.path.join(tempfile.gettempdir(), 'miremover-bria-limiter.json')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Issue d'un appel, utilisée pour ajuster la limite
+SUCCESS = 'success'
+OVERLOAD = 'overload'   # 429, 503, timeout : signal de congestion
+FAILURE = 'failure'     # autres 5xx, erreurs de connexion
+NEUTRAL = 'neutral'     # erreurs client (401, 413...) : ne disent rien de la santé de Bria
+
+POLL_INTERVAL = 0.05
+
+
+class BriaUnavailable(Exception):
+    """Bria indisponible (disjoncteur ouvert ou file d'attente expirée) : échec rapide"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BriaLease:
+    """Place dans la limite de concurrence, à rendre avec BriaLimiter.release()"""
+
+    __slots__ = ('probe', 'acquired_at', 'released')
+
+    def __init__(self, probe: bool):
+        self.probe = probe
+        self.acquired_at = time.time()
+        self.released = False
+
+
+def classify_status(status_code: int) -> str:
+    """Issue d'une réponse HTTP Bria pour le limiteur"""
+    if status_code < 400:
+        return SUCCESS
+    if status_code in (429, 503):
+        return OVERLOAD
+    if status_code >= 500:
+        return FAILURE
+    return NEUTRAL
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """En-tête Retry-After en secondes (seule la forme numérique est utilisée par Bria)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+class BriaLimiter:
+    """Limiteur partagé : acquire() avant chaque appel Bria, release() avec son issue"""
+
+    def __init__(self, config_manager, path: Optional[str] = None):
+        self.config = config_manager
+        self.path = path or os.environ.get('BRIA_LIMITER_STATE_PATH', DEFAULT_LIMITER_PATH)
+        # flock est partagé par les threads d'un même process : verrou local en plus
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._fd_pid: Optional[int] = None
+
+    def _settings(self, config) -> Dict[str, float]:
+        return {
+            'enabled': config.get_bool('bria_limiter_enabled', True),
+            'initial': config.get_float('bria_limit_initial', 20),
+            'min': config.get_float('bria_limit_min', 1),
+            'max': config.get_float('bria_limit_max', 100),
+            'backoff': config.get_float('bria_limit_backoff', 0.7),
+            'queue_timeout': config.get_float('bria_queue_timeout', 5),
+            'breaker_failures': config.get_int('bria_breaker_failures', 5),
+            'breaker_cooldown': config.get_float('bria_breaker_cooldown', 30),
+        }
+
+    def _open(self) -> int:
+        # Un descripteur par process : un fd hérité du fork partagerait le même verrou flock
+        if self._fd is None or self._fd_pid != os.getpid():
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._fd_pid = os.getpid()
+        return self._fd
+
+    @contextmanager
+    def _state(self, settings: Dict[str, float]):
+        """État partagé lu et réécrit sous verrou exclusif"""
+        with self._lock:
+            fd = self._open()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                raw = os.pread(fd, 1 << 16, 0)
+                try:
+                    state = json.loads(raw.decode('utf-8')) if raw else {}
+                except ValueError:
+                    state = {}
+                state = self._normalize(state, settings)
+                try:
+                    yield state
+                finally:
+                    # Réécrit aussi quand acquire() rejette (compteurs, transitions du disjoncteur)
+                    payload = json.dumps(state).encode('utf-8')
+                    os.ftruncate(fd, 0)
+                    os.pwrite(fd, payload, 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _normalize(self, state: Dict[str, Any], settings: Dict[str, float]) -> Dict[str, Any]:
+        state.setdefault('limit', settings['initial'])
+        state.setdefault('inflight', {})
+        state.setdefault('retry_after_until', 0.0)
+        state.setdefault('breaker', CLOSED)
+        state.setdefault('failures', 0)
+        state.setdefault('opened_at', 0.0)
+        state.setdefault('probe_pid', None)
+        state.setdefault('counters', {})
+        state['limit'] = min(settings['max'], max(settings['min'], state['limit']))
+
+        # Places tenues par des workers morts (crash, recyclage gunicorn)
+        for pid in list(state['inflight']):
+            if not _pid_alive(int(pid)):
+                logger.warning(f"Releasing {state['inflight'][pid]} Bria slot(s) held by dead worker {pid}")
+                del state['inflight'][pid]
+        if state['probe_pid'] is not None and not _pid_alive(state['probe_pid']):
+            state['probe_pid'] = None
+        return state
+
+    @staticmethod
+    def _count(state: Dict[str, Any], name: str):
+        state['counters'][name] = state['counters'].get(name, 0) + 1
+
+    def acquire(self, config=None, wait: bool = True) -> Optional[BriaLease]:
+        """
+        Attend une place (au plus bria_queue_timeout secondes, pas d'attente si wait=False).
+
+        Returns:
+            BriaLease, ou None si le limiteur est désactivé
+
+        Raises:
+            BriaUnavailable: disjoncteur ouvert ou délai d'attente dépassé
+        """
+        config = config or self.config
+        settings = self._settings(config)
+        if not settings['enabled']:
+            return None
+
+        deadline = time.time() + (settings['queue_timeout'] if wait else 0.0)
+        pid = str(os.getpid())
+        while True:
+            now = time.time()
+            with self._state(settings) as state:
+                if state['breaker'] == OPEN:
+                    reopen_at = state['opened_at'] + settings['breaker_cooldown']
+                    if now < reopen_at:
+                        self._count(state, 'rejected_open')
+                        raise BriaUnavailable("Bria circuit breaker is open", retry_after=reopen_at - now)
+                    # Cooldown écoulé : ce caller devient l'appel de test
+                    state['breaker'] = HALF_OPEN
+                    state['probe_pid'] = None
+                    logger.info("Bria circuit breaker half-open, sending probe")
+
+                if state['breaker'] == HALF_OPEN:
+                    if state['probe_pid'] is None:
+                        state['probe_pid'] = os.getpid()
+                        state['inflight'][pid] = state['inflight'].get(pid, 0) + 1
+                        self._count(state, 'granted')
+                        return BriaLease(probe=True)
+                    self._count(state, 'rejected_open')
+                    raise BriaUnavailable("Bria circuit breaker is half-open", retry_after=1.0)
+
+                wait_until = state['retry_after_until']
+                inflight = sum(state['inflight'].values())
+                if now >= wait_until and inflight < max(1, int(state['limit'])):
+                    state['inflight'][pid] = state['inflight'].get(pid, 0) + 1
+                    self._count(state, 'granted')
+                    return BriaLease(probe=False)
+
+                if now >= deadline or wait_until > deadline:
+                    self._count(state, 'rejected_timeout')
+                    retry_after = max(1.0, wait_until - now)
+                    raise BriaUnavailable("Bria concurrency limit reached, queue timeout", retry_after=retry_after)
+
+            time.sleep(min(POLL_INTERVAL, max(0.0, deadline - now)))
+
+    def release(self, lease: Optional[BriaLease], outcome: str, retry_after: Optional[float] = None,
+                config=None):
+        """Rend la place et ajuste limite / disjoncteur selon l'issue de l'appel"""
+        if lease is None or lease.released:
+            return
+        lease.released = True
+        config = config or self.config
+        settings = self._settings(config)
+        pid = str(os.getpid())
+
+        with self._state(settings) as state:
+            held = state['inflight'].get(pid, 0) - 1
+            if held > 0:
+                state['inflight'][pid] = held
+            else:
+                state['inflight'].pop(pid, None)
+            if lease.probe:
+                state['probe_pid'] = None
+
+            if retry_after:
+                state['retry_after_until'] = max(state['retry_after_until'], time.time() + retry_after)
+
+            if outcome == SUCCESS:
+                # Augmentation additive : +1 environ par fenêtre complète de succès
+                state['limit'] = min(settings['max'], state['limit'] + 1.0 / max(1.0, state['limit']))
+                state['failures'] = 0
+                if state['breaker'] != CLOSED:
+                    logger.info("Bria circuit breaker closed")
+                state['breaker'] = CLOSED
+            elif outcome in (OVERLOAD, FAILURE):
+                if outcome == OVERLOAD:
+                    # Diminution multiplicative sur signal de congestion
+                    state['limit'] = max(settings['min'], state['limit'] * settings['backoff'])
+                    self._count(state, 'overloads')
+                state['failures'] += 1
+                self._count(state, 'failures')
+                if state['breaker'] == HALF_OPEN or state['failures'] >= settings['breaker_failures']:
+                    if state['breaker'] != OPEN:
+                        logger.warning(f"Bria circuit breaker open after {state['failures']} failure(s)")
+                        self._count(state, 'breaker_opened')
+                    state['breaker'] = OPEN
+                    state['opened_at'] = time.time()
+
+    def stats(self, config=None) -> Dict[str, Any]:
+        """État courant du limiteur (exporté dans /health)"""
+        config = config or self.config
+        settings = self._settings(config)
+        if not settings['enabled']:
+            return {'enabled': False}
+        with self._state(settings) as state:
+            now = time.time()
+            return {
+                'enabled': True,
+                'limit': round(state['limit'], 2),
+                'inflight': sum(state['inflight'].values()),
+                'inflight_by_worker': dict(state['inflight']),
+                'breaker': state['breaker'],
+                'consecutive_failures': state['failures'],
+                'retry_after_remaining': round(max(0.0, state['retry_after_until'] - now), 2),
+                'counters': dict(state['counters']),
+            }
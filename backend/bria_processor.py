@@ -6,45 +6,135 @@ Gestion complète des appels API avec retry, optimisation et modération de cont
 import logging
 import requests
 import time
+from urllib.parse import urlsplit
 from PIL import Image
 import io
 
+from bria_cache import BriaResponseCache
+from bria_hedge import BriaHedger
+from bria_limiter import (BriaLimiter, BriaUnavailable, FAILURE, NEUTRAL, OVERLOAD, SUCCESS,
+                          classify_status, parse_retry_after)
+from cpu_offload import run_cpu
+import metrics
+from upload_encoder import EncodedUpload, encode_upload, upload_settings
+
 logger = logging.getLogger(__name__)
 
+DEFAULT_BRIA_ENDPOINT = 'https://engine.prod.bria-api.com/v1/background/remove'
+
 
 class BriaProcessor:
     """Processeur pour suppression de fond via API Bria"""
     
     def __init__(self, config_manager):
         self.config = config_manager
-        self.session = requests.Session()
+        # Pool assez large pour les workers gevent (des centaines d'appels Bria simultanés)
+        pool_size = self.config.get_int('bria_pool_maxsize', 100)
+        self.session = self._create_session(pool_size)
+        self.response_cache = BriaResponseCache(config_manager)
+        self.limiter = BriaLimiter(config_manager)
+        self.hedger = BriaHedger(max_workers=pool_size)
+    
+    def _create_session(self, pool_size: int) -> requests.Session:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    
+    def after_fork(self):
+        """
+        Worker forké depuis le master (preload_app) : nouvelle session, aucune connexion partagée
+        avec le master. Les threads du hedger ne sont créés qu'au premier doublon, dans le worker.
+        """
+        self.session = self._create_session(self.config.get_int('bria_pool_maxsize', 100))
+    
+    def preconnect(self, config=None) -> bool:
+        """
+        Ouvre une connexion (DNS, TCP, TLS) vers l'hôte Bria et la laisse dans le pool de la
+        session : le premier appel du worker ne paie pas l'établissement. Une requête HEAD
+        sur l'origine, hors limiteur ; le code de réponse importe peu.
+        """
+        config = config or self.config
+        parts = urlsplit(config.get('bria_endpoint', DEFAULT_BRIA_ENDPOINT))
+        start = time.time()
+        try:
+            response = self.session.head(f"{parts.scheme}://{parts.netloc}/", allow_redirects=False,
+                                         timeout=config.get_float('bria_preconnect_timeout', 5.0))
+            response.close()
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Bria preconnect failed: {e}")
+            return False
+        logger.info(f"Bria connection established in {(time.time() - start) * 1000:.0f}ms ({parts.netloc})")
+        return True
     
-    def process(self, image: Image.Image) -> Image.Image:
-        """Supprime le fond via l'API Bria"""
+    def process(self, image: Image.Image, config=None) -> Image.Image:
+        """Supprime le fond via l'API Bria (config : snapshot de la requête)"""
+        config = config or self.config
         try:
             # Vérifier le token
-            api_token = self.config.get('bria_api_token')
+            api_token = config.get('bria_api_token')
             if not api_token:
                 raise Exception("BRIA API token not configured")
             
+            # Mode matte : seul l'alpha d'un proxy réduit est demandé à Bria
+            if config.get_bool('bria_matte_mode', False):
+                return self._process_matte(image, api_token, config)
+            
             # Optimiser l'image avant envoi si configuré
             processed_image = image
-            if self.config.get_bool('bria_optimize_before', True):
-                processed_image = self._optimize_for_bria(image)
+            if config.get_bool('bria_optimize_before', True):
+                processed_image = run_cpu(self._optimize_for_bria, image, config)
             
             # Appel API avec retry
-            result_image = self._call_bria_api(processed_image, api_token)
+            result_image = self._call_bria_api(processed_image, api_token, config)
             
             logger.info("Background removed successfully via Bria API")
             return result_image
             
+        except BriaUnavailable as e:
+            logger.warning(f"Bria unavailable: {e}")
+            raise
         except Exception as e:
             logger.error(f"Bria processing failed: {e}")
             raise Exception(f"Background removal failed: {e}")
     
-    def _optimize_for_bria(self, image: Image.Image) -> Image.Image:
+    def _process_matte(self, image: Image.Image, api_token: str, config) -> Image.Image:
+        """Envoie un proxy à Bria et applique l'alpha remonté à l'image pleine résolution"""
+        # Import différé : OpenCV / numpy ne sont chargés que si le mode matte est utilisé
+        from matte import apply_alpha, proxy_size
+        
+        matte_size = config.get_int('bria_matte_size', 768)
+        proxy = image
+        if max(image.size) > matte_size:
+            proxy = run_cpu(image.resize, proxy_size(image.size, matte_size), Image.Resampling.LANCZOS)
+        
+        response_image = self._call_bria_api(proxy, api_token, config)
+        if 'A' not in response_image.getbands():
+            logger.warning("Bria response has no alpha channel, returning it as is")
+            return response_image
+        
+        alpha = response_image.getchannel('A')
+        if proxy is image:
+            return run_cpu(apply_alpha, image, alpha)
+        
+        logger.info(f"Applying Bria matte {proxy.size[0]}x{proxy.size[1]} -> {image.size[0]}x{image.size[1]}")
+        return run_cpu(self._apply_matte, image, proxy, alpha, config)
+    
+    def _apply_matte(self, image: Image.Image, proxy: Image.Image, alpha: Image.Image, config) -> Image.Image:
+        """Étape CPU du mode matte : guided upsampling puis application de l'alpha"""
+        from matte import apply_alpha, upsample_alpha
+        full_alpha = upsample_alpha(
+            alpha, proxy, image,
+            radius=config.get_int('bria_matte_radius', 8),
+            eps=config.get_float('bria_matte_eps', 0.0001)
+        )
+        return apply_alpha(image, full_alpha)
+    
+    def _optimize_for_bria(self, image: Image.Image, config=None) -> Image.Image:
         """Optimise l'image avant envoi à Bria (réduction de taille si nécessaire)"""
-        max_size = self.config.get_int('bria_max_size', 1500)
+        config = config or self.config
+        max_size = config.get_int('bria_max_size', 1500)
         
         # Vérifier si l'optimisation est nécessaire
         if max(image.size) <= max_size:
@@ -65,27 +155,67 @@ class BriaProcessor:
         optimized = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
         return optimized
     
-    def _call_bria_api(self, image: Image.Image, api_token: str) -> Image.Image:
+    def _encode_upload(self, image: Image.Image, config=None) -> EncodedUpload:
+        """Encode l'image pour l'upload vers Bria (format et budget configurés)"""
+        config = config or self.config
+        upload = encode_upload(image, **upload_settings(config))
+        logger.info(f"Bria upload encoded: {len(upload.data) // 1024}KB {upload.mimetype} q{upload.quality}")
+        return upload
+    
+    def limiter_enabled(self, config=None) -> bool:
+        return (config or self.config).get_bool('bria_limiter_enabled', True)
+    
+    def _post(self, endpoint: str, headers: dict, files: dict, data: dict, timeout: int, config,
+              hedge: bool = False):
+        """POST Bria sous la limite de concurrence partagée ; l'issue ajuste la limite"""
+        # Un doublon n'attend pas de place : il n'a d'intérêt que s'il part tout de suite
+        lease = self.limiter.acquire(config, wait=not hedge)
+        outcome, retry_after, status = FAILURE, None, 'error'
+        start = time.time()
+        try:
+            response = self.session.post(endpoint, headers=headers, files=files, data=data, timeout=timeout)
+            status = str(response.status_code)
+            outcome = classify_status(response.status_code)
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if outcome == SUCCESS:
+                self.hedger.latencies.record(time.time() - start)
+            return response
+        except requests.exceptions.Timeout:
+            outcome, status = OVERLOAD, 'timeout'
+            raise
+        except requests.exceptions.ConnectionError:
+            status = 'connection_error'
+            raise
+        finally:
+            self.limiter.release(lease, outcome, retry_after, config)
+            metrics.observe_bria_attempt(status, time.time() - start)
+    
+    def _post_hedged(self, endpoint: str, headers: dict, files: dict, data: dict, timeout: int, config):
+        """POST Bria avec doublon si l'appel dépasse le percentile de latence (bria_hedge_enabled)"""
+        if not config.get_bool('bria_hedge_enabled', False):
+            return self._post(endpoint, headers, files, data, timeout, config)
+        return self.hedger.call(
+            lambda hedge: self._post(endpoint, headers, files, data, timeout, config, hedge=hedge),
+            config,
+            accept=lambda response: classify_status(response.status_code) in (SUCCESS, NEUTRAL),
+            discard=lambda response: response.close()
+        )
+    
+    def _retry_pause(self, wait_time: float, config):
+        """Pause entre deux tentatives, bornée pour ne pas immobiliser le worker"""
+        max_wait = config.get_float('bria_retry_max_wait', 2.0)
+        time.sleep(min(wait_time, max_wait))
+    
+    def _call_bria_api(self, image: Image.Image, api_token: str, config=None) -> Image.Image:
         """Appel API Bria avec gestion des retry"""
-        endpoint = self.config.get('bria_endpoint', 'https://engine.prod.bria-api.com/v1/background/remove')
-        timeout = self.config.get_int('bria_timeout', 30)
-        max_retries = self.config.get_int('bria_max_retries', 3)
-        content_moderation = self.config.get_bool('bria_content_moderation', False)
-        
-        # Préparer l'image en bytes
-        img_bytes = io.BytesIO()
-        
-        # Convertir en RGB si nécessaire (Bria n'aime pas toujours RGBA)
-        if image.mode in ('RGBA', 'P'):
-            # Créer un fond blanc pour les images transparentes
-            background = Image.new('RGB', image.size, (255, 255, 255))
-            if image.mode == 'P':
-                image = image.convert('RGBA')
-            background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-            image = background
+        config = config or self.config
+        endpoint = config.get('bria_endpoint', DEFAULT_BRIA_ENDPOINT)
+        timeout = config.get_int('bria_timeout', 30)
+        max_retries = config.get_int('bria_max_retries', 3)
+        content_moderation = config.get_bool('bria_content_moderation', False)
         
-        image.save(img_bytes, format='JPEG', quality=95)
-        img_bytes.seek(0)
+        # Préparer l'image en bytes (étape CPU, hors boucle d'événements)
+        upload = run_cpu(self._encode_upload, image, config)
         
         # Headers pour l'API
         headers = {
@@ -94,26 +224,29 @@ class BriaProcessor:
         
         # Données du formulaire
         files = {
-            'file': ('image.jpg', img_bytes.getvalue(), 'image/jpeg')
+            'file': (upload.filename, upload.data, upload.mimetype)
         }
         
         data = {}
         if content_moderation:
             data['sync'] = 'true'  # Mode synchrone pour la modération
         
+        # Même payload déjà envoyé récemment (ex: modes both/all) : réutiliser la réponse
+        cache_key = None
+        if self.response_cache.enabled:
+            cache_key = self.response_cache.make_key(files['file'][1], endpoint, data)
+            cached_content = self.response_cache.get(cache_key)
+            if cached_content is not None:
+                logger.info("Bria response served from cache")
+                return Image.open(io.BytesIO(cached_content))
+        
         # Tentatives avec backoff exponentiel
         for attempt in range(max_retries + 1):
             try:
                 logger.info(f"Calling Bria API (attempt {attempt + 1}/{max_retries + 1})")
                 
                 start_time = time.time()
-                response = self.session.post(
-                    endpoint,
-                    headers=headers,
-                    files=files,
-                    data=data,
-                    timeout=timeout
-                )
+                response = self._post_hedged(endpoint, headers, files, data, timeout, config)
                 
                 api_time = time.time() - start_time
                 logger.info(f"Bria API call completed in {api_time:.2f}s")
@@ -121,6 +254,8 @@ class BriaProcessor:
                 if response.status_code == 200:
                     # Succès - convertir la réponse en image
                     result_image = Image.open(io.BytesIO(response.content))
+                    if cache_key is not None:
+                        self.response_cache.put(cache_key, response.content)
                     return result_image
                 
                 # Gestion des erreurs spécifiques
@@ -131,11 +266,12 @@ class BriaProcessor:
                 elif response.status_code == 413:
                     raise Exception("Image too large for Bria API")
                 elif response.status_code == 429:
-                    # Rate limiting - attendre plus longtemps
+                    # Rate limiting - Retry-After est appliqué par le limiteur à tous les workers
                     if attempt < max_retries:
-                        wait_time = (2 ** attempt) * 2  # Backoff plus long pour rate limiting
-                        logger.warning(f"Bria API rate limited, waiting {wait_time}s")
-                        time.sleep(wait_time)
+                        if not self.limiter_enabled(config) or not response.headers.get('Retry-After'):
+                            wait_time = (2 ** attempt) * 2  # Backoff plus long pour rate limiting
+                            logger.warning(f"Bria API rate limited, waiting {wait_time}s")
+                            self._retry_pause(wait_time, config)
                         continue
                     raise Exception("Bria API rate limit exceeded")
                 elif response.status_code >= 500:
@@ -143,7 +279,7 @@ class BriaProcessor:
                     if attempt < max_retries:
                         wait_time = 2 ** attempt
                         logger.warning(f"Bria API server error {response.status_code}, retrying in {wait_time}s")
-                        time.sleep(wait_time)
+                        self._retry_pause(wait_time, config)
                         continue
                     raise Exception(f"Bria API server error: {response.status_code}")
                 else:
@@ -161,7 +297,7 @@ class BriaProcessor:
                     elif attempt < max_retries:
                         wait_time = 2 ** attempt
                         logger.warning(f"{error_msg}, retrying in {wait_time}s")
-                        time.sleep(wait_time)
+                        self._retry_pause(wait_time, config)
                         continue
                     
                     raise Exception(error_msg)
@@ -170,7 +306,7 @@ class BriaProcessor:
                 if attempt < max_retries:
                     wait_time = 2 ** attempt
                     logger.warning(f"Bria API timeout, retrying in {wait_time}s")
-                    time.sleep(wait_time)
+                    self._retry_pause(wait_time, config)
                     continue
                 raise Exception("Bria API timeout")
                 
@@ -178,15 +314,19 @@ class BriaProcessor:
                 if attempt < max_retries:
                     wait_time = 2 ** attempt
                     logger.warning(f"Bria API connection error, retrying in {wait_time}s")
-                    time.sleep(wait_time)
+                    self._retry_pause(wait_time, config)
                     continue
                 raise Exception("Bria API connection failed")
                 
+            except BriaUnavailable:
+                # Disjoncteur ouvert / file d'attente expirée : échec rapide, pas de retry
+                raise
+                
             except Exception as e:
                 if attempt < max_retries and "Request cancelled" not in str(e):
                     wait_time = 2 ** attempt
                     logger.warning(f"Bria API error: {e}, retrying in {wait_time}s")
-                    time.sleep(wait_time)
+                    self._retry_pause(wait_time, config)
                     continue
                 raise
         
@@ -216,7 +356,7 @@ class BriaProcessor:
         """Récupère le statut de l'API Bria"""
         try:
             api_token = self.config.get('bria_api_token')
-            endpoint = self.config.get('bria_endpoint', 'https://engine.prod.bria-api.com/v1/background/remove')
+            endpoint = self.config.get('bria_endpoint', DEFAULT_BRIA_ENDPOINT)
             
             # Certaines APIs ont un endpoint de status
             # Pour Bria, on peut essayer de faire un appel simple
@@ -226,7 +366,14 @@ class BriaProcessor:
                 'timeout': self.config.get_int('bria_timeout', 30),
                 'max_retries': self.config.get_int('bria_max_retries', 3),
                 'optimize_before': self.config.get_bool('bria_optimize_before', True),
-                'max_size': self.config.get_int('bria_max_size', 1500)
+                'max_size': self.config.get_int('bria_max_size', 1500),
+                'matte_mode': self.config.get_bool('bria_matte_mode', False),
+                'matte_size': self.config.get_int('bria_matte_size', 768),
+                'upload_format': self.config.get('bria_upload_format', 'jpeg'),
+                'upload_max_kb': self.config.get_int('bria_upload_max_kb', 0),
+                'cache': self.response_cache.stats(),
+                'limiter': self.limiter.stats(),
+                'hedging': self.hedger.stats(self.config)
             }
             
             return status_info
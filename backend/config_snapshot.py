@@ -0,0 +1,53 @@
+"""
+ConfigSnapshot - Snapshot immuable des admin_settings d'une requête
+Module sans dépendance (Flask, Supabase) : importable par les process du pool CPU.
+"""
+
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Dict, Optional
+
+TRUE_VALUES = ('true', '1', 'yes', 'on')
+
+
+class ConfigSnapshot:
+    """Snapshot immuable des admin_settings, valeurs typées pré-parsées une seule fois"""
+    
+    __slots__ = ('settings', 'loaded_at', 'source', 'version', '_bools', '_ints', '_floats')
+    
+    def __init__(self, settings: Dict[str, str], source: str, loaded_at: Optional[datetime] = None,
+                 version: int = 0):
+        self.settings = MappingProxyType(dict(settings))
+        self.source = source
+        self.loaded_at = loaded_at or datetime.now()
+        self.version = version
+        self._bools: Dict[str, bool] = {}
+        self._ints: Dict[str, int] = {}
+        self._floats: Dict[str, float] = {}
+        
+        for key, value in self.settings.items():
+            self._bools[key] = str(value).lower() in TRUE_VALUES
+            try:
+                self._ints[key] = int(value)
+            except (TypeError, ValueError):
+                pass
+            try:
+                self._floats[key] = float(value)
+            except (TypeError, ValueError):
+                pass
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.settings.get(key, default)
+    
+    def get_bool(self, key: str, default: bool = False) -> bool:
+        return self._bools.get(key, default)
+    
+    def get_int(self, key: str, default: int = 0) -> int:
+        return self._ints.get(key, default)
+    
+    def get_float(self, key: str, default: float = 0.0) -> float:
+        return self._floats.get(key, default)
+    
+    def __reduce__(self):
+        # Picklable (process pool CPU) : seuls les settings bruts sont transmis
+        return ConfigSnapshot, (dict(self.settings), self.source, self.loaded_at, self.version)
@@ -0,0 +1,96 @@
+"""
+CPU offload - Exécution des étapes CPU (resize, crop, encodage) hors de la boucle d'événements
+Avec les workers gevent, ces étapes tournent dans le threadpool du hub pour ne pas bloquer
+les autres requêtes en attente de Bria ; avec les workers sync, elles s'exécutent directement.
+Avec CPU_OFFLOAD_PROCESSES=N, les étapes sur images (run_image_task) partent dans un pool
+de N process (cpu_pool), pixels transmis par mémoire partagée.
+"""
+
+import logging
+import os
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+# Nombre de threads natifs pour les étapes CPU (Pillow et OpenCV libèrent le GIL)
+DEFAULT_CPU_THREADS = int(os.environ.get('CPU_OFFLOAD_THREADS', os.cpu_count() or 4))
+
+# Pool de process pour les étapes sur images (0 = désactivé) et taille minimale déléguée
+CPU_OFFLOAD_PROCESSES = int(os.environ.get('CPU_OFFLOAD_PROCESSES', 0))
+CPU_OFFLOAD_MIN_PIXELS = int(os.environ.get('CPU_OFFLOAD_MIN_PIXELS', 512 * 512))
+
+_process_pool = None
+
+_configured_hubs = set()
+
+# Propre à chaque greenlet / thread (greenlet >= 1.0 isole les contextvars)
+_inline = ContextVar('cpu_offload_inline', default=False)
+
+
+def gevent_active() -> bool:
+    """True si le process tourne sous un worker gevent (sockets monkey-patchés)"""
+    if 'gevent' not in sys.modules:
+        return False
+    try:
+        from gevent import monkey
+        return monkey.is_module_patched('socket')
+    except ImportError:
+        return False
+
+
+def _threadpool():
+    from gevent import get_hub
+    hub = get_hub()
+    if id(hub) not in _configured_hubs:
+        hub.threadpool.maxsize = DEFAULT_CPU_THREADS
+        _configured_hubs.add(id(hub))
+        logger.info(f"CPU offload threadpool sized to {DEFAULT_CPU_THREADS} threads")
+    return hub.threadpool
+
+
+@contextmanager
+def inline_cpu():
+    """Exécute les étapes CPU dans le thread courant (requête profilée)"""
+    token = _inline.set(True)
+    try:
+        yield
+    finally:
+        _inline.reset(token)
+
+
+def run_cpu(fn: Callable, *args, **kwargs) -> Any:
+    """Exécute une étape CPU-bound sans bloquer la boucle d'événements"""
+    if gevent_active() and not _inline.get():
+        return _threadpool().apply(fn, args, kwargs)
+    return fn(*args, **kwargs)
+
+
+def process_pool():
+    """Pool de process du worker courant (None si CPU_OFFLOAD_PROCESSES=0)"""
+    global _process_pool
+    if CPU_OFFLOAD_PROCESSES <= 0:
+        return None
+    if _process_pool is None:
+        from cpu_pool import CpuProcessPool
+        _process_pool = CpuProcessPool(CPU_OFFLOAD_PROCESSES, CPU_OFFLOAD_MIN_PIXELS)
+    return _process_pool
+
+
+def run_image_task(task: str, fn: Callable, image, *args) -> Any:
+    """
+    Étape CPU sur une image : cpu_pool.TASKS[task] dans le pool de process s'il est activé,
+    sinon fn(image, *args) via run_cpu. Les deux doivent produire le même résultat.
+    """
+    pool = process_pool()
+    if pool is not None and not _inline.get() and pool.accepts(image):
+        return pool.run(task, image, *args)
+    return run_cpu(fn, image, *args)
+
+
+def shutdown_process_pool():
+    """Arrête les process du pool (hook worker_exit de gunicorn)"""
+    if _process_pool is not None:
+        _process_pool.shutdown()
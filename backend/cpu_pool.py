@@ -0,0 +1,207 @@
+"""
+Pool de processus CPU - Resize, détection de visage et encodage hors du worker gunicorn
+Optionnel (CPU_OFFLOAD_PROCESSES=N, 0 = désactivé) : quelques workers gevent I/O-bound
+délèguent les étapes CPU à N process dédiés et occupent tous les cœurs sans multiplier
+les workers. Les pixels passent par mémoire partagée (multiprocessing.shared_memory) :
+seuls le nom du segment, le mode, la taille et les paramètres de l'étape sont picklés.
+"""
+
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Modes dont les pixels se transmettent tels quels (un octet par canal)
+SHAREABLE_MODES = ('RGB', 'RGBA', 'L', 'LA')
+
+# En dessous, la copie vers la mémoire partagée coûte plus que l'étape elle-même
+DEFAULT_MIN_PIXELS = 512 * 512
+
+# Métadonnées conservées avec les pixels (profil ICC, DPI... relus à l'encodage)
+INFO_TYPES = (bytes, str, int, float, tuple)
+
+
+class SharedImage(NamedTuple):
+    """Référence picklable vers des pixels en mémoire partagée"""
+    name: str
+    mode: str
+    size: Tuple[int, int]
+    info: Dict[str, Any]
+
+
+def export_image(image: Image.Image) -> Tuple[shared_memory.SharedMemory, SharedImage]:
+    """Copie les pixels dans un nouveau segment ; l'appelant ferme et supprime le segment"""
+    data = image.tobytes()
+    segment = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    segment.buf[:len(data)] = data
+    info = {key: value for key, value in image.info.items() if isinstance(value, INFO_TYPES)}
+    return segment, SharedImage(segment.name, image.mode, image.size, info)
+
+
+def _view(segment: shared_memory.SharedMemory, ref: SharedImage) -> Image.Image:
+    # Sans copie : l'image référence le segment tant qu'elle existe
+    image = Image.frombuffer(ref.mode, ref.size, segment.buf, 'raw', ref.mode, 0, 1)
+    image.info.update(ref.info)
+    return image
+
+
+def import_image(ref: SharedImage) -> Image.Image:
+    """Récupère une image exportée par un process du pool (copie) et supprime son segment"""
+    segment = shared_memory.SharedMemory(name=ref.name)
+    try:
+        image = _view(segment, ref)
+        result = image.copy()
+        del image
+    finally:
+        segment.close()
+        segment.unlink()
+    return result
+
+
+# ---- côté process du pool ----
+
+_worker_processors: Dict[str, Any] = {}
+
+
+def _processor(name: str, config):
+    # Instanciés une fois par process (le détecteur de visage est chargé au premier crop)
+    if name not in _worker_processors:
+        if name == 'resize':
+            from resize_processor import ResizeProcessor
+            _worker_processors[name] = ResizeProcessor(config)
+        else:
+            from crop_processor import CropHeadProcessor
+            _worker_processors[name] = CropHeadProcessor(config)
+    return _worker_processors[name]
+
+
+def _task_resize(image, width, height, config):
+    return _processor('resize', config).process(image, width, height, config)
+
+
+def _task_apply_plan(image, plan, resample):
+    from geometry import apply_plan
+    return apply_plan(image, plan, resample)
+
+
+def _task_crop_head(image, config):
+    return _processor('crop_head', config).process(image, config)
+
+
+def _task_crop_region(image, config):
+    return _processor('crop_head', config).crop_region(image, config)
+
+
+def _task_encode(image, output_format, quality, options=None):
+    from output_encoder import encode_result
+    return encode_result(image, output_format, quality, options)
+
+
+TASKS = {
+    'resize': _task_resize,
+    'apply_plan': _task_apply_plan,
+    'crop_head': _task_crop_head,
+    'crop_region': _task_crop_region,
+    'encode': _task_encode,
+}
+
+
+def _init_worker():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    # Un thread natif par process : le parallélisme vient du nombre de process
+    try:
+        import cv2
+        cv2.setNumThreads(1)
+    except ImportError:
+        pass
+    # Un process spawn repart d'un interpréteur vide : modules des étapes importés d'avance
+    import geometry, output_encoder, resize_processor  # noqa: F401
+
+
+def _ready() -> int:
+    return os.getpid()
+
+
+def _execute(task: str, ref: SharedImage, args: tuple):
+    """Exécute l'étape sur les pixels partagés ; une image résultat repart par un nouveau segment"""
+    segment = shared_memory.SharedMemory(name=ref.name)
+    image = _view(segment, ref)
+    try:
+        result = TASKS[task](image, *args)
+        if isinstance(result, Image.Image):
+            if result.mode not in SHAREABLE_MODES:
+                result = result.convert('RGBA' if 'A' in result.getbands() else 'RGB')
+            output, output_ref = export_image(result)
+            output.close()
+            result = output_ref
+        return result
+    finally:
+        del image
+        try:
+            segment.close()
+        except BufferError:
+            # Vue encore référencée par une trace d'exception : libérée avec elle
+            pass
+
+
+# ---- côté worker gunicorn ----
+
+class CpuProcessPool:
+    """Pool de process (spawn) alimenté par mémoire partagée"""
+
+    def __init__(self, processes: int, min_pixels: int = DEFAULT_MIN_PIXELS):
+        self.processes = processes
+        self.min_pixels = min_pixels
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # spawn : un fork d'un worker gunicorn (threads, hub gevent) n'est pas sûr
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+            self._executor_pid = os.getpid()
+            logger.info(f"CPU process pool started with {self.processes} processes")
+        return self._executor
+
+    def start(self) -> int:
+        """Démarre les process du pool avant la première étape (échauffement du worker)"""
+        pool = self._pool()
+        futures = [pool.submit(_ready) for _ in range(self.processes)]
+        return len({future.result() for future in futures})
+
+    def accepts(self, image: Image.Image) -> bool:
+        return image.mode in SHAREABLE_MODES and image.size[0] * image.size[1] >= self.min_pixels
+
+    def run(self, task: str, image: Image.Image, *args) -> Any:
+        """Exécute TASKS[task](image, *args) dans un process du pool"""
+        segment, ref = export_image(image)
+        try:
+            try:
+                result = self._pool().submit(_execute, task, ref, args).result()
+            except BrokenProcessPool:
+                # Process du pool tué (OOM...) : pool recréé, l'étape est rejouée une fois
+                logger.warning("CPU process pool broken, restarting")
+                self._executor = None
+                result = self._pool().submit(_execute, task, ref, args).result()
+        finally:
+            segment.close()
+            segment.unlink()
+        if isinstance(result, SharedImage):
+            return import_image(result)
+        return result
+
+    def shutdown(self):
+        if self._executor is not None and self._executor_pid == os.getpid():
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
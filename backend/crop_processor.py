@@ -1,12 +1,12 @@
 """
 CropHeadProcessor - Crop sous la bouche avec détection de visage OpenCV
-Fonction crop_below_mouth exactement comme dans le code de référence
+Le détecteur (Haar, LBP ou DNN, voir face_detectors.py) est chargé une fois par worker, au premier
+crop ou à l'échauffement du worker (warmup.py) : OpenCV n'est importé qu'à ce moment-là ;
+la détection tourne sur une copie réduite et les coordonnées sont remises à l'échelle de l'image d'origine
 """
 
 import logging
-import numpy as np
-import cv2
-import os
+from typing import List, Optional, Tuple
 from PIL import Image
 
 logger = logging.getLogger(__name__)
@@ -14,14 +14,34 @@ logger = logging.getLogger(__name__)
 
 class CropHeadProcessor:
     """Processeur pour crop sous la bouche avec détection de visage OpenCV"""
-    
+
     def __init__(self, config_manager):
         self.config = config_manager
-    
-    def process(self, image: Image.Image) -> Image.Image:
-        """Crop sous la bouche avec détection de visage"""
+        self.detector = None
+        self._detector_settings = None
+
+    def _init_detector(self, config=None):
+        """(Re)crée le détecteur de visage depuis la configuration"""
+        from face_detectors import create_face_detector, detector_settings
+        config = config or self.config
+        settings = detector_settings(config)
+        try:
+            self.detector = create_face_detector(config)
+            logger.info(f"Face detector initialized: {self.detector.name}")
+        except Exception as e:
+            logger.error(f"Face detector unavailable: {e}")
+            self.detector = None
+        self._detector_settings = settings
+
+    def warm_up(self, config=None) -> bool:
+        """Charge le détecteur et exécute une première détection (allocations d'OpenCV, modèle DNN)"""
+        self.detect_faces(Image.new('RGB', (64, 64)), config)
+        return self.detector is not None
+
+    def process(self, image: Image.Image, config=None) -> Image.Image:
+        """Crop sous la bouche avec détection de visage (config : snapshot de la requête)"""
         try:
-            result = self.crop_below_mouth(image)
+            result = self.crop_below_mouth(image, config=config)
             if result is not None:
                 return result
             else:
@@ -30,64 +50,102 @@ class CropHeadProcessor:
         except Exception as e:
             logger.error(f"Crop processing failed: {e}")
             return image
-    
-    def crop_below_mouth(self, image, resampling_filter='lanczos'):
+
+    def detect_faces(self, image: Image.Image, config=None) -> List[Tuple[int, int, int, int]]:
+        """
+        Détecte les visages sur une copie réduite en niveaux de gris.
+
+        Args:
+            image: Image PIL à analyser
+            config: Snapshot de configuration de la requête (défaut : configuration courante)
+
+        Returns:
+            Liste de (x, y, w, h) dans les coordonnées de l'image d'origine
+        """
+        from face_detectors import detector_settings
+        config = config or self.config
+
+        # Premier crop, backend ou paramètres modifiés (refresh de config) : (re)créer le détecteur
+        if detector_settings(config) != self._detector_settings:
+            self._init_detector(config)
+        detector = self.detector
+        if detector is None:
+            return []
+
+        # Proxy borné en taille : la détection ne dépend pas de la pleine résolution
+        original_width, original_height = image.size
+        max_size = config.get_int('face_detection_max_size', 640)
+        scale = min(1.0, max_size / max(original_width, original_height))
+        proxy = image
+        if scale < 1.0:
+            proxy_size = (max(1, round(original_width * scale)), max(1, round(original_height * scale)))
+            proxy = image.resize(proxy_size, Image.BOX)
+
+        # Ignorer les visages minuscules : fausses détections et échelles les plus coûteuses
+        min_ratio = config.get_float('face_min_size_ratio', 0.05)
+        min_face = max(24, int(max(proxy.size) * min_ratio))
+
+        faces = detector.detect(proxy, min_face)
+
+        # Remettre les coordonnées à l'échelle de l'image d'origine
+        return [
+            (int(x / scale), int(y / scale), int(w / scale), int(h / scale))
+            for (x, y, w, h) in faces
+        ]
+
+    def find_mouth_line(self, image: Image.Image, config=None) -> Optional[int]:
+        """Ordonnée de la bouche (dans l'image d'origine) ou None si aucun visage"""
+        config = config or self.config
+        faces = self.detect_faces(image, config)
+        if len(faces) == 0:
+            logger.info("Aucun visage détecté dans l'image")
+            return None
+
+        # Prendre le premier visage détecté
+        x, y, w, h = faces[0]
+
+        # Position sous le nez / la bouche en proportion de la hauteur du visage (nose_position_ratio)
+        ratio = config.get_float('nose_position_ratio', 0.75)
+        return y + int(h * ratio)
+
+    def crop_region(self, image: Image.Image, config=None) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Zone à conserver (sous la bouche) sans découper l'image, pour le planificateur géométrique.
+
+        Returns:
+            Box (left, top, right, bottom) ou None si aucun visage / zone vide
+        """
+        mouth_y = self.find_mouth_line(image, config)
+        if mouth_y is None:
+            return None
+
+        original_width, original_height = image.size
+        if mouth_y >= original_height:
+            logger.info("Échec de la découpe: image résultante vide")
+            return None
+
+        return (0, mouth_y, original_width, original_height)
+
+    def crop_below_mouth(self, image, resampling_filter='lanczos', config=None):
         """
         Détecte le visage sur une image PIL, garde uniquement la partie en dessous de la bouche.
-        
+
         Args:
             image: Image PIL à traiter
             resampling_filter: Paramètre conservé pour compatibilité mais non utilisé
-            
+            config: Snapshot de configuration de la requête (défaut : configuration courante)
+
         Returns:
             Image PIL traitée ou None en cas d'échec
         """
         try:
-            # Convertir l'image PIL en format OpenCV
-            img_array = np.array(image)
-            img = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-            
-            # Obtenir les dimensions originales de l'image
-            original_height, original_width = img.shape[:2]
-            
-            # Charger les classificateurs pré-entraînés pour la détection du visage
-            face_cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-            
-            if not os.path.exists(face_cascade_path):
-                logger.error(f"Fichier de cascade introuvable: {face_cascade_path}")
+            region = self.crop_region(image, config)
+            if region is None:
                 return None
-                
-            face_cascade = cv2.CascadeClassifier(face_cascade_path)
-            
-            # Convertir en niveau de gris pour la détection
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            
-            # Détecter les visages avec OpenCV
-            faces = face_cascade.detectMultiScale(gray, 1.1, 4)
-            
-            if len(faces) == 0:
-                logger.info("Aucun visage détecté dans l'image")
-                return None
-            
-            # Prendre le premier visage détecté
-            x, y, w, h = faces[0]
-            
-            # Estimer la position de la bouche en fonction des proportions du visage (environ 70-75% depuis le haut)
-            mouth_y = y + int(h * 0.75)
-            
+
             # Découper l'image pour ne garder que la partie en dessous de la bouche
-            cropped = img[mouth_y:original_height, 0:original_width]
-            
-            if cropped.size == 0:
-                logger.info("Échec de la découpe: image résultante vide")
-                return None
-            
-            # Convertir l'image découpée en PIL et la retourner
-            cropped_rgb = cv2.cvtColor(cropped, cv2.COLOR_BGR2RGB)
-            cropped_pil = Image.fromarray(cropped_rgb)
-            
-            return cropped_pil
-            
+            return image.crop(region)
+
         except Exception as e:
             logger.error(f"Erreur lors du traitement du visage: {str(e)}")
             return None
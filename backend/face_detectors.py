@@ -0,0 +1,140 @@
+"""
+Détecteurs de visage interchangeables pour CropHeadProcessor
+Backends : cascade Haar, cascade LBP et modèle DNN SSD d'OpenCV (fichiers locaux),
+sélectionnés via admin_settings (face_detector_backend)
+"""
+
+import logging
+import os
+import threading
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Répertoire des modèles locaux (cascade LBP, modèle DNN)
+FACE_MODELS_DIR = os.environ.get(
+    'FACE_MODELS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+)
+
+HAAR_CASCADE_FILE = 'haarcascade_frontalface_default.xml'
+LBP_CASCADE_FILE = 'lbpcascade_frontalface_improved.xml'
+DNN_PROTOTXT_FILE = 'deploy.prototxt'
+DNN_MODEL_FILE = 'res10_300x300_ssd_iter_140000.caffemodel'
+
+FACE_DETECTOR_BACKENDS = ('haar', 'lbp', 'dnn')
+
+Box = Tuple[int, int, int, int]
+
+
+def _model_path(path: str) -> str:
+    """Chemin absolu d'un modèle (relatif au répertoire des modèles)"""
+    return path if os.path.isabs(path) else os.path.join(FACE_MODELS_DIR, path)
+
+
+class FaceDetector:
+    """Interface commune : détection sur une image proxy, boxes (x, y, w, h) dans ses coordonnées"""
+
+    name = 'base'
+
+    def detect(self, image: Image.Image, min_size: int) -> List[Box]:
+        raise NotImplementedError
+
+
+class CascadeFaceDetector(FaceDetector):
+    """Cascade OpenCV (Haar ou LBP) sur l'image en niveaux de gris"""
+
+    def __init__(self, name: str, cascade_path: str, scale_factor: float, min_neighbors: int):
+        if not os.path.exists(cascade_path):
+            raise FileNotFoundError(f"Fichier de cascade introuvable: {cascade_path}")
+        self.cascade = cv2.CascadeClassifier(cascade_path)
+        if self.cascade.empty():
+            raise ValueError(f"Impossible de charger la cascade: {cascade_path}")
+        self.name = name
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        # detectMultiScale n'est pas garanti thread-safe (batch, threadpool gevent)
+        self._lock = threading.Lock()
+
+    def detect(self, image: Image.Image, min_size: int) -> List[Box]:
+        gray = np.asarray(image.convert('L'))
+        with self._lock:
+            faces = self.cascade.detectMultiScale(
+                gray, self.scale_factor, self.min_neighbors, minSize=(min_size, min_size)
+            )
+        return [tuple(int(v) for v in face) for face in faces]
+
+
+class DnnFaceDetector(FaceDetector):
+    """Détecteur SSD ResNet-10 (Caffe) via cv2.dnn, entrée 300x300"""
+
+    name = 'dnn'
+    input_size = (300, 300)
+    mean = (104.0, 177.0, 123.0)
+
+    def __init__(self, prototxt_path: str, model_path: str, confidence: float):
+        for path in (prototxt_path, model_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Modèle DNN introuvable: {path}")
+        self.net = cv2.dnn.readNetFromCaffe(prototxt_path, model_path)
+        self.confidence = confidence
+        self._lock = threading.Lock()
+
+    def detect(self, image: Image.Image, min_size: int) -> List[Box]:
+        # Le réseau attend du BGR
+        bgr = np.ascontiguousarray(np.asarray(image.convert('RGB'))[:, :, ::-1])
+        height, width = bgr.shape[:2]
+        blob = cv2.dnn.blobFromImage(cv2.resize(bgr, self.input_size), 1.0, self.input_size, self.mean)
+        with self._lock:
+            self.net.setInput(blob)
+            detections = self.net.forward()
+
+        faces = []
+        for i in range(detections.shape[2]):
+            score = float(detections[0, 0, i, 2])
+            if score < self.confidence:
+                continue
+            x1, y1, x2, y2 = detections[0, 0, i, 3:7] * np.array([width, height, width, height])
+            x1, y1 = max(0, int(x1)), max(0, int(y1))
+            x2, y2 = min(width, int(x2)), min(height, int(y2))
+            w, h = x2 - x1, y2 - y1
+            if w >= min_size and h >= min_size:
+                faces.append((score, (x1, y1, w, h)))
+
+        # Les plus confiants d'abord (même convention « premier visage » que les cascades)
+        faces.sort(key=lambda item: item[0], reverse=True)
+        return [box for _, box in faces]
+
+
+def detector_settings(config) -> Tuple:
+    """Paramètres qui imposent de recréer le détecteur quand ils changent"""
+    return (
+        config.get('face_detector_backend', 'haar'),
+        config.get_float('face_scale_factor', 1.1),
+        config.get_int('face_min_neighbors', 4),
+        config.get('face_lbp_cascade_path', LBP_CASCADE_FILE),
+        config.get('face_dnn_prototxt', DNN_PROTOTXT_FILE),
+        config.get('face_dnn_model', DNN_MODEL_FILE),
+        config.get_float('face_dnn_confidence', 0.5),
+    )
+
+
+def create_face_detector(config) -> FaceDetector:
+    """Crée le détecteur configuré ; repli sur Haar si le backend demandé est indisponible"""
+    backend, scale_factor, min_neighbors, lbp_path, prototxt, model, confidence = detector_settings(config)
+
+    try:
+        if backend == 'lbp':
+            return CascadeFaceDetector('lbp', _model_path(lbp_path), scale_factor, min_neighbors)
+        if backend == 'dnn':
+            return DnnFaceDetector(_model_path(prototxt), _model_path(model), confidence)
+        if backend != 'haar':
+            logger.warning(f"Unknown face detector backend '{backend}', using haar")
+    except Exception as e:
+        logger.error(f"Failed to load face detector '{backend}': {e}, falling back to haar")
+
+    return CascadeFaceDetector('haar', cv2.data.haarcascades + HAAR_CASCADE_FILE,
+                               scale_factor, min_neighbors)
@@ -0,0 +1,102 @@
+"""
+Planificateur géométrique - Un seul rééchantillonnage pour les pipelines resize / both / all
+Compose la zone de crop (sous la bouche), la mise à l'échelle fill/stretch et le plafond Bria
+en une seule transformation appliquée depuis l'image source décodée
+"""
+
+import logging
+from typing import Optional, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+Box = Tuple[float, float, float, float]
+
+
+class ResamplePlan:
+    """Zone source (coordonnées flottantes) et taille de sortie d'un rééchantillonnage unique"""
+
+    def __init__(self, box: Box, size: Tuple[int, int]):
+        self.box = box
+        self.size = size
+
+    def __repr__(self) -> str:
+        box = ', '.join(f'{v:.1f}' for v in self.box)
+        return f"ResamplePlan(box=({box}), size={self.size[0]}x{self.size[1]})"
+
+
+def _crop_offsets(new_width: int, new_height: int, width: int, height: int,
+                  crop_position: str) -> Tuple[int, int]:
+    """Décalage du recadrage dans l'image mise à l'échelle (mêmes règles que resize_with_pil)"""
+    left = (new_width - width) // 2
+    top = (new_height - height) // 2
+    if crop_position == 'top':
+        top = 0
+    elif crop_position == 'bottom':
+        top = new_height - height
+    elif crop_position == 'left':
+        left = 0
+    elif crop_position == 'right':
+        left = new_width - width
+    return left, top
+
+
+def cap_size(size: Tuple[int, int], max_size: Optional[int]) -> Tuple[int, int]:
+    """Plafonne la taille de sortie (mêmes arrondis que BriaProcessor._optimize_for_bria)"""
+    width, height = size
+    if not max_size or max(width, height) <= max_size:
+        return size
+    if width > height:
+        return max_size, int(height * (max_size / width))
+    return int(width * (max_size / height)), max_size
+
+
+def plan_resize(src_size: Tuple[int, int], width: int, height: int, resize_mode: str,
+                crop_position: str = 'center', region: Optional[Box] = None,
+                max_size: Optional[int] = None) -> Optional[ResamplePlan]:
+    """
+    Compose crop + resize + plafond en une seule transformation.
+
+    Args:
+        src_size: Taille de l'image source décodée
+        width, height: Dimensions cibles du resize
+        resize_mode: 'fill' ou 'stretch' (les autres modes ne sont pas planifiés)
+        crop_position: Position du recadrage en mode fill
+        region: Zone source à conserver (crop sous la bouche), image entière par défaut
+        max_size: Plus grand côté autorisé en sortie (plafond Bria)
+
+    Returns:
+        ResamplePlan ou None si le mode n'est pas pris en charge
+    """
+    src_width, src_height = src_size
+    rx0, ry0, rx1, ry1 = region or (0, 0, src_width, src_height)
+    region_width, region_height = rx1 - rx0, ry1 - ry0
+    if region_width <= 0 or region_height <= 0 or width <= 0 or height <= 0:
+        return None
+
+    if resize_mode == 'stretch':
+        box = (rx0, ry0, rx1, ry1)
+    elif resize_mode == 'fill':
+        # Même calcul que resize_with_pil, exprimé dans les coordonnées de la source
+        ratio = max(width / region_width, height / region_height)
+        new_width = int(region_width * ratio)
+        new_height = int(region_height * ratio)
+        left, top = _crop_offsets(new_width, new_height, width, height, crop_position)
+        box = (
+            rx0 + left / ratio,
+            ry0 + top / ratio,
+            rx0 + (left + width) / ratio,
+            ry0 + (top + height) / ratio,
+        )
+    else:
+        return None
+
+    # Les arrondis flottants ne doivent pas sortir de l'image source
+    box = (max(0.0, box[0]), max(0.0, box[1]), min(float(src_width), box[2]), min(float(src_height), box[3]))
+    return ResamplePlan(box, cap_size((width, height), max_size))
+
+
+def apply_plan(image: Image.Image, plan: ResamplePlan, resample: int) -> Image.Image:
+    """Exécute le plan : un seul rééchantillonnage depuis la source"""
+    return image.resize(plan.size, resample, box=plan.box)
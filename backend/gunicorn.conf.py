@@ -1,17 +1,47 @@
 import os
+import shutil
+import tempfile
+
+# Métriques Prometheus agrégées entre workers : répertoire défini avant le chargement de l'app.
+# Repart d'un répertoire vide (valeurs des workers d'un run précédent) ; créé ici et pas dans
+# on_starting : avec preload_app, l'app (donc metrics.py) est importée avant ce hook.
+# Une seule fois par master : ce fichier est relu à chaque reload (SIGHUP), workers en vie
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'miremover-prometheus'))
+if os.environ.get('MIREMOVER_METRICS_MASTER') != str(os.getpid()):
+    os.environ['MIREMOVER_METRICS_MASTER'] = str(os.getpid())
+    shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], mode=0o700, exist_ok=True)
 
 # Server socket
 bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
 backlog = 2048
 
 # Worker processes
-workers = 4
-worker_class = 'sync'
-worker_connections = 1000
+# GUNICORN_WORKER_CLASS=gevent : mode asynchrone, les appels Bria ne bloquent plus le worker
+# (un process peut tenir des centaines d'appels en vol, les étapes CPU passent par cpu_offload)
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+# CPU_OFFLOAD_PROCESSES=N : resize / crop / encodage dans un pool de N process par worker
+# (ex. 2 workers gevent + CPU_OFFLOAD_PROCESSES=nombre de cœurs / 2), voir cpu_pool.py
 timeout = 120
 keepalive = 2
 
+# Préchargement (GUNICORN_PRELOAD=0 pour le désactiver) : app, modules lourds et configuration
+# chargés une fois dans le master puis hérités par fork ; échauffement de chaque worker avant
+# ses premières requêtes (GUNICORN_WARMUP=0 pour le désactiver), voir warmup.py
+# et benchmarks/bench_startup.py
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1').lower() in ('1', 'true', 'yes', 'on')
+WARMUP_WORKERS = os.environ.get('GUNICORN_WARMUP', '1').lower() in ('1', 'true', 'yes', 'on')
+
+if preload_app and worker_class == 'gevent':
+    # Le worker gevent patche la stdlib à son démarrage, trop tard pour les verrous et threads
+    # créés par l'app importée dans le master : patch avant le chargement de l'app
+    from gevent import monkey
+    monkey.patch_all()
+
 # Restart workers after this many requests, to help prevent memory leaks
+# (pic par requête borné par memory_pixel_budget_mp, mémoire par étape : miremover_stage_memory_bytes)
 max_requests = 1000
 max_requests_jitter = 50
 
@@ -33,4 +63,30 @@ tmp_upload_dir = None
 
 # SSL
 keyfile = None
-certfile = None
\ No newline at end of file
+certfile = None
+
+
+# Server hooks
+def when_ready(server):
+    """Master : préchargement avant le fork des premiers workers"""
+    if server.cfg.preload_app:
+        import warmup
+        warmup.preload()
+
+
+def post_worker_init(worker):
+    """Worker : échauffement avant d'accepter des requêtes"""
+    if WARMUP_WORKERS:
+        import warmup
+        warmup.warm_up()
+
+
+def child_exit(server, worker):
+    import metrics
+    metrics.mark_process_dead(worker.pid)
+
+
+def worker_exit(server, worker):
+    """Arrête le pool de process CPU du worker (CPU_OFFLOAD_PROCESSES)"""
+    import cpu_offload
+    cpu_offload.shutdown_process_pool()
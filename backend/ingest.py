@@ -0,0 +1,191 @@
+"""
+ImageIngestor - Validation et décodage des uploads
+Validation sur l'en-tête uniquement (octets, dimensions, budget de pixels) puis décodage JPEG
+en mode draft (mise à l'échelle DCT) directement près de la résolution de travail.
+open() et decode() sont séparés pour réserver les pixels décodés dans le budget du worker
+entre les deux (memory_guard.PixelBudget).
+"""
+
+import logging
+import math
+import mmap
+from io import BytesIO
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class DecodePlan(NamedTuple):
+    """Résolution de décodage envisagée et nombre de pixels décodés qu'elle coûtera"""
+    target: Optional[Tuple[int, int]]   # taille minimale demandée à draft (None : image entière)
+    pixels: int
+    reduced: bool                       # sous la résolution de travail (budget saturé)
+
+
+def draft_size(size: Tuple[int, int], target: Optional[Tuple[int, int]]) -> Tuple[int, int]:
+    """Taille que produira Image.draft (réduction DCT par 1, 2, 4 ou 8) pour cette cible"""
+    if target is None:
+        return size
+    scale = min(size[0] // target[0], size[1] // target[1])
+    for reduce in (8, 4, 2, 1):
+        if scale >= reduce:
+            break
+    return (size[0] + reduce - 1) // reduce, (size[1] + reduce - 1) // reduce
+
+
+def _pixels(size: Tuple[int, int]) -> int:
+    return size[0] * size[1]
+
+
+class ImageIngestor:
+    """Valide un upload à partir de son en-tête et le décode à la résolution utile"""
+
+    def __init__(self, config_manager):
+        self.config = config_manager
+
+    def load(self, data: Union[bytes, mmap.mmap], mode: str, params: Dict, config=None) -> Image.Image:
+        """
+        Valide puis décode l'image uploadée à la résolution de travail (open + decode).
+
+        Args:
+            data: Octets uploadés, ou mmap du fichier spoolé (upload_stream.upload_view)
+            mode: Mode de traitement (détermine la résolution de travail)
+            params: Paramètres width/height de la requête
+            config: Snapshot de configuration de la requête (défaut : configuration courante)
+
+        Returns:
+            Image PIL décodée en RGB/RGBA
+
+        Raises:
+            ValueError: upload trop lourd, trop de pixels ou fichier illisible
+        """
+        image, plans = self.open(data, mode, params, config)
+        return self.decode(image, plans[0])
+
+    def open(self, data: Union[bytes, mmap.mmap], mode: str, params: Dict,
+             config=None) -> Tuple[Image.Image, List[DecodePlan]]:
+        """
+        Valide l'upload sur son en-tête, sans rien décoder.
+
+        Returns:
+            (image PIL paresseuse, plans de décodage) : le premier plan garde la résolution
+            de travail, le second (JPEG seulement) réduit jusqu'à memory_budget_min_side
+            quand le budget de pixels du worker est saturé (voir memory_guard.PixelBudget)
+
+        Raises:
+            ValueError: upload trop lourd, trop de pixels ou fichier illisible
+        """
+        config = config or self.config
+
+        # 1. Taille en octets : rejet immédiat, sans rien décoder
+        max_size_mb = config.get_int('max_file_size_mb', 10)
+        size_mb = len(data) / (1024 * 1024)
+        if size_mb > max_size_mb:
+            raise ValueError(f"Image too large: {size_mb:.1f}MB (max: {max_size_mb}MB)")
+
+        # 2. Lecture de l'en-tête seulement (Image.open est paresseux)
+        # Un mmap se lit comme un fichier : décodé sur place, sans recopie en BytesIO
+        if isinstance(data, mmap.mmap):
+            data.seek(0)
+            source = data
+        else:
+            source = BytesIO(data)
+        try:
+            image = Image.open(source)
+        except Image.DecompressionBombError:
+            raise ValueError("Image has too many pixels")
+        except Exception as e:
+            logger.error(f"Failed to open image: {e}")
+            raise ValueError('Invalid image file')
+
+        # 3. Budget de pixels (protection decompression bomb)
+        width, height = image.size
+        max_pixels = config.get_int('max_image_pixels', 40_000_000)
+        if width * height > max_pixels:
+            raise ValueError(f"Image too large: {width}x{height} pixels "
+                             f"(max: {max_pixels / 1_000_000:.0f} megapixels)")
+
+        # 4. Plans de décodage : JPEG réduit par DCT près de la résolution de travail
+        target = self.working_size(mode, params, (width, height), config)
+        if image.format != 'JPEG':
+            return image, [DecodePlan(None, width * height, False)]
+
+        plans = [DecodePlan(target, _pixels(draft_size((width, height), target)), False)]
+        min_side = config.get_int('memory_budget_min_side', 2048)
+        if 0 < min_side < max(width, height):
+            scale = min_side / max(width, height)
+            reduced = (max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale)))
+            if _pixels(draft_size((width, height), reduced)) < plans[0].pixels:
+                plans.append(DecodePlan(reduced, _pixels(draft_size((width, height), reduced)), True))
+        return image, plans
+
+    def decode(self, image: Image.Image, plan: DecodePlan) -> Image.Image:
+        """
+        Décode une image ouverte par open() selon le plan retenu.
+
+        Raises:
+            ValueError: fichier illisible
+        """
+        width, height = image.size
+        if plan.target is not None and image.format == 'JPEG':
+            image.draft('RGB', plan.target)
+            if image.size != (width, height):
+                logger.info(f"Draft decode {width}x{height} -> {image.size[0]}x{image.size[1]}"
+                            f"{' (reduced, pixel budget saturated)' if plan.reduced else ''}")
+
+        try:
+            image.load()
+        except Exception as e:
+            logger.error(f"Failed to decode image: {e}")
+            raise ValueError('Invalid image file')
+
+        # Convertir en RGB/RGBA si nécessaire
+        if image.mode not in ['RGB', 'RGBA']:
+            image = image.convert('RGBA')
+        return image
+
+    def working_size(self, mode: str, params: Dict, size: Tuple[int, int],
+                     config=None) -> Optional[Tuple[int, int]]:
+        """
+        Plus petite taille de décodage qui ne dégrade pas le résultat du mode.
+
+        Returns:
+            (largeur, hauteur) minimale à conserver, ou None si l'image entière est nécessaire
+        """
+        config = config or self.config
+        width, height = size
+        bounds = []
+
+        # Auto-optimisation : l'image sera de toute façon ramenée au seuil
+        if config.get_bool('auto_optimize_large_images', True):
+            bounds.append(config.get_int('optimization_threshold', 2048) / max(width, height))
+
+        target_w = params.get('width', config.get_int('resize_default_width', 1000))
+        target_h = params.get('height', config.get_int('resize_default_height', 1500))
+        cover = max(target_w / width, target_h / height)
+        bria_bound = None
+        # En mode matte, la sortie Bria garde la résolution de l'image décodée
+        if config.get_bool('bria_optimize_before', True) and not config.get_bool('bria_matte_mode', False):
+            bria_bound = config.get_int('bria_max_size', 1500) / max(width, height)
+
+        if mode == 'ai':
+            if bria_bound is not None:
+                bounds.append(bria_bound)
+        elif mode == 'resize':
+            bounds.append(cover)
+        elif mode == 'both':
+            order = config.get('pipeline_both_order', 'resize_then_ai')
+            if order == 'resize_then_ai':
+                bounds.append(cover)
+            elif bria_bound is not None:
+                bounds.append(bria_bound)
+        # crop-head / all : le crop change le ratio, seule l'auto-optimisation borne le décodage
+
+        if not bounds:
+            return None
+        scale = min(bounds)
+        if scale >= 1:
+            return None
+        return max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale))
@@ -0,0 +1,299 @@
+"""
+Jobs asynchrones - /api/jobs : le traitement tourne en arrière-plan, le client suit son état
+L'état de chaque job est un fichier JSON dans un répertoire local partagé entre workers gunicorn :
+n'importe quel worker répond au polling et au flux SSE, seul le worker qui a accepté le job
+l'exécute (pool de threads et file d'attente bornés). Les résultats sont conservés
+jobs_result_ttl secondes.
+"""
+
+import errno
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_DIR = os.path.join(tempfile.gettempdir(), 'miremover-jobs')
+
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+TERMINAL_STATUSES = (JOB_DONE, JOB_FAILED)
+
+# Fréquence de relecture de l'état pour le flux SSE et de purge des jobs expirés
+WATCH_INTERVAL = 0.2
+PURGE_INTERVAL = 60.0
+
+
+class JobRejected(Exception):
+    """File d'attente des jobs pleine : le client doit réessayer plus tard"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+class JobManager:
+    """
+    Soumission, exécution et suivi des jobs.
+
+    `runner(mode, data, params, filename, output_format, progress)` exécute le pipeline et
+    retourne un dict avec 'status' (code HTTP) et soit le résultat encodé ('data', 'mimetype',
+    'extension', 'operations', 'total_time', 'cache'), soit 'error' ; progress(stage, durée)
+    est appelé à la fin de chaque étape.
+    """
+
+    def __init__(self, config_manager, runner: Callable[..., Dict[str, Any]], job_dir: Optional[str] = None):
+        self.config = config_manager
+        self.runner = runner
+        self.job_dir = job_dir or os.environ.get('JOBS_DIR', DEFAULT_JOB_DIR)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+        try:
+            # Privé au service quel que soit l'umask (gunicorn : umask 0) : personne d'autre ne doit
+            # pouvoir déposer un état ou un résultat de job ; resserre aussi un répertoire existant
+            os.makedirs(self.job_dir, mode=0o700, exist_ok=True)
+            os.chmod(self.job_dir, 0o700)
+        except OSError as e:
+            logger.warning(f"Job directory unavailable ({self.job_dir}): {e}")
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Créé au premier job, et recréé dans un worker forké (les threads ne survivent pas au fork)
+        if self._executor is None or self._executor_pid != os.getpid():
+            max_workers = max(1, self.config.get_int('jobs_max_workers', 4))
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+            self._executor_pid = os.getpid()
+            self._pending = 0
+        return self._executor
+
+    # ---- stockage partagé ----
+
+    def _paths(self, job_id: str):
+        base = os.path.join(self.job_dir, job_id)
+        return base + '.json', base + '.bin'
+
+    def _write_file(self, path: str, payload: bytes):
+        # Écriture atomique : un lecteur voit l'ancienne ou la nouvelle version, jamais un fichier partiel
+        fd, tmp_path = tempfile.mkstemp(dir=self.job_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _save(self, job: Dict[str, Any]):
+        job['version'] = job.get('version', 0) + 1
+        job['updated_at'] = time.time()
+        self._write_file(self._paths(job['id'])[0], json.dumps(job).encode('utf-8'))
+
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if not JOB_ID_PATTERN.match(job_id):
+            return None
+        try:
+            with open(self._paths(job_id)[0], 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _delete(self, job_id: str):
+        for path in self._paths(job_id):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    # ---- cycle de vie ----
+
+    def submit(self, mode: str, data: bytes, params: Dict[str, Any], filename: str,
+               output_format: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Enregistre le job et le place dans la file du worker courant
+        (output_format : format négocié à la soumission, None = output_format_<mode>).
+
+        Raises:
+            JobRejected: file d'attente pleine (jobs_max_pending)
+        """
+        max_pending = self.config.get_int('jobs_max_pending', 32)
+        with self._lock:
+            pool = self._pool()
+            if self._pending >= max_pending:
+                raise JobRejected(f"Job queue full ({self._pending} pending)", retry_after=2.0)
+            self._pending += 1
+
+        now = time.time()
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': JOB_QUEUED,
+            'mode': mode,
+            'params': params,
+            'filename': filename,
+            'output_format': output_format,
+            'pid': os.getpid(),
+            'created_at': now,
+            'started_at': None,
+            'finished_at': None,
+            'stages': [],
+            'result': None,
+            'error': None,
+            'http_status': None,
+        }
+        try:
+            self._save(job)
+            pool.submit(self._run, job, data)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            self._delete(job['id'])
+            raise
+
+        logger.info(f"Job {job['id']} queued - Mode: {mode}")
+        self._purge_if_due(now)
+        return job
+
+    def _run(self, job: Dict[str, Any], data: bytes):
+        try:
+            job['status'] = JOB_RUNNING
+            job['started_at'] = time.time()
+            self._save(job)
+
+            def progress(stage: str, duration: float):
+                job['stages'].append({'name': stage, 'duration_ms': round(duration * 1000, 1)})
+                self._save(job)
+
+            try:
+                outcome = self.runner(job['mode'], data, job['params'], job['filename'], job['output_format'],
+                                      progress)
+            except Exception as e:
+                logger.error(f"Job {job['id']} crashed: {e}")
+                outcome = {'status': 500, 'error': {'error': 'Processing failed'}}
+
+            job['http_status'] = outcome['status']
+            if outcome['status'] == 200:
+                self._write_file(self._paths(job['id'])[1], outcome['data'])
+                job['status'] = JOB_DONE
+                job['result'] = {
+                    'mimetype': outcome['mimetype'],
+                    'extension': outcome['extension'],
+                    'operations': outcome['operations'],
+                    'total_time': outcome['total_time'],
+                    'cache': outcome['cache'],
+                    'size': len(outcome['data']),
+                }
+            else:
+                job['status'] = JOB_FAILED
+                job['error'] = outcome['error']
+            job['finished_at'] = time.time()
+            self._save(job)
+            logger.info(f"Job {job['id']} {job['status']} - Mode: {job['mode']}, "
+                        f"Time: {job['finished_at'] - job['started_at']:.2f}s")
+        except OSError as e:
+            logger.error(f"Job {job['id']} state could not be written: {e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """État du job (None si inconnu ou expiré), quel que soit le worker qui l'exécute"""
+        job = self._load(job_id)
+        if job is None:
+            return None
+
+        if job['status'] in TERMINAL_STATUSES:
+            if time.time() - job['finished_at'] > self.config.get_int('jobs_result_ttl', 600):
+                self._delete(job_id)
+                return None
+        elif not _pid_alive(job['pid']):
+            # Worker arrêté (timeout, redémarrage) avant la fin du job
+            job.update(status=JOB_FAILED, http_status=500, finished_at=time.time(),
+                       error={'error': 'Job interrupted, please resubmit'})
+            try:
+                self._save(job)
+            except OSError:
+                pass
+            logger.warning(f"Job {job_id} orphaned by worker {job['pid']}")
+        return job
+
+    def result_path(self, job: Dict[str, Any]) -> Optional[str]:
+        path = self._paths(job['id'])[1]
+        return path if job['status'] == JOB_DONE and os.path.exists(path) else None
+
+    def watch(self, job_id: str, max_seconds: float) -> Iterator[Optional[Dict[str, Any]]]:
+        """
+        Relit l'état du job et le produit à chaque changement, jusqu'à un état final.
+        Produit None à chaque relecture sans changement (le flux SSE peut envoyer un keep-alive),
+        et s'arrête après max_seconds ou si le job disparaît.
+        """
+        deadline = time.time() + max_seconds
+        version = None
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                return
+            if job['version'] != version:
+                version = job['version']
+                yield job
+                if job['status'] in TERMINAL_STATUSES:
+                    return
+            else:
+                yield None
+            if time.time() >= deadline:
+                return
+            time.sleep(WATCH_INTERVAL)
+
+    def _purge_if_due(self, now: float):
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        try:
+            self.purge_expired()
+        except OSError as e:
+            logger.warning(f"Job purge failed: {e}")
+
+    def purge_expired(self) -> int:
+        """Supprime les jobs terminés depuis plus de jobs_result_ttl et les jobs orphelins"""
+        purged = 0
+        for entry in os.scandir(self.job_dir):
+            if entry.name.endswith('.json') and self.get(entry.name[:-len('.json')]) is None:
+                purged += 1
+            elif entry.name.endswith('.tmp') and time.time() - entry.stat().st_mtime > PURGE_INTERVAL:
+                # Écriture interrompue par l'arrêt d'un worker
+                os.unlink(entry.path)
+        if purged:
+            logger.info(f"Purged {purged} expired jobs")
+        return purged
+
+    def stats(self) -> Dict[str, Any]:
+        """File d'attente du worker courant"""
+        with self._lock:
+            pending = self._pending
+        return {
+            'pending': pending,
+            'max_pending': self.config.get_int('jobs_max_pending', 32),
+            'max_workers': self.config.get_int('jobs_max_workers', 4),
+            'job_dir': self.job_dir,
+        }
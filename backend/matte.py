@@ -0,0 +1,78 @@
+"""
+Matte basse résolution - Alpha Bria calculé sur une image réduite, appliqué en pleine résolution
+L'alpha est remonté à la taille d'origine par un guided filter rapide (He & Sun, 2015) :
+les coefficients sont calculés à la taille du proxy puis interpolés, les bords suivent l'image source
+"""
+
+import logging
+from typing import Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+def proxy_size(size: Tuple[int, int], max_size: int) -> Tuple[int, int]:
+    """Taille du proxy envoyé à Bria (plus grand côté borné par max_size)"""
+    width, height = size
+    scale = max_size / max(width, height)
+    if scale >= 1:
+        return size
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _box_mean(array: np.ndarray, radius: int) -> np.ndarray:
+    return cv2.boxFilter(array, -1, (2 * radius + 1, 2 * radius + 1))
+
+
+def _luminance(image: Image.Image) -> np.ndarray:
+    return np.asarray(image.convert('L'), dtype=np.float32) / 255.0
+
+
+def upsample_alpha(alpha: Image.Image, guide_small: Image.Image, guide_full: Image.Image,
+                   radius: int = 8, eps: float = 1e-4) -> Image.Image:
+    """
+    Remonte un alpha basse résolution à la taille de guide_full en suivant ses contours.
+
+    Args:
+        alpha: Alpha retourné par Bria (mode L), à la taille du proxy
+        guide_small: Proxy envoyé à Bria (guide basse résolution)
+        guide_full: Image pleine résolution
+        radius: Rayon de la fenêtre du filtre, en pixels du proxy
+        eps: Régularisation (plus grand = alpha plus lisse, moins collé aux contours)
+
+    Returns:
+        Alpha (mode L) à la taille de guide_full
+    """
+    if alpha.size != guide_small.size:
+        alpha = alpha.resize(guide_small.size, Image.BILINEAR)
+
+    guide = _luminance(guide_small)
+    matte = np.asarray(alpha, dtype=np.float32) / 255.0
+
+    # Coefficients linéaires locaux alpha ≈ a * I + b (calculés à la taille du proxy)
+    mean_i = _box_mean(guide, radius)
+    mean_p = _box_mean(matte, radius)
+    cov_ip = _box_mean(guide * matte, radius) - mean_i * mean_p
+    var_i = _box_mean(guide * guide, radius) - mean_i * mean_i
+    a = cov_ip / (var_i + eps)
+    b = mean_p - a * mean_i
+    mean_a = _box_mean(a, radius)
+    mean_b = _box_mean(b, radius)
+
+    # Seuls a et b sont interpolés ; le détail vient du guide pleine résolution
+    full_width, full_height = guide_full.size
+    mean_a = cv2.resize(mean_a, (full_width, full_height), interpolation=cv2.INTER_LINEAR)
+    mean_b = cv2.resize(mean_b, (full_width, full_height), interpolation=cv2.INTER_LINEAR)
+    result = mean_a * _luminance(guide_full) + mean_b
+
+    return Image.fromarray(np.clip(result * 255.0 + 0.5, 0, 255).astype(np.uint8), 'L')
+
+
+def apply_alpha(image: Image.Image, alpha: Image.Image) -> Image.Image:
+    """Image pleine résolution avec l'alpha calculé (RGBA)"""
+    result = image.convert('RGBA') if image.mode != 'RGBA' else image.copy()
+    result.putalpha(alpha)
+    return result
@@ -0,0 +1,226 @@
+"""
+Mémoire des workers - Mesure par étape et budget de pixels décodés
+- MemorySampler : sur une fraction des requêtes (memory_profile_sample_rate), RSS et pic de
+  RSS relevés à la fin de chaque étape, exportés dans les métriques Prometheus. Avec
+  memory_profile_tracemalloc, s'y ajoutent les allocations tracemalloc (Python et numpy ; pas
+  les buffers internes de Pillow). Une seule requête échantillonnée à la fois par worker ; les
+  requêtes concurrentes (gevent, threads du batch) faussent les mesures, à lire comme des
+  ordres de grandeur.
+- PixelBudget : les pixels décodés en cours de traitement dans le worker sont bornés par
+  memory_pixel_budget_mp. Une requête est admise si elle tient dans le budget, sinon décodée
+  plus petite (JPEG, voir ImageIngestor.open), sinon mise en attente puis rejetée (503).
+Les étapes exécutées dans le pool de processus CPU (cpu_pool) ne comptent pas dans le RSS du worker.
+"""
+
+import logging
+import os
+import random
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Sequence
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+try:
+    PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    PAGE_SIZE = 4096
+
+# ru_maxrss est en Ko sous Linux, en octets sous macOS
+_MAXRSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+
+def peak_rss() -> int:
+    """Pic de RSS du process depuis son démarrage (octets)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_UNIT
+
+
+def current_rss() -> int:
+    """RSS courant (octets) ; hors Linux, approximé par le pic"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return peak_rss()
+
+
+class PixelBudgetExceeded(Exception):
+    """Budget de pixels du worker saturé au-delà de l'attente autorisée : le client doit réessayer"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class StageMemoryProbe:
+    """Relevés mémoire d'une requête échantillonnée ; mark(étape) à la fin de chaque étape"""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, int]] = {}
+        self._tracing = tracemalloc.is_tracing()
+        self._rss = current_rss()
+        self._peak = peak_rss()
+        self._traced = 0
+        if self._tracing:
+            tracemalloc.reset_peak()
+            self._traced = tracemalloc.get_traced_memory()[0]
+
+    def mark(self, stage: str):
+        rss = current_rss()
+        peak = peak_rss()
+        values = {'rss_delta': rss - self._rss, 'peak_rss_growth': peak - self._peak}
+        if self._tracing:
+            traced, traced_peak = tracemalloc.get_traced_memory()
+            values['traced_delta'] = traced - self._traced
+            values['traced_peak'] = max(0, traced_peak - self._traced)
+            tracemalloc.reset_peak()
+            self._traced = traced
+        self.stages[stage] = values
+        self._rss, self._peak = rss, peak
+
+    def wrap(self, progress: Optional[Callable[[str, float], None]]) -> Callable[[str, float], None]:
+        """Callback de progression qui relève la mémoire avant d'appeler progress"""
+        def stage_done(stage: str, duration: float):
+            self.mark(stage)
+            if progress is not None:
+                progress(stage, duration)
+        return stage_done
+
+
+class MemorySampler:
+    """Échantillonnage des requêtes mesurées (au plus une à la fois par worker)"""
+
+    def __init__(self, config_manager):
+        self.config = config_manager
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def sample(self, mode: str, config=None) -> Iterator[Optional[StageMemoryProbe]]:
+        """Produit une sonde si la requête est échantillonnée, None sinon"""
+        config = config or self.config
+        rate = config.get_float('memory_profile_sample_rate', 0.01)
+        if rate <= 0 or random.random() >= rate or not self._lock.acquire(blocking=False):
+            yield None
+            return
+
+        # Démarré une fois pour toutes : tracemalloc.stop() pendant qu'un autre thread alloue
+        # (pool CPU de gevent, batch) peut faire planter CPython < 3.12.9 ; le traçage ralentit
+        # alors toutes les requêtes du worker, à activer le temps d'une investigation
+        if config.get_bool('memory_profile_tracemalloc', False) and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            logger.info("tracemalloc started for memory profiling (until worker restart)")
+        try:
+            probe = StageMemoryProbe()
+            yield probe
+        finally:
+            self._lock.release()
+        self._report(mode, probe)
+
+    def _report(self, mode: str, probe: StageMemoryProbe):
+        if not probe.stages:
+            return
+        metrics.observe_stage_memory(mode, probe.stages)
+        details = ', '.join(
+            f"{stage}: rss {values['rss_delta'] / MB:+.1f}MB, peak +{values['peak_rss_growth'] / MB:.1f}MB"
+            + (f", traced peak {values['traced_peak'] / MB:.1f}MB" if 'traced_peak' in values else '')
+            for stage, values in probe.stages.items()
+        )
+        logger.info(f"Memory profile - Mode: {mode}, {details}")
+
+
+class PixelBudget:
+    """
+    Budget de pixels décodés par worker (toutes requêtes, batchs et jobs confondus).
+
+    Une image plus grande que le budget entier n'est admise que seule ; l'attente est bornée
+    par memory_budget_wait_seconds, puis PixelBudgetExceeded (503 avec Retry-After).
+    """
+
+    def __init__(self, config_manager):
+        self.config = config_manager
+        self._cond = threading.Condition()
+        self._in_use = 0
+        self._active = 0
+        self._counts = {'admitted': 0, 'reduced': 0, 'waited': 0, 'rejected': 0}
+
+    @contextmanager
+    def reserve(self, plans: Sequence, config=None) -> Iterator:
+        """
+        Réserve les pixels du premier plan qui tient dans le budget (plans de ImageIngestor.open,
+        par qualité décroissante) et produit ce plan ; la réservation est rendue à la sortie.
+
+        Raises:
+            PixelBudgetExceeded: aucun plan n'a trouvé de place avant la fin de l'attente
+        """
+        config = config or self.config
+        budget = config.get_int('memory_pixel_budget_mp', 120) * 1_000_000
+        if budget <= 0:
+            yield plans[0]
+            return
+
+        plan, weight = self._acquire(plans, budget, config.get_float('memory_budget_wait_seconds', 5.0))
+        try:
+            yield plan
+        finally:
+            with self._cond:
+                self._in_use -= weight
+                self._active -= 1
+                self._cond.notify_all()
+            metrics.PIXEL_BUDGET_IN_USE.dec(weight)
+
+    def _acquire(self, plans: Sequence, budget: int, max_wait: float):
+        deadline = time.monotonic() + max_wait
+        waited = False
+        with self._cond:
+            while True:
+                for plan in plans:
+                    weight = min(plan.pixels, budget)
+                    if self._in_use + weight <= budget:
+                        self._in_use += weight
+                        self._active += 1
+                        self._count('reduced' if plan.reduced else 'admitted')
+                        if waited:
+                            self._count('waited')
+                        if plan.reduced:
+                            logger.warning(f"Pixel budget saturated: decoding reduced to "
+                                           f"{plan.pixels / 1_000_000:.1f}MP")
+                        metrics.PIXEL_BUDGET_IN_USE.inc(weight)
+                        return plan, weight
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._count('rejected')
+                    in_use = self._in_use
+                    break
+                waited = True
+                self._cond.wait(remaining)
+
+        smallest = min(plan.pixels for plan in plans)
+        raise PixelBudgetExceeded(
+            f"Pixel budget exhausted: {smallest / 1_000_000:.1f}MP requested, "
+            f"{in_use / 1_000_000:.1f}/{budget / 1_000_000:.0f}MP in use",
+            retry_after=max(1.0, max_wait)
+        )
+
+    def _count(self, event: str):
+        # Appelé sous self._cond
+        self._counts[event] += 1
+        metrics.pixel_budget_event(event)
+
+    def stats(self) -> Dict:
+        """État du budget du worker courant"""
+        with self._cond:
+            return {
+                'budget_mp': self.config.get_int('memory_pixel_budget_mp', 120),
+                'in_use_mp': round(self._in_use / 1_000_000, 1),
+                'active': self._active,
+                **self._counts,
+            }
@@ -0,0 +1,188 @@
+"""
+Métriques Prometheus - Exposées sur /metrics, agrégées entre workers gunicorn
+En production, PROMETHEUS_MULTIPROC_DIR est défini par gunicorn.conf.py avant le chargement
+de l'application : chaque worker écrit ses valeurs dans ce répertoire et /metrics les agrège.
+Sans prometheus_client installé, les métriques sont des no-op.
+"""
+
+import logging
+import os
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge,
+                                   Histogram, generate_latest, multiprocess)
+    from prometheus_client.core import GaugeMetricFamily
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = 'text/plain; version=0.0.4; charset=utf-8'
+
+KNOWN_MODES = ('ai', 'resize', 'both', 'crop-head', 'all')
+STAGES = ('decode', 'head_crop', 'resize', 'resize_in_crop', 'bg_removal', 'encode')
+
+REQUEST_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+MEMORY_BUCKETS = tuple(mb * 1024 * 1024 for mb in (1, 4, 16, 32, 64, 128, 256, 512, 1024, 2048))
+
+
+class _NoopMetric:
+    """Remplaçant quand prometheus_client n'est pas installé"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, value):
+        pass
+
+
+def multiprocess_dir() -> Optional[str]:
+    return os.environ.get('PROMETHEUS_MULTIPROC_DIR') or os.environ.get('prometheus_multiproc_dir')
+
+
+if PROMETHEUS_AVAILABLE:
+    REQUESTS = Counter('miremover_requests_total', 'Requêtes de traitement',
+                       ['endpoint', 'mode', 'status'])
+    REQUEST_DURATION = Histogram('miremover_request_duration_seconds', 'Durée des requêtes de traitement',
+                                 ['endpoint', 'mode'], buckets=REQUEST_BUCKETS)
+    STAGE_DURATION = Histogram('miremover_stage_duration_seconds', 'Durée par étape du pipeline',
+                               ['mode', 'stage'], buckets=STAGE_BUCKETS)
+    BYTES_IN = Counter('miremover_bytes_in_total', 'Octets reçus (uploads)', ['endpoint'])
+    BYTES_OUT = Counter('miremover_bytes_out_total', 'Octets renvoyés (résultats)', ['endpoint'])
+    INFLIGHT = Gauge('miremover_inflight_requests', 'Requêtes de traitement en cours',
+                     multiprocess_mode='livesum')
+    BRIA_ATTEMPTS = Counter('miremover_bria_attempts_total', 'Appels HTTP Bria par statut', ['status'])
+    BRIA_DURATION = Histogram('miremover_bria_request_duration_seconds', 'Durée des appels HTTP Bria',
+                              buckets=REQUEST_BUCKETS)
+    CACHE_EVENTS = Counter('miremover_cache_events_total', 'Événements des caches (hits, misses, stores...)',
+                           ['cache', 'event'])
+    STAGE_MEMORY = Histogram('miremover_stage_memory_bytes', 'Mémoire par étape (requêtes échantillonnées)',
+                             ['mode', 'stage', 'kind'], buckets=MEMORY_BUCKETS)
+    PIXEL_BUDGET_IN_USE = Gauge('miremover_pixel_budget_in_use_pixels', 'Pixels décodés réservés dans les workers',
+                                multiprocess_mode='livesum')
+    PIXEL_BUDGET_EVENTS = Counter('miremover_pixel_budget_events_total',
+                                  'Décisions du budget de pixels (admitted, reduced, waited, rejected)', ['event'])
+else:
+    REQUESTS = REQUEST_DURATION = STAGE_DURATION = BYTES_IN = BYTES_OUT = INFLIGHT = _NoopMetric()
+    BRIA_ATTEMPTS = BRIA_DURATION = CACHE_EVENTS = _NoopMetric()
+    STAGE_MEMORY = PIXEL_BUDGET_IN_USE = PIXEL_BUDGET_EVENTS = _NoopMetric()
+
+
+def _mode_label(mode: Optional[str]) -> str:
+    # Cardinalité bornée : le mode vient de la query string
+    return mode if mode in KNOWN_MODES else 'unknown'
+
+
+@contextmanager
+def track_inflight():
+    INFLIGHT.inc()
+    try:
+        yield
+    finally:
+        INFLIGHT.dec()
+
+
+def observe_request(endpoint: str, mode: Optional[str], status: int, duration: float,
+                    bytes_in: Optional[int], bytes_out: Optional[int]):
+    mode = _mode_label(mode)
+    REQUESTS.labels(endpoint=endpoint, mode=mode, status=str(status)).inc()
+    REQUEST_DURATION.labels(endpoint=endpoint, mode=mode).observe(duration)
+    if bytes_in:
+        BYTES_IN.labels(endpoint=endpoint).inc(bytes_in)
+    if bytes_out:
+        BYTES_OUT.labels(endpoint=endpoint).inc(bytes_out)
+
+
+def observe_stages(mode: str, times: Dict[str, float]):
+    """Durées par étape d'une requête (clés de processing_times + decode / encode)"""
+    mode = _mode_label(mode)
+    for stage, duration in times.items():
+        if stage in STAGES:
+            STAGE_DURATION.labels(mode=mode, stage=stage).observe(duration)
+
+
+def observe_stage_memory(mode: str, stages: Dict[str, Dict[str, int]]):
+    """Relevés mémoire par étape d'une requête échantillonnée (memory_guard.StageMemoryProbe)"""
+    mode = _mode_label(mode)
+    for stage, values in stages.items():
+        if stage not in STAGES:
+            continue
+        # Les histogrammes ne gardent que les croissances (un RSS qui baisse compte pour 0)
+        STAGE_MEMORY.labels(mode=mode, stage=stage, kind='rss_growth').observe(max(0, values['rss_delta']))
+        STAGE_MEMORY.labels(mode=mode, stage=stage, kind='peak_rss_growth').observe(values['peak_rss_growth'])
+        if 'traced_peak' in values:
+            STAGE_MEMORY.labels(mode=mode, stage=stage, kind='traced_peak').observe(values['traced_peak'])
+
+
+def pixel_budget_event(event: str):
+    PIXEL_BUDGET_EVENTS.labels(event=event).inc()
+
+
+def observe_bria_attempt(status: str, duration: float):
+    BRIA_ATTEMPTS.labels(status=status).inc()
+    BRIA_DURATION.observe(duration)
+
+
+def cache_event(cache: str, event: str, amount: int = 1):
+    CACHE_EVENTS.labels(cache=cache, event=event).inc(amount)
+
+
+def _bria_limiter_families(stats: Optional[Dict]):
+    """
+    État du limiteur Bria, lu dans son fichier partagé au moment du scrape : pas de gauge par
+    worker (un fichier de worker mort garderait une limite ou un disjoncteur périmés)
+    """
+    if not stats or not stats.get('enabled'):
+        return []
+    return [
+        GaugeMetricFamily('miremover_bria_concurrency_limit', 'Limite de concurrence Bria (AIMD)',
+                          value=stats['limit']),
+        GaugeMetricFamily('miremover_bria_breaker_open', 'Disjoncteur Bria ouvert (1) ou fermé (0)',
+                          value=0 if stats['breaker'] == 'closed' else 1),
+    ]
+
+
+class _Scrape:
+    """Métriques d'un registre complétées par des familles calculées au moment du scrape"""
+
+    def __init__(self, registry, families):
+        self.registry = registry
+        self.families = families
+
+    def collect(self):
+        yield from self.registry.collect()
+        yield from self.families
+
+
+def render(bria_limiter: Optional[Dict] = None) -> Tuple[bytes, str]:
+    """
+    Exposition texte Prometheus (agrégée entre workers en mode multiprocess) ;
+    bria_limiter : BriaLimiter.stats() courant
+    """
+    if not PROMETHEUS_AVAILABLE:
+        return b'# prometheus_client not installed\n', CONTENT_TYPE_LATEST
+    if multiprocess_dir():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(_Scrape(registry, _bria_limiter_families(bria_limiter))), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int):
+    """Hook gunicorn child_exit : retire les gauges 'live' d'un worker terminé"""
+    if PROMETHEUS_AVAILABLE and multiprocess_dir():
+        multiprocess.mark_process_dead(pid)
+
@@ -0,0 +1,117 @@
+"""
+Encodage des résultats - PNG / JPEG / WebP renvoyés par /api/process
+Module sans état : exécutable dans le worker ou dans le pool de processus CPU.
+
+Profils d'encodage dans admin_settings, réglables globalement (output_png_optimize...) ou
+par mode avec le suffixe du mode (output_png_optimize_all, output_png_palette_crop_head...) :
+- PNG : optimize (lent, le plus compact) ou niveau zlib fixe, palette 8 bits pour les détourages
+- WebP : lossy / lossless, method (0-6) et effort lossless (0-100)
+- JPEG : baseline ou progressif, optimisation des tables de Huffman
+Le format lui-même est négocié par requête (negotiate_format) : ?format=, puis WebP avec alpha
+à la place du PNG si le client l'accepte, puis output_format_<mode>.
+benchmarks/bench_encoders.py mesure temps d'encodage et taille de sortie de chaque profil.
+"""
+
+from io import BytesIO
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image
+
+# Formats acceptés par le paramètre ?format= (alias -> format de output_format_<mode>)
+OUTPUT_FORMATS = {'png': 'png', 'jpg': 'jpg', 'jpeg': 'jpg', 'webp': 'webp'}
+
+# Options par défaut : encodage historique (PNG et JPEG optimize, WebP lossy method 4)
+DEFAULT_ENCODER_OPTIONS: Dict[str, Any] = {
+    'png_optimize': True,
+    'png_compress_level': 6,
+    'png_palette': False,
+    'png_palette_colors': 256,
+    'webp_lossless': False,
+    'webp_method': 4,
+    'webp_effort': 80,
+    'jpeg_progressive': False,
+    'jpeg_optimize': True,
+}
+
+
+def encoder_options(config, mode: str) -> Dict[str, Any]:
+    """Options d'encodage du mode : output_<option>_<mode>, sinon output_<option>, sinon défaut"""
+    mode_suffix = mode.replace('-', '_')
+    options = {}
+    for name, default in DEFAULT_ENCODER_OPTIONS.items():
+        key = f'output_{name}'
+        mode_key = f'{key}_{mode_suffix}'
+        if config.get(mode_key) not in (None, ''):
+            key = mode_key
+        if isinstance(default, bool):
+            options[name] = config.get_bool(key, default)
+        else:
+            options[name] = config.get_int(key, default)
+    return options
+
+
+def configured_format(config, mode: str) -> str:
+    """output_format_<mode> (crop-head -> output_format_crop_head), PNG par défaut"""
+    return config.get(f"output_format_{mode.replace('-', '_')}", 'png')
+
+
+def negotiate_format(configured: str, requested: Optional[str] = None, accepts_webp: bool = False) -> str:
+    """
+    Format de sortie d'une requête.
+
+    Args:
+        configured: output_format_<mode> (repli)
+        requested: paramètre ?format= du client (prioritaire)
+        accepts_webp: le client annonce image/webp dans Accept (et la négociation est activée)
+
+    Raises:
+        ValueError: format demandé inconnu
+    """
+    if requested:
+        output_format = OUTPUT_FORMATS.get(requested.lower())
+        if output_format is None:
+            raise ValueError(f"Unknown output format: {requested}. Allowed: {', '.join(OUTPUT_FORMATS)}")
+        return output_format
+    # Résultat transparent (PNG configuré) : WebP avec alpha, bien plus léger
+    if accepts_webp and configured == 'png':
+        return 'webp'
+    return configured
+
+
+def _palette(image: Image.Image, colors: int) -> Image.Image:
+    """Palette 8 bits avec alpha (octree rapide, gère RGBA)"""
+    colors = max(2, min(256, colors))
+    return image.quantize(colors=colors, method=Image.Quantize.FASTOCTREE)
+
+
+def encode_result(result: Image.Image, output_format: str, quality: int,
+                  options: Optional[Dict[str, Any]] = None) -> Tuple[bytes, str, str]:
+    """Encode l'image résultat et retourne (octets, mimetype, extension)"""
+    options = dict(DEFAULT_ENCODER_OPTIONS, **(options or {}))
+    output = BytesIO()
+
+    if output_format in ['jpg', 'jpeg']:
+        result.save(output, 'JPEG', quality=quality, optimize=options['jpeg_optimize'],
+                    progressive=options['jpeg_progressive'])
+        mimetype = 'image/jpeg'
+        extension = 'jpg'
+    elif output_format == 'webp':
+        if options['webp_lossless']:
+            # En lossless, quality règle l'effort de compression
+            result.save(output, 'WebP', lossless=True, quality=options['webp_effort'],
+                        method=options['webp_method'])
+        else:
+            result.save(output, 'WebP', quality=quality, lossless=False, method=options['webp_method'])
+        mimetype = 'image/webp'
+        extension = 'webp'
+    else:  # png
+        if options['png_palette']:
+            result = _palette(result, options['png_palette_colors'])
+        if options['png_optimize']:
+            result.save(output, 'PNG', optimize=True)
+        else:
+            result.save(output, 'PNG', compress_level=max(0, min(9, options['png_compress_level'])))
+        mimetype = 'image/png'
+        extension = 'png'
+
+    return output.getvalue(), mimetype, extension
@@ -0,0 +1,100 @@
+"""
+Profiling à la demande - Une requête exécutée sous cProfile, profil stocké sur disque
+Déclenché par l'en-tête X-Profile avec un X-Admin-Token valide ; le profil est consultable
+via /admin/profiles/<id> (résumé texte ou fichier pstats pour snakeviz / pstats).
+"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import tempfile
+import time
+import uuid
+from typing import Any, Callable, Optional, Tuple
+
+from cpu_offload import inline_cpu
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_DIR = os.path.join(tempfile.gettempdir(), 'miremover-profiles')
+
+PROFILE_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ProfileStore:
+    """Profils conservés sur disque (partagés entre workers), les plus anciens purgés"""
+
+    def __init__(self, profile_dir: Optional[str] = None):
+        self.profile_dir = profile_dir or os.environ.get('PROFILE_DIR', DEFAULT_PROFILE_DIR)
+        # Les profils exposent le code et les paramètres des requêtes : répertoire privé au
+        # compte du service (chmod explicite, makedirs ne l'applique qu'à la création et sous umask)
+        self.enabled = True
+        try:
+            os.makedirs(self.profile_dir, mode=0o700, exist_ok=True)
+            os.chmod(self.profile_dir, 0o700)
+        except OSError as e:
+            # Profiling désactivé plutôt qu'un import de l'app en échec
+            self.enabled = False
+            logger.warning(f"Profile directory unavailable ({self.profile_dir}), profiling disabled: {e}")
+
+    def _path(self, profile_id: str, extension: str) -> Optional[str]:
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        return os.path.join(self.profile_dir, f"{profile_id}.{extension}")
+
+    def run(self, fn: Callable, *args, label: str = '', max_files: int = 50, **kwargs) -> Tuple[Any, Optional[str]]:
+        """
+        Exécute fn sous cProfile et stocke le profil (même si fn lève une exception).
+
+        Les étapes CPU sont exécutées dans le thread de la requête pendant le profiling :
+        sous gevent, le threadpool les rendrait invisibles pour cProfile.
+
+        Returns:
+            (résultat de fn, identifiant du profil ; None si le profiling est désactivé)
+        """
+        if not self.enabled:
+            return fn(*args, **kwargs), None
+        profile_id = uuid.uuid4().hex
+        profiler = cProfile.Profile()
+        start = time.time()
+        try:
+            with inline_cpu():
+                result = profiler.runcall(fn, *args, **kwargs)
+        finally:
+            self._save(profiler, profile_id, label, time.time() - start)
+            self._prune(max_files)
+        return result, profile_id
+
+    def _save(self, profiler: cProfile.Profile, profile_id: str, label: str, duration: float):
+        profiler.dump_stats(self._path(profile_id, 'prof'))
+        summary = io.StringIO()
+        summary.write(f"# {label} - {duration * 1000:.1f}ms - pid {os.getpid()}\n")
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(40)
+        with open(self._path(profile_id, 'txt'), 'w', encoding='utf-8') as f:
+            f.write(summary.getvalue())
+        logger.info(f"Request profile {profile_id} stored ({label}, {duration:.2f}s)")
+
+    def _prune(self, max_files: int):
+        try:
+            entries = [e for e in os.scandir(self.profile_dir) if e.name.endswith('.prof')]
+        except OSError:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:max(0, len(entries) - max_files)]:
+            stem = entry.path[:-len('.prof')]
+            for path in (entry.path, stem + '.txt'):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def summary_path(self, profile_id: str) -> Optional[str]:
+        path = self._path(profile_id, 'txt')
+        return path if path and os.path.exists(path) else None
+
+    def stats_path(self, profile_id: str) -> Optional[str]:
+        path = self._path(profile_id, 'prof')
+        return path if path and os.path.exists(path) else None
@@ -4,8 +4,11 @@ Fonction resize_with_pil exactement comme dans le code de référence
 """
 
 import logging
+from typing import Optional, Tuple
 from PIL import Image
 
+from geometry import ResamplePlan, plan_resize
+
 logger = logging.getLogger(__name__)
 
 # Paramètres de redimensionnement par défaut (modifiés pour éviter les bandes blanches)
@@ -36,31 +39,57 @@ class ResizeProcessor:
     def __init__(self, config_manager):
         self.config = config_manager
     
-    def process(self, image: Image.Image, width: int, height: int) -> Image.Image:
+    def _resize_params(self, config) -> dict:
+        """Paramètres de redimensionnement depuis la configuration (fit forcé en fill)"""
+        # Récupérer les paramètres depuis la configuration ou utiliser les défauts
+        resize_params = {
+            'RESIZE_MODE': config.get('resize_mode', DEFAULT_RESIZE_PARAMS['RESIZE_MODE']),
+            'KEEP_RATIO': config.get('resize_keep_ratio', DEFAULT_RESIZE_PARAMS['KEEP_RATIO']),
+            'RESAMPLING': config.get('resize_resampling', DEFAULT_RESIZE_PARAMS['RESAMPLING']),
+            'CROP_POSITION': config.get('resize_crop_position', DEFAULT_RESIZE_PARAMS['CROP_POSITION']),
+            'BG_COLOR': config.get('resize_background_color', DEFAULT_RESIZE_PARAMS['BG_COLOR']),
+            'BG_ALPHA': config.get('resize_bg_alpha', DEFAULT_RESIZE_PARAMS['BG_ALPHA'])
+        }
+        
+        # ANTI-BANDES BLANCHES : Forcer le mode fill pour éviter les bandes
+        # Le mode fill remplit complètement les dimensions sans ajouter de background
+        if resize_params['RESIZE_MODE'].lower() == 'fit':
+            logger.info("Mode 'fit' détecté, passage en mode 'fill' pour éviter les bandes blanches")
+            resize_params['RESIZE_MODE'] = 'fill'
+        
+        return resize_params
+    
+    def process(self, image: Image.Image, width: int, height: int, config=None) -> Image.Image:
         """Redimensionne l'image avec la fonction resize_with_pil du code de référence"""
+        config = config or self.config
         try:
-            # Récupérer les paramètres depuis la configuration ou utiliser les défauts
-            resize_params = {
-                'RESIZE_MODE': self.config.get('resize_mode', DEFAULT_RESIZE_PARAMS['RESIZE_MODE']),
-                'KEEP_RATIO': self.config.get('resize_keep_ratio', DEFAULT_RESIZE_PARAMS['KEEP_RATIO']),
-                'RESAMPLING': self.config.get('resize_resampling', DEFAULT_RESIZE_PARAMS['RESAMPLING']),
-                'CROP_POSITION': self.config.get('resize_crop_position', DEFAULT_RESIZE_PARAMS['CROP_POSITION']),
-                'BG_COLOR': self.config.get('resize_background_color', DEFAULT_RESIZE_PARAMS['BG_COLOR']),
-                'BG_ALPHA': self.config.get('resize_bg_alpha', DEFAULT_RESIZE_PARAMS['BG_ALPHA'])
-            }
-            
-            # ANTI-BANDES BLANCHES : Forcer le mode fill pour éviter les bandes
-            # Le mode fill remplit complètement les dimensions sans ajouter de background
-            if resize_params['RESIZE_MODE'].lower() == 'fit':
-                logger.info("Mode 'fit' détecté, passage en mode 'fill' pour éviter les bandes blanches")
-                resize_params['RESIZE_MODE'] = 'fill'
-            
-            return self.resize_with_pil(image, width, height, resize_params)
+            return self.resize_with_pil(image, width, height, self._resize_params(config))
                 
         except Exception as e:
             logger.error(f"Resize failed: {e}")
             raise Exception(f"Resize error: {e}")
     
+    def plan(self, src_size, width: int, height: int, config=None, region=None,
+             max_size: Optional[int] = None) -> Optional[Tuple[ResamplePlan, int]]:
+        """
+        Plan de rééchantillonnage unique équivalent à crop + process + plafond (voir geometry.py)
+        
+        Returns:
+            (plan, méthode de rééchantillonnage) ou None si le mode de resize n'est pas planifiable
+        """
+        resize_params = self._resize_params(config or self.config)
+        plan = plan_resize(
+            src_size, width, height,
+            resize_params['RESIZE_MODE'].lower(),
+            crop_position=resize_params['CROP_POSITION'].lower(),
+            region=region,
+            max_size=max_size
+        )
+        if plan is None:
+            return None
+        resampling = resize_params['RESAMPLING'].lower()
+        return plan, RESAMPLING_METHODS.get(resampling, Image.LANCZOS)
+    
     def resize_with_pil(self, image, width, height, resize_params):
         """
         Redimensionne une image avec PIL (Pillow) - COPIE EXACTE DU CODE DE RÉFÉRENCE
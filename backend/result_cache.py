@@ -0,0 +1,286 @@
+"""
+ResultCache - Cache des résultats encodés de /api/process
+Cache adressé par contenu : tier mémoire LRU par worker + tier disque partagé entre workers gunicorn
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Répertoire partagé par tous les workers (même machine)
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'miremover-cache')
+
+# Paramètres sans influence sur l'image produite (exclus de la version de config)
+VERSION_EXCLUDED_KEYS = {
+    'bria_api_token',
+    'logging_level',
+    'log_processing_times',
+    'log_api_calls',
+    'error_details_in_response',
+}
+VERSION_EXCLUDED_PREFIXES = ('result_cache_', 'bria_cache_')
+
+
+def settings_version(settings: Dict[str, str]) -> str:
+    """Calcule une version stable des paramètres qui influencent le résultat"""
+    relevant = {
+        key: value for key, value in settings.items()
+        if key not in VERSION_EXCLUDED_KEYS and not key.startswith(VERSION_EXCLUDED_PREFIXES)
+    }
+    payload = json.dumps(relevant, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+class CachedResult:
+    """Résultat en cache : bytes en mémoire ou chemin du fichier sur disque"""
+
+    def __init__(self, meta: Dict[str, Any], data: Optional[bytes] = None, path: Optional[str] = None):
+        self.meta = meta
+        self.data = data
+        self.path = path
+
+
+class MemoryLRU:
+    """LRU borné en nombre d'entrées et en octets, avec TTL optionnel"""
+
+    def __init__(self):
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str, ttl: Optional[float] = None) -> Optional[tuple]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            data, meta, stored_at = entry
+            if ttl is not None and time.time() - stored_at > ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return data, meta
+
+    def put(self, key: str, data: bytes, meta: Any, max_items: int, max_bytes: int) -> int:
+        """Ajoute une entrée et retourne le nombre d'évictions"""
+        if len(data) > max_bytes:
+            return 0
+        evicted = 0
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (data, meta, time.time())
+            self._bytes += len(data)
+            while self._entries and (len(self._entries) > max_items or self._bytes > max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                evicted += 1
+        return evicted
+
+    def _remove(self, key: str):
+        data, _, _ = self._entries.pop(key)
+        self._bytes -= len(data)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ResultCache:
+    """Cache des réponses encodées de /api/process (mémoire LRU + disque partagé)"""
+
+    def __init__(self, config_manager, cache_dir: Optional[str] = None):
+        self.config = config_manager
+        self.cache_dir = cache_dir or os.environ.get('RESULT_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self.memory = MemoryLRU()
+        self.counters = {
+            'hits_memory': 0,
+            'hits_disk': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions_memory': 0,
+            'evictions_disk': 0,
+        }
+        self._counters_lock = threading.Lock()
+        self._version_settings = None
+        self._version = ''
+        self._disk_writes_since_sweep = 0
+
+        try:
+            # Privé au service quel que soit l'umask (gunicorn : umask 0) : personne d'autre ne
+            # doit pouvoir déposer un résultat servi aux clients ; resserre aussi un répertoire existant
+            os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+            os.chmod(self.cache_dir, 0o700)
+        except OSError as e:
+            logger.warning(f"Result cache directory unavailable ({self.cache_dir}): {e}")
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.get_bool('result_cache_enabled', True)
+
+    def make_key(self, data: bytes, mode: str, params: Dict[str, Any], config=None,
+                 output_format: Optional[str] = None) -> str:
+        """Clé = hash(octets uploadés, mode, width/height, format négocié, version de la config)"""
+        digest = hashlib.sha256(data).hexdigest()
+        key_parts = [
+            digest,
+            mode,
+            str(params.get('width', '')),
+            str(params.get('height', '')),
+            output_format or '',
+            self._settings_version((config or self.config).settings),
+        ]
+        return hashlib.sha256('|'.join(key_parts).encode('utf-8')).hexdigest()
+
+    def _settings_version(self, settings) -> str:
+        # La version n'est recalculée que lorsque le snapshot de settings est remplacé
+        if settings is not self._version_settings:
+            self._version = settings_version(settings)
+            self._version_settings = settings
+        return self._version
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        """Cherche d'abord en mémoire, puis sur disque"""
+        entry = self.memory.get(key)
+        if entry is not None:
+            self._count('hits_memory')
+            data, meta = entry
+            return CachedResult(meta, data=data)
+
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if not os.path.exists(data_path):
+                raise FileNotFoundError(data_path)
+            # Rafraîchir le mtime pour l'éviction LRU sur disque
+            os.utime(meta_path, None)
+            self._count('hits_disk')
+            return CachedResult(meta, path=data_path)
+        except (OSError, ValueError):
+            self._count('misses')
+            return None
+
+    def put(self, key: str, data: bytes, meta: Dict[str, Any]):
+        """Stocke le résultat encodé dans les deux tiers"""
+        max_items = self.config.get_int('result_cache_memory_items', 64)
+        max_bytes = self.config.get_int('result_cache_memory_mb', 64) * 1024 * 1024
+        evicted = self.memory.put(key, data, meta, max_items, max_bytes)
+        if evicted:
+            self._count('evictions_memory', evicted)
+
+        try:
+            self._write_disk(key, data, meta)
+            self._count('stores')
+        except OSError as e:
+            logger.warning(f"Failed to write result cache entry: {e}")
+
+    def _paths(self, key: str):
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return base + '.bin', base + '.json'
+
+    def _write_disk(self, key: str, data: bytes, meta: Dict[str, Any]):
+        data_path, meta_path = self._paths(key)
+        directory = os.path.dirname(data_path)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+        # Écriture atomique : les données d'abord, puis les métadonnées qui valident l'entrée
+        for path, payload in ((data_path, data), (meta_path, json.dumps(meta).encode('utf-8'))):
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(payload)
+                os.replace(tmp_path, path)
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+
+        self._disk_writes_since_sweep += 1
+        if self._disk_writes_since_sweep >= self.config.get_int('result_cache_sweep_every', 20):
+            self._disk_writes_since_sweep = 0
+            self.sweep_disk()
+
+    def sweep_disk(self):
+        """Évince les entrées les plus anciennes si le tier disque dépasse son quota"""
+        max_bytes = self.config.get_int('result_cache_disk_mb', 1024) * 1024 * 1024
+        lock_path = os.path.join(self.cache_dir, '.sweep.lock')
+
+        with open(lock_path, 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Un autre worker fait déjà le ménage
+                return
+
+            entries = []
+            total = 0
+            for shard in os.scandir(self.cache_dir):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if not entry.name.endswith('.json'):
+                        continue
+                    data_path = entry.path[:-len('.json')] + '.bin'
+                    try:
+                        size = os.path.getsize(data_path) + entry.stat().st_size
+                        mtime = entry.stat().st_mtime
+                    except OSError:
+                        continue
+                    entries.append((mtime, size, entry.path, data_path))
+                    total += size
+
+            if total <= max_bytes:
+                return
+
+            # Descendre à 90% du quota pour éviter de balayer à chaque écriture
+            target = int(max_bytes * 0.9)
+            evicted = 0
+            for _, size, meta_path, data_path in sorted(entries):
+                if total <= target:
+                    break
+                for path in (meta_path, data_path):
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+                total -= size
+                evicted += 1
+
+            if evicted:
+                self._count('evictions_disk', evicted)
+                logger.info(f"Result cache disk sweep evicted {evicted} entries")
+
+    def _count(self, name: str, amount: int = 1):
+        with self._counters_lock:
+            self.counters[name] += amount
+        metrics.cache_event('result', name, amount)
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs du worker courant et occupation du tier mémoire"""
+        with self._counters_lock:
+            stats = dict(self.counters)
+        lookups = stats['hits_memory'] + stats['hits_disk'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits_memory'] + stats['hits_disk']) / lookups, 4) if lookups else 0.0
+        stats['memory_entries'] = len(self.memory)
+        stats['memory_bytes'] = self.memory.size_bytes
+        stats['disk_dir'] = self.cache_dir
+        return stats
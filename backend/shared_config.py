@@ -0,0 +1,139 @@
+"""
+SharedConfigStore - Snapshot de configuration partagé entre workers gunicorn
+Fichier mappé en mémoire (mmap) écrit par un seul refresher et lu par tous les workers :
+un reload atteint tous les workers en quelques millisecondes et la charge Supabase
+reste constante quel que soit le nombre de workers.
+
+Format : en-tête '<4sQI' (magic, séquence, longueur) puis le JSON du snapshot.
+La séquence fonctionne comme un seqlock : impaire pendant une écriture, paire sinon.
+"""
+
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARED_CONFIG_PATH = os.path.join(tempfile.gettempdir(), 'miremover-config.bin')
+
+MAGIC = b'MRCF'
+HEADER = struct.Struct('<4sQI')
+INITIAL_CAPACITY = 256 * 1024
+
+
+class SharedConfigStore:
+    """Lecture sans verrou / écriture exclusive d'un snapshot de settings versionné"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.environ.get('SHARED_CONFIG_PATH', DEFAULT_SHARED_CONFIG_PATH)
+        self._lock = threading.Lock()
+        self._leader_fd: Optional[int] = None
+
+        # Lisible par le seul utilisateur du service (gunicorn tourne avec umask 0)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        os.fchmod(fd, 0o600)
+        self._file = os.fdopen(fd, 'r+b')
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size < HEADER.size:
+                self._file.truncate(INITIAL_CAPACITY)
+                self._file.seek(0)
+                self._file.write(HEADER.pack(MAGIC, 0, 0))
+                self._file.flush()
+        finally:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._map = mmap.mmap(fd, 0)
+
+    def _remap_if_grown(self):
+        size = os.fstat(self._file.fileno()).st_size
+        if size != len(self._map):
+            self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), 0)
+
+    def sequence(self) -> int:
+        """Numéro de version courant (lecture de 8 octets, sans verrou)"""
+        _, seq, _ = HEADER.unpack_from(self._map, 0)
+        return seq
+
+    def read(self) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """Lit (séquence, snapshot) de façon cohérente ; None si rien n'a encore été publié"""
+        for _ in range(100):
+            magic, seq, length = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or seq == 0:
+                return None
+            if seq % 2:
+                continue  # écriture en cours
+            if HEADER.size + length > len(self._map):
+                with self._lock:
+                    self._remap_if_grown()
+                continue
+            payload = bytes(self._map[HEADER.size:HEADER.size + length])
+            if HEADER.unpack_from(self._map, 0)[1] != seq:
+                continue  # snapshot remplacé pendant la lecture
+            try:
+                return seq, json.loads(payload.decode('utf-8'))
+            except ValueError:
+                continue
+        logger.warning("Shared config read did not stabilize")
+        return None
+
+    def write(self, snapshot: Dict[str, Any]) -> int:
+        """Publie un nouveau snapshot et retourne sa séquence"""
+        payload = json.dumps(snapshot).encode('utf-8')
+        with self._lock:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+            try:
+                needed = HEADER.size + len(payload)
+                if needed > len(self._map):
+                    self._file.truncate(max(needed, 2 * len(self._map)))
+                    self._remap_if_grown()
+
+                _, seq, _ = HEADER.unpack_from(self._map, 0)
+                seq += 1 if seq % 2 == 0 else 0
+                # Séquence impaire : les lecteurs attendent la fin de l'écriture
+                HEADER.pack_into(self._map, 0, MAGIC, seq, 0)
+                self._map[HEADER.size:needed] = payload
+                HEADER.pack_into(self._map, 0, MAGIC, seq + 1, len(payload))
+                self._map.flush()
+                return seq + 1
+            finally:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+
+    def try_acquire_leadership(self) -> bool:
+        """Un seul process (le leader) interroge Supabase périodiquement"""
+        if self._leader_fd is not None:
+            return True
+        fd = os.open(self.path + '.leader', os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._leader_fd = fd
+        logger.info(f"Process {os.getpid()} is now the config refresher")
+        return True
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader_fd is not None
+
+    def release_leadership(self):
+        if self._leader_fd is not None:
+            os.close(self._leader_fd)
+            self._leader_fd = None
+
+    def close(self):
+        """
+        Ferme le mapping et les descripteurs du process courant. Dans un worker forké, les verrous
+        flock restent tenus par le master tant qu'il garde ses propres descripteurs.
+        """
+        self.release_leadership()
+        with self._lock:
+            self._map.close()
+            self._file.close()
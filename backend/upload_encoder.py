@@ -0,0 +1,123 @@
+"""
+Encodage de l'image envoyée à Bria
+Formats configurables (JPEG, JPEG progressif, WebP) avec budget d'octets optionnel :
+la qualité est choisie par recherche dichotomique pour tenir sous bria_upload_max_kb
+"""
+
+import io
+import logging
+from typing import Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_FORMATS = {
+    # format: (format Pillow, nom de fichier, mimetype)
+    'jpeg': ('JPEG', 'image.jpg', 'image/jpeg'),
+    'progressive_jpeg': ('JPEG', 'image.jpg', 'image/jpeg'),
+    'webp': ('WEBP', 'image.webp', 'image/webp'),
+}
+
+
+class EncodedUpload:
+    """Payload prêt à envoyer (octets, nom de fichier, mimetype, qualité retenue)"""
+
+    __slots__ = ('data', 'filename', 'mimetype', 'quality')
+
+    def __init__(self, data: bytes, filename: str, mimetype: str, quality: int):
+        self.data = data
+        self.filename = filename
+        self.mimetype = mimetype
+        self.quality = quality
+
+
+def flatten_on_white(image: Image.Image) -> Image.Image:
+    """Bria n'aime pas toujours RGBA : fond blanc pour les images transparentes"""
+    if image.mode == 'P':
+        image = image.convert('RGBA')
+    if image.mode == 'RGBA':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+
+def _encode(image: Image.Image, upload_format: str, quality: int) -> bytes:
+    pil_format = UPLOAD_FORMATS[upload_format][0]
+    buffer = io.BytesIO()
+    if upload_format == 'progressive_jpeg':
+        image.save(buffer, format=pil_format, quality=quality, progressive=True, optimize=True)
+    elif upload_format == 'webp':
+        image.save(buffer, format=pil_format, quality=quality, method=4)
+    else:
+        image.save(buffer, format=pil_format, quality=quality)
+    return buffer.getvalue()
+
+
+def _search_quality(image: Image.Image, upload_format: str, max_quality: int,
+                    min_quality: int, max_bytes: int) -> Tuple[bytes, int]:
+    """Plus haute qualité dont l'encodage tient dans max_bytes (min_quality sinon)"""
+    data = _encode(image, upload_format, max_quality)
+    if len(data) <= max_bytes:
+        return data, max_quality
+
+    best, best_quality = None, min_quality
+    low, high = min_quality, max_quality - 1
+    while low <= high:
+        quality = (low + high) // 2
+        candidate = _encode(image, upload_format, quality)
+        if len(candidate) <= max_bytes:
+            best, best_quality = candidate, quality
+            low = quality + 1
+        else:
+            high = quality - 1
+
+    if best is None:
+        # Aucune qualité ne tient dans le budget : envoyer la plus compacte autorisée
+        logger.warning(f"Upload budget {max_bytes // 1024}KB not reachable, using quality {min_quality}")
+        best = _encode(image, upload_format, min_quality)
+    return best, best_quality
+
+
+def encode_upload(image: Image.Image, upload_format: str = 'jpeg', quality: int = 95,
+                  max_bytes: int = 0, min_quality: int = 60) -> EncodedUpload:
+    """
+    Encode l'image pour l'upload Bria.
+
+    Args:
+        image: Image à envoyer (aplatie sur fond blanc si transparente)
+        upload_format: 'jpeg', 'progressive_jpeg' ou 'webp'
+        quality: Qualité maximale
+        max_bytes: Budget du payload (0 = pas de budget, qualité fixe)
+        min_quality: Qualité plancher de la recherche
+
+    Returns:
+        EncodedUpload
+    """
+    if upload_format not in UPLOAD_FORMATS:
+        logger.warning(f"Unknown Bria upload format '{upload_format}', using jpeg")
+        upload_format = 'jpeg'
+    _, filename, mimetype = UPLOAD_FORMATS[upload_format]
+
+    image = flatten_on_white(image)
+    quality = max(1, min(100, quality))
+    min_quality = max(1, min(quality, min_quality))
+
+    if max_bytes > 0:
+        data, quality = _search_quality(image, upload_format, quality, min_quality, max_bytes)
+    else:
+        data = _encode(image, upload_format, quality)
+    return EncodedUpload(data, filename, mimetype, quality)
+
+
+def upload_settings(config) -> dict:
+    """Paramètres d'encodage depuis admin_settings (snapshot de la requête)"""
+    return {
+        'upload_format': config.get('bria_upload_format', 'jpeg'),
+        'quality': config.get_int('bria_upload_quality', 95),
+        'max_bytes': config.get_int('bria_upload_max_kb', 0) * 1024,
+        'min_quality': config.get_int('bria_upload_min_quality', 60),
+    }
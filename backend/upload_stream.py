@@ -0,0 +1,110 @@
+"""
+Ingestion des uploads en streaming - limite de taille appliquée pendant la lecture du corps
+Le corps multipart est lu par morceaux par Werkzeug : un Content-Length au-dessus de la limite
+est rejeté (413) avant toute lecture, un corps sans Content-Length (chunked) est coupé dès
+qu'il la dépasse. Les fichiers au-delà de upload_spool_threshold_kb sont écrits dans un fichier
+temporaire (UPLOAD_SPOOL_DIR) puis passés au décodeur en mmap, sans copie dans le worker.
+"""
+
+import io
+import logging
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import IO, Iterator, Optional, Union
+
+from flask import Request
+
+logger = logging.getLogger(__name__)
+
+# Marge pour l'enveloppe multipart (boundaries, en-têtes des parties, champs texte)
+MULTIPART_OVERHEAD = 64 * 1024
+
+DEFAULT_SPOOL_THRESHOLD = 512 * 1024
+
+# Limite des endpoints sans upload (JSON d'administration...)
+DEFAULT_MAX_CONTENT_LENGTH = 1024 * 1024
+
+# Contenu d'un upload : octets (petit fichier resté en mémoire) ou mmap du fichier temporaire
+UploadData = Union[bytes, mmap.mmap]
+
+
+def _spool_dir() -> Optional[str]:
+    spool_dir = os.environ.get('UPLOAD_SPOOL_DIR')
+    if spool_dir:
+        try:
+            os.makedirs(spool_dir, exist_ok=True)
+        except OSError as e:
+            logger.warning(f"Upload spool directory unavailable ({spool_dir}): {e}")
+            return None
+    return spool_dir or None
+
+
+class StreamingRequest(Request):
+    """
+    Request Flask dont la limite du corps et le seuil de spool sont fixés par requête
+    (avant la lecture du corps, voir request_body_limit) ; compatible Flask < 3.1.
+    """
+
+    body_limit: Optional[int] = None
+    spool_threshold: int = DEFAULT_SPOOL_THRESHOLD
+    spool_dir: Optional[str] = _spool_dir()
+
+    @property
+    def max_content_length(self) -> Optional[int]:
+        if self.body_limit is not None:
+            return self.body_limit
+        return super().max_content_length
+
+    def _get_file_stream(self, total_content_length: Optional[int], content_type: Optional[str],
+                         filename: Optional[str] = None, content_length: Optional[int] = None) -> IO[bytes]:
+        # Taille connue et petite : en mémoire ; sinon (gros fichier ou chunked) sur disque
+        if total_content_length is not None and total_content_length <= self.spool_threshold:
+            return io.BytesIO()
+        return tempfile.TemporaryFile('w+b', prefix='upload-', dir=self.spool_dir)
+
+
+def request_body_limit(config, batch: bool = False) -> int:
+    """Taille maximale du corps : une image (max_file_size_mb) ou un lot (batch_max_request_mb)"""
+    if batch:
+        max_mb = config.get_int('batch_max_request_mb', 100)
+    else:
+        max_mb = config.get_int('max_file_size_mb', 10)
+    return max_mb * 1024 * 1024 + MULTIPART_OVERHEAD
+
+
+@contextmanager
+def upload_view(file) -> Iterator[UploadData]:
+    """
+    Contenu d'un fichier uploadé sans nouvelle copie : octets s'il est resté en mémoire,
+    sinon mmap en lecture seule du fichier temporaire, valide jusqu'à la sortie du bloc.
+    """
+    stream = file.stream
+    if isinstance(stream, io.BytesIO):
+        yield stream.getvalue()
+        return
+
+    try:
+        fileno = stream.fileno()
+        size = os.fstat(fileno).st_size
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        # Flux sans descripteur (stream factory d'une autre version de Werkzeug)
+        stream.seek(0)
+        yield stream.read()
+        return
+
+    if size == 0:
+        # mmap refuse un fichier vide
+        yield b''
+        return
+
+    view = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    try:
+        yield view
+    finally:
+        try:
+            view.close()
+        except BufferError:
+            # Vue encore référencée par une trace d'exception : libérée avec elle
+            pass
@@ -0,0 +1,93 @@
+"""
+Préchargement et échauffement des workers gunicorn - supprime la latence de la première requête
+- preload() : dans le master (hook when_ready, avec preload_app). L'app est déjà importée ; les
+  plugins Pillow et les modules des modes activés (OpenCV pour crop-head / all) sont chargés, la
+  configuration est lue une seule fois et le processeur construit. Les workers forkés en héritent
+  en copy-on-write au lieu de tout refaire chacun.
+- warm_up() : dans chaque worker (hook post_worker_init), avant qu'il n'accepte des requêtes.
+  Ressources héritées du master recréées (UnifiedProcessor.after_fork), détecteur de visage
+  chargé, connexion Bria ouverte, pool de process CPU démarré (CPU_OFFLOAD_PROCESSES).
+Rien n'est chargé pour un mode désactivé : ses modules le seront à sa première requête.
+Threads, sockets et détecteurs ne sont créés que dans les workers (rien de tout ça ne survit
+proprement à un fork). benchmarks/bench_startup.py mesure le gain.
+"""
+
+import importlib
+import logging
+import time
+from typing import Callable, Dict, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Modes (clés mode_<mode>_enabled) qui appellent Bria / qui détectent un visage
+BRIA_MODES = ('ai', 'both', 'all')
+CROP_MODES = ('crop_head', 'all')
+
+
+def _enabled(config, modes: Sequence[str]) -> bool:
+    return any(config.get_bool(f'mode_{mode}_enabled', True) for mode in modes)
+
+
+def _step(timings: Dict[str, float], name: str, fn: Callable[[], object]):
+    # Un échec d'échauffement ne doit pas empêcher le worker de démarrer : la première requête
+    # refera simplement le travail
+    start = time.time()
+    try:
+        fn()
+    except Exception as e:
+        logger.warning(f"Warm-up step '{name}' failed: {e}")
+    timings[name] = time.time() - start
+
+
+def _summary(timings: Dict[str, float]) -> str:
+    return ', '.join(f"{name}: {duration * 1000:.0f}ms" for name, duration in timings.items())
+
+
+def preload() -> Dict[str, float]:
+    """Master : modules lourds, configuration et processeur chargés avant le fork (durées en s)"""
+    from PIL import Image
+
+    from app_unified import get_processor
+
+    timings: Dict[str, float] = {}
+    # Plugins de formats : sinon importés au premier Image.open de chaque worker
+    _step(timings, 'pillow', Image.init)
+
+    start = time.time()
+    proc = get_processor()
+    timings['processor'] = time.time() - start
+
+    config = proc.config.snapshot()
+    if _enabled(config, CROP_MODES):
+        _step(timings, 'opencv', lambda: importlib.import_module('face_detectors'))
+    if _enabled(config, BRIA_MODES) and config.get_bool('bria_matte_mode', False):
+        _step(timings, 'matte', lambda: importlib.import_module('matte'))
+
+    proc.before_fork()
+    logger.info(f"Preloaded in master ({_summary(timings)})")
+    return timings
+
+
+def warm_up() -> Dict[str, float]:
+    """Worker : ressources prêtes avant la première requête (durées en s)"""
+    import cpu_offload
+    from app_unified import get_processor
+
+    timings: Dict[str, float] = {}
+    start = time.time()
+    # Processeur construit ici sans preload, ou repris du master (after_fork)
+    proc = get_processor()
+    timings['processor'] = time.time() - start
+
+    config = proc.config.snapshot()
+    if _enabled(config, CROP_MODES):
+        _step(timings, 'face_detector', lambda: proc.crop_head.warm_up(config))
+    if (_enabled(config, BRIA_MODES) and config.get('bria_api_token')
+            and config.get_bool('bria_preconnect_enabled', True)):
+        _step(timings, 'bria_connection', lambda: proc.bria.preconnect(config))
+    pool = cpu_offload.process_pool()
+    if pool is not None:
+        _step(timings, 'cpu_pool', pool.start)
+
+    logger.info(f"Worker warmed up in {(time.time() - start) * 1000:.0f}ms ({_summary(timings)})")
+    return timings
@@ -0,0 +1,165 @@
+-- =====================================================
+-- MIREMOVER - PARAMÈTRES PERFORMANCE BACKEND
+-- Nouvelles entrées admin_settings pour le cache et l'optimisation des traitements
+-- =====================================================
+
+-- ==================== CACHE DES RÉSULTATS ====================
+INSERT INTO admin_settings (key, value, description) VALUES
+('result_cache_enabled', 'true', 'Activer le cache des résultats (hash image + mode + dimensions + config)'),
+('result_cache_memory_items', '64', 'Nombre max d''entrées du cache mémoire (par worker)'),
+('result_cache_memory_mb', '64', 'Taille max du cache mémoire en MB (par worker)'),
+('result_cache_disk_mb', '1024', 'Taille max du cache disque partagé en MB')
+ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, description = EXCLUDED.description;
+
+-- ==================== CACHE DES RÉPONSES BRIA ====================
+INSERT INTO admin_settings (key, value, description) VALUES
+('bria_cache_enabled', 'true', 'Réutiliser la réponse Bria pour un payload identique déjà envoyé'),
+('bria_cache_ttl_seconds', '3600', 'Durée de vie d''une réponse Bria en cache (secondes)'),
+('bria_cache_max_mb', '128', 'Budget mémoire du cache Bria en MB (par worker)'),
+('bria_cache_max_items', '256', 'Nombre max de réponses Bria en cache (par worker)')
+ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, description = EXCLUDED.description;
+
+-- ==================== CONNEXIONS BRIA ====================
+INSERT INTO admin_settings (key, value, description) VALUES
+('bria_pool_maxsize', '100', 'Connexions HTTP max vers Bria par worker (workers gevent)')
+ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, description = EXCLUDED.description;
+
+-- ==================== TRAITEMENT PAR LOT ====================
+INSERT INTO admin_settings (key, value, description) VALUES
+('batch_max_items', '50', 'Nombre max d''images par requête /api/process/batch'),
+('batch_concurrency', '4', 'Items d''un batch traités en parallèle (CPU pendant l''attente Bria)')
+ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, description = EXCLUDED.description;
+
+-- ==================== INGESTION ====================
+-- Clé existante : valeur réglée en production conservée
+INSERT INTO admin_settings (key, value, description) VALUES
+('max_file_size_mb', '10', 'Taille max du fichier uploadé en MB (vérifiée avant décodage)')
+ON CONFLICT (key) DO NOTHING;
+
+INSERT INTO admin_settings (key, value, description) VALUES
+('max_image_pixels', '40000000', 'Nombre max de pixels décodés (protection decompression bomb)')
+ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, description = EXCLUDED.description;
+
+-- ==================== DÉTECTION DE VISAGE ====================
+-- Clés existantes : valeurs réglées en production conservées
+INSERT INTO admin_settings (key, value, description) VALUES
+('face_scale_factor', '1.1', 'Facteur échelle pour détection visage OpenCV'),
+('face_min_neighbors', '4', 'Nombre minimum de voisins pour détection visage')
+ON CONFLICT (key) DO NOTHING;
+
+INSERT INTO admin_settings (key, value, description) VALUES
+('face_detection_max_size', '640', 'Taille max (px) de l''image réduite utilisée pour la détection'),
+('face_min_size_ratio', '0.05', 'Taille min d''un visage (fraction du plus grand côté)')
+ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, description = EXCLUDED.description;
+
+-- ==================== BACKENDS DE DÉTECTION DE VISAGE ====================
+INSERT INTO admin_settings (key, value, description) VALUES
+('face_detector_backend', 'haar', 'Détecteur de visage: haar, lbp, dnn'),
+('face_lbp_cascade_path', 'lbpcascade_frontalface_improved.xml', 'Cascade LBP (relatif à FACE_MODELS_DIR)'),
+('face_dnn_prototxt', 'deploy.prototxt', 'Prototxt du modèle DNN SSD (relatif à FACE_MODELS_DIR)'),
+('face_dnn_model', 'res10_300x300_ssd_iter_140000.caffemodel', 'Poids du modèle DNN SSD (relatif à FACE_MODELS_DIR)'),
+('face_dnn_confidence', '0.5', 'Score minimum d''une détection DNN')
+ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, description = EXCLUDED.description;
+
+-- Clé existante : valeur réglée en production conservée
+INSERT INTO admin_settings (key, value, description) VALUES
+('nose_position_ratio', '0.75', 'Position de coupe dans le visage (0.75 = 75% depuis le haut du visage)')
+ON CONFLICT (key) DO NOTHING;
+
+-- ==================== PLANIFICATEUR GÉOMÉTRIQUE ====================
+INSERT INTO admin_settings (key, value, description) VALUES
+('geometry_planner_enabled', 'true', 'Crop + resize + plafond Bria en un seul rééchantillonnage (modes resize, both, all)')
+ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, description = EXCLUDED.description;
+
+-- ==================== MODE MATTE BRIA ====================
+INSERT INTO admin_settings (key, value, description) VALUES
+('bria_matte_mode', 'false', 'Envoyer un proxy réduit à Bria et appliquer l''alpha à l''image pleine résolution'),
+('bria_matte_size', '768', 'Plus grand côté (px) du proxy envoyé à Bria en mode matte'),
+('bria_matte_radius', '8', 'Rayon du guided filter (px du proxy) pour remonter l''alpha'),
+('bria_matte_eps', '0.0001', 'Régularisation du guided filter (plus grand = alpha plus lisse)')
+ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, description = EXCLUDED.description;
+
+-- ==================== ENCODAGE DE L'UPLOAD BRIA ====================
+INSERT INTO admin_settings (key, value, description) VALUES
+('bria_upload_format', 'jpeg', 'Format envoyé à Bria: jpeg, progressive_jpeg, webp'),
+('bria_upload_quality', '95', 'Qualité (maximale si budget) de l''image envoyée à Bria'),
+('bria_upload_max_kb', '0', 'Budget du payload envoyé à Bria en KB (0 = qualité fixe)'),
+('bria_upload_min_quality', '60', 'Qualité plancher de la recherche sous budget')
+ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, description = EXCLUDED.description;
+
+-- ==================== LIMITEUR ET DISJONCTEUR BRIA ====================
+INSERT INTO admin_settings (key, value, description) VALUES
+('bria_limiter_enabled', 'true', 'Limite de concurrence adaptative (AIMD) partagée entre workers'),
+('bria_limit_initial', '20', 'Appels Bria simultanés autorisés au démarrage'),
+('bria_limit_min', '1', 'Limite minimale d''appels Bria simultanés'),
+('bria_limit_max', '100', 'Limite maximale d''appels Bria simultanés'),
+('bria_limit_backoff', '0.7', 'Facteur appliqué à la limite sur 429 / 503 / timeout'),
+('bria_queue_timeout', '5', 'Attente max (s) d''une place avant échec rapide (503)'),
+('bria_breaker_failures', '5', 'Échecs consécutifs avant ouverture du disjoncteur'),
+('bria_breaker_cooldown', '30', 'Durée (s) d''ouverture du disjoncteur avant appel de test'),
+('bria_retry_max_wait', '2', 'Pause max (s) entre deux tentatives Bria')
+ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, description = EXCLUDED.description;
+
+-- ==================== HEDGING BRIA ====================
+INSERT INTO admin_settings (key, value, description) VALUES
+('bria_hedge_enabled', 'false', 'Envoyer un doublon des appels Bria plus lents que le percentile configuré'),
+('bria_hedge_percentile', '95', 'Percentile de latence (fenêtre glissante) au-delà duquel le doublon part'),
+('bria_hedge_budget', '0.05', 'Part max d''appels Bria supplémentaires dus au hedging (0.05 = 5%)'),
+('bria_hedge_min_delay', '0.5', 'Délai minimum (s) avant un doublon'),
+('bria_hedge_min_samples', '20', 'Latences observées avant d''activer le hedging')
+ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, description = EXCLUDED.description;
+
+-- ==================== PROFILING À LA DEMANDE ====================
+INSERT INTO admin_settings (key, value, description) VALUES
+('profile_max_files', '50', 'Profils de requêtes (X-Profile) conservés sur disque')
+ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, description = EXCLUDED.description;
+
+-- ==================== JOBS ASYNCHRONES ====================
+INSERT INTO admin_settings (key, value, description) VALUES
+('jobs_enabled', 'true', 'Activer /api/jobs (traitement asynchrone avec polling et SSE)'),
+('jobs_max_workers', '4', 'Jobs exécutés simultanément par worker (redémarrage requis)'),
+('jobs_max_pending', '32', 'Jobs en attente ou en cours par worker avant rejet (503)'),
+('jobs_result_ttl', '600', 'Durée de conservation des jobs terminés et de leurs résultats (secondes)'),
+('jobs_sse_max_seconds', '', 'Durée max d''un flux SSE avant reconnexion (sous le timeout gunicorn) ; vide : 100 sous gevent, flux refusé (409, polling) sur workers sync ; 0 : toujours refusé')
+ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, description = EXCLUDED.description;
+
+-- ==================== PROFILS D'ENCODAGE DES RÉSULTATS ====================
+-- Réglages globaux ; ajouter le suffixe du mode pour un profil par mode
+-- (ex. output_png_optimize_all = false, output_png_palette_crop_head = true)
+INSERT INTO admin_settings (key, value, description) VALUES
+('output_png_optimize', 'true', 'PNG : optimize (le plus compact, le plus lent) au lieu d''un niveau zlib fixe'),
+('output_png_compress_level', '6', 'PNG : niveau zlib 0-9 utilisé quand optimize est désactivé'),
+('output_png_palette', 'false', 'PNG : palette 8 bits avec alpha (détourages plus légers, léger banding)'),
+('output_png_palette_colors', '256', 'PNG : nombre de couleurs de la palette (2-256)'),
+('output_webp_lossless', 'false', 'WebP : encodage sans perte'),
+('output_webp_method', '4', 'WebP : méthode 0 (rapide) à 6 (compact)'),
+('output_webp_effort', '80', 'WebP lossless : effort de compression 0-100'),
+('output_jpeg_progressive', 'false', 'JPEG : progressif au lieu de baseline'),
+('output_jpeg_optimize', 'true', 'JPEG : optimisation des tables de Huffman')
+ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, description = EXCLUDED.description;
+
+-- ==================== NÉGOCIATION DU FORMAT DE SORTIE ====================
+INSERT INTO admin_settings (key, value, description) VALUES
+('output_negotiate_webp', 'true', 'Servir en WebP avec alpha les résultats PNG aux clients qui annoncent image/webp (Accept)')
+ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, description = EXCLUDED.description;
+
+-- ==================== INGESTION DES UPLOADS EN STREAMING ====================
+INSERT INTO admin_settings (key, value, description) VALUES
+('upload_spool_threshold_kb', '512', 'Taille (KB) au-delà de laquelle un upload est écrit sur disque et décodé en mmap'),
+('batch_max_request_mb', '100', 'Taille maximale (MB) du corps d''une requête /api/process/batch (413 au-delà, pendant la lecture)')
+ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, description = EXCLUDED.description;
+
+-- ==================== MÉMOIRE DES WORKERS ====================
+INSERT INTO admin_settings (key, value, description) VALUES
+('memory_pixel_budget_mp', '120', 'Mégapixels décodés simultanément par worker (au-delà : décodage réduit, attente puis 503 ; 0 = désactivé)'),
+('memory_budget_wait_seconds', '5', 'Attente maximale d''une place dans le budget de pixels avant rejet (secondes)'),
+('memory_budget_min_side', '2048', 'Grand côté minimal d''un JPEG décodé en réduction quand le budget est saturé (0 = jamais réduire)'),
+('memory_profile_sample_rate', '0.01', 'Fraction des requêtes dont la mémoire (RSS, pic de RSS) est relevée par étape'),
+('memory_profile_tracemalloc', 'false', 'Ajouter les allocations tracemalloc aux relevés (ralentit le worker jusqu''à son redémarrage)')
+ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, description = EXCLUDED.description;
+
+-- ==================== ÉCHAUFFEMENT DES WORKERS ====================
+INSERT INTO admin_settings (key, value, description) VALUES
+('bria_preconnect_enabled', 'true', 'Ouvrir une connexion vers Bria au démarrage de chaque worker, avant sa première requête'),
+('bria_preconnect_timeout', '5', 'Timeout (secondes) de la connexion ouverte au démarrage d''un worker')
+ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, description = EXCLUDED.description;
@@ -179,6 +179,9 @@ async function convertToJPG(blob: Blob, originalName: string): Promise<Blob> {
   });
 }
 
+// Le backend renvoie les détourages en WebP avec alpha (plus légers que PNG) si on l'annonce
+const RESULT_ACCEPT = 'image/webp,image/png;q=0.9,image/jpeg;q=0.8,*/*;q=0.5';
+
 // Implement request timeout and retry with exponential backoff
 async function fetchWithRetry(
   url: string,
@@ -277,6 +280,7 @@ async function removeBackgroundOnly(file: File | Blob): Promise<Blob> {
     `${API_BASE_URL}/process?mode=ai`,
     {
       method: 'POST',
+      headers: { Accept: RESULT_ACCEPT },
       body: formData
     }
   );
@@ -314,6 +318,7 @@ async function processImage(
     url,
     {
       method: 'POST',
+      headers: { Accept: RESULT_ACCEPT },
       body: formData
     }
   );